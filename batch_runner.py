@@ -0,0 +1,262 @@
+"""Run a JSONL file of prompts through the completion path, resumably.
+
+Each input line is either a JSON string (the prompt) or an object with "prompt" and
+optionally "id", "model", "max_tokens" and "temperature". Prompts run on a bounded
+worker pool and every result is appended to the output JSONL as soon as it finishes.
+The output file doubles as the checkpoint: on restart, ids that already have a
+successful record are skipped, so an interrupted run picks up where it stopped
+(failed prompts are retried; readers should keep the last record per id).
+
+    python batch_runner.py prompts.jsonl -o results.jsonl --concurrency 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lmstudio_client
+import lmstudio_core
+
+DEFAULT_CONCURRENCY = 4
+
+
+def read_prompts(path):
+    """Yield (id, item) for every non-blank line; item is a dict with at least "prompt"."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: not valid JSON ({e})") from None
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not isinstance(item.get("prompt"), str):
+                raise ValueError(f"{path}:{line_no}: expected a string or an object with a \"prompt\"")
+            yield str(item.get("id", line_no)), item
+
+
+def load_checkpoint(output_path):
+    """Ids with a successful record in an existing output file.
+
+    A partial last line (the previous run was killed mid-write) is cut off so the
+    file stays valid JSONL before new records are appended.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        valid_end = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            valid_end += len(raw)
+            if record.get("error") is None:
+                done.add(str(record["id"]))
+        f.truncate(valid_end)
+    return done
+
+
+class BatchRun:
+    """One pass over a prompt file; start() runs it on a background thread.
+
+    on_progress(stats) is called after every finished prompt and on_done(stats) once at
+    the end, both on worker threads. cache is an optional response_cache.ResponseCache.
+    """
+
+    def __init__(self, input_path, output_path, concurrency=DEFAULT_CONCURRENCY, model=None,
+                 max_tokens=lmstudio_core.DEFAULT_MAX_TOKENS, temperature=lmstudio_core.DEFAULT_TEMPERATURE,
+                 cache=None, on_progress=None, on_done=None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.cache = cache
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.total = 0
+        self.skipped = 0   # already completed in an earlier run
+        self.completed = 0
+        self.failed = 0
+        self.cached = 0
+        self.error = None  # set if the run itself failed (e.g. unreadable input)
+        self._start_time = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Waited on instead of Thread.join, which can return early after a KeyboardInterrupt
+        self._finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="batch-run", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop submitting prompts; those in flight still finish and are recorded."""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._finished.wait(timeout)
+
+    def is_running(self):
+        return self._thread is not None and not self._finished.is_set()
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+            finished = self.completed + self.failed
+            return {
+                "total": self.total,
+                "skipped": self.skipped,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cached": self.cached,
+                "remaining": max(0, self.total - self.skipped - finished),
+                "elapsed": elapsed,
+                "prompts_per_sec": finished / elapsed if elapsed > 0 else 0.0,
+                "stopped": self._stop.is_set(),
+                "error": self.error,
+            }
+
+    def run(self):
+        """Run the batch in the calling thread; returns the final stats."""
+        self._start_time = time.perf_counter()
+        try:
+            done = load_checkpoint(self.output_path)
+            items = list(read_prompts(self.input_path))
+            with self._lock:
+                self.total = len(items)
+            slots = threading.Semaphore(self.concurrency * 2)  # bounded read-ahead into the pool
+            with open(self.output_path, "a", encoding="utf-8") as out, \
+                    ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+                for item_id, item in items:
+                    if item_id in done:
+                        with self._lock:
+                            self.skipped += 1
+                        continue
+                    slots.acquire()
+                    if self._stop.is_set():
+                        slots.release()
+                        break
+                    pool.submit(self._run_one, item_id, item, out, slots)
+        except Exception as e:
+            self.error = e
+        stats = self.stats()
+        self._finished.set()
+        if self.on_done is not None:
+            self.on_done(stats)
+        return stats
+
+    def _run_one(self, item_id, item, out, slots):
+        try:
+            payload = lmstudio_core.build_completion_payload(
+                item["prompt"], model=item.get("model") or self.model,
+                max_tokens=item.get("max_tokens", self.max_tokens),
+                temperature=item.get("temperature", self.temperature))
+            record = {"id": item_id, "prompt": item["prompt"], "model": payload["model"]}
+            params = lmstudio_core.sampling_params(payload)
+            start_time = time.perf_counter()
+            try:
+                text = self.cache.get(payload["model"], item["prompt"], params) if self.cache is not None else None
+                if text is not None:
+                    record.update(text=text, latency=time.perf_counter() - start_time, tokens=None, cached=True)
+                else:
+                    result = lmstudio_core.complete(payload)
+                    record.update(text=result.text, latency=result.elapsed, tokens=result.tokens, cached=False)
+                    if self.cache is not None and result.text:
+                        self.cache.put(payload["model"], item["prompt"], params, result.text)
+                record["error"] = None
+            except Exception as e:
+                record.update(text=None, latency=time.perf_counter() - start_time, error=str(e))
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            with self._lock:
+                out.write(line)
+                out.flush()  # each finished prompt is on disk before it counts as done
+                if record["error"] is None:
+                    self.completed += 1
+                    self.cached += bool(record.get("cached"))
+                else:
+                    self.failed += 1
+            if self.on_progress is not None:
+                self.on_progress(self.stats())
+        finally:
+            slots.release()
+
+
+def default_output_path(input_path):
+    root, _ = os.path.splitext(input_path)
+    return root + ".results.jsonl"
+
+
+def format_stats(stats):
+    text = (f"{stats['completed']} done, {stats['failed']} failed, {stats['remaining']} left"
+            f" ({stats['prompts_per_sec']:.1f}/s")
+    if stats["skipped"]:
+        text += f", {stats['skipped']} from checkpoint"
+    if stats["cached"]:
+        text += f", {stats['cached']} cached"
+    return text + ")"
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL prompt file against LM Studio.")
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("-o", "--output", help="results JSONL (default: <input>.results.jsonl); resumed if it exists")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--model", help="model id (default: whatever the server has loaded)")
+    parser.add_argument("--max-tokens", type=int, default=lmstudio_core.DEFAULT_MAX_TOKENS)
+    parser.add_argument("--temperature", type=float, default=lmstudio_core.DEFAULT_TEMPERATURE)
+    parser.add_argument("--base-url", default=lmstudio_client.DEFAULT_BASE_URL)
+    parser.add_argument("--cache", action="store_true", help="reuse and fill the shared response cache")
+    args = parser.parse_args(argv)
+
+    lmstudio_client.configure(base_url=args.base_url)
+    cache = None
+    if args.cache:
+        from response_cache import ResponseCache
+        cache = ResponseCache()
+    last_report = [0.0]
+
+    def progress(stats):
+        now = time.monotonic()
+        if now - last_report[0] >= 1.0:
+            last_report[0] = now
+            print(format_stats(stats), file=sys.stderr)
+
+    output = args.output or default_output_path(args.input)
+    run = BatchRun(args.input, output, args.concurrency, args.model, args.max_tokens, args.temperature,
+                   cache=cache, on_progress=progress)
+    run.start()
+    try:
+        while run.is_running():
+            run.join(0.5)
+    except KeyboardInterrupt:
+        print("Stopping after in-flight prompts; rerun to resume.", file=sys.stderr)
+        run.stop()
+        run.join()
+    finally:
+        if cache is not None:
+            cache.close()
+    stats = run.stats()
+    if stats["error"] is not None:
+        print(f"Batch failed: {stats['error']}", file=sys.stderr)
+        return 2
+    print(format_stats(stats) + f" -> {output}", file=sys.stderr)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Headless latency/throughput benchmark for the LM Studio client core.
+
+Runs lmstudio_core's completion and model-list paths against the bundled mock
+server (or any OpenAI-compatible --base-url) and reports p50/p95/p99 latency,
+time-to-first-token and requests/sec. Thresholds make it usable as a regression
+gate: the script exits non-zero when a limit is exceeded.
+
+    python benchmark.py --requests 200 --concurrency 8
+    python benchmark.py --max-p95 0.5 --min-rps 20 --json
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lmstudio_client
+import lmstudio_core
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(name, latencies, wall_time, ttfts=None, errors=0):
+    summary = {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall_time if wall_time > 0 else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+    if ttfts is not None:
+        summary["ttft_p50"] = percentile(ttfts, 50)
+        summary["ttft_p95"] = percentile(ttfts, 95)
+        summary["ttft_p99"] = percentile(ttfts, 99)
+    return summary
+
+
+def run_scenario(name, call, requests, concurrency):
+    """Run call(i) requests times on a pool of concurrency threads and time each one."""
+    latencies = []
+    ttfts = []
+    errors = 0
+
+    def timed(i):
+        start_time = time.perf_counter()
+        result = call(i)
+        return time.perf_counter() - start_time, result
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed, i) for i in range(requests)]:
+            try:
+                elapsed, result = future.result()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            if getattr(result, "ttft", None) is not None:
+                ttfts.append(result.ttft)
+    wall_time = time.perf_counter() - wall_start
+    return summarize(name, latencies, wall_time, ttfts if ttfts else None, errors)
+
+
+def run_benchmarks(requests=100, concurrency=4, max_tokens=32):
+    payload = lmstudio_core.build_completion_payload("Benchmark prompt", max_tokens=max_tokens)
+    # One warm-up call so connection setup isn't charged to the first sample
+    lmstudio_core.list_models()
+    return [
+        run_scenario("list_models", lambda i: lmstudio_core.list_models(), requests, concurrency),
+        run_scenario("complete", lambda i: lmstudio_core.complete(payload), requests, concurrency),
+        run_scenario("stream_completion", lambda i: lmstudio_core.stream_completion(payload), requests, concurrency),
+    ]
+
+
+def format_table(results):
+    def ms(value):
+        return f"{value * 1000:8.1f}" if value is not None else "       -"
+    lines = [f"{'scenario':<18} {'reqs':>5} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+             f"{'ttft50':>8} {'ttft95':>8} {'ttft99':>8}"]
+    for r in results:
+        lines.append(f"{r['scenario']:<18} {r['requests']:>5} {r['errors']:>4} {r['rps']:>8.1f} "
+                     f"{ms(r['p50'])} {ms(r['p95'])} {ms(r['p99'])} "
+                     f"{ms(r.get('ttft_p50'))} {ms(r.get('ttft_p95'))} {ms(r.get('ttft_p99'))}")
+    return "\n".join(lines)
+
+
+def check_thresholds(results, max_p95=None, max_ttft_p95=None, min_rps=None):
+    """Return a list of human-readable threshold violations (empty when all pass)."""
+    failures = []
+    for r in results:
+        if r["errors"]:
+            failures.append(f"{r['scenario']}: {r['errors']} failed requests")
+        if max_p95 is not None and r["p95"] is not None and r["p95"] > max_p95:
+            failures.append(f"{r['scenario']}: p95 {r['p95']:.3f}s > {max_p95:.3f}s")
+        if max_ttft_p95 is not None and r.get("ttft_p95") is not None and r["ttft_p95"] > max_ttft_p95:
+            failures.append(f"{r['scenario']}: TTFT p95 {r['ttft_p95']:.3f}s > {max_ttft_p95:.3f}s")
+        if min_rps is not None and r["rps"] < min_rps:
+            failures.append(f"{r['scenario']}: {r['rps']:.1f} req/s < {min_rps:.1f} req/s")
+    return failures
+
+
+def main(argv=None):
+    import mock_openai_server  # only the CLI needs it; model_stats imports this module for percentile()
+
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for the LM Studio client core.")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the bundled mock")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--mock-ttft", type=float, default=mock_openai_server.DEFAULT_TTFT)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=mock_openai_server.DEFAULT_TOKENS_PER_SEC)
+    parser.add_argument("--max-p95", type=float, help="fail if any scenario's p95 latency (s) exceeds this")
+    parser.add_argument("--max-ttft-p95", type=float, help="fail if streamed TTFT p95 (s) exceeds this")
+    parser.add_argument("--min-rps", type=float, help="fail if any scenario's requests/sec falls below this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = mock_openai_server.start_server(ttft=args.mock_ttft, tokens_per_sec=args.mock_tokens_per_sec)
+        base_url = server.base_url
+    lmstudio_client.configure(base_url=base_url, pool_size=max(args.concurrency, lmstudio_client.POOL_SIZE))
+    try:
+        results = run_benchmarks(args.requests, args.concurrency, args.max_tokens)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Target: {base_url}   requests/scenario: {args.requests}   concurrency: {args.concurrency}")
+        print(format_table(results))
+    failures = check_thresholds(results, args.max_p95, args.max_ttft_p95, args.min_rps)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
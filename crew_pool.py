@@ -0,0 +1,81 @@
+"""Warm pool of CrewAI crews keyed by model and configuration.
+
+Building agents, tasks and a Crew for every run is avoidable overhead in long-running
+loops. The pool hands out an idle crew for the requested (model, config) if one
+exists and only builds a new one when all are busy, so concurrent workers never
+share a crew. invalidate() drops every crew (e.g. after the model changes); crews
+that are in use when that happens are discarded instead of returned to the pool.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CrewPool:
+    """Thread-safe pool of reusable crews built by factory(model, **config)."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._idle = {}        # key -> list of idle crews
+        self._generation = 0   # bumped by invalidate(); older crews are not reused
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.reuses = 0
+        self.build_time_total = 0.0
+        self.last_build_time = None
+
+    @staticmethod
+    def key(model, config):
+        return (model, tuple(sorted(config.items())))
+
+    def acquire(self, model, **config):
+        """Return (crew, token); pass the token back to release()."""
+        key = self.key(model, config)
+        with self._lock:
+            generation = self._generation
+            idle = self._idle.get(key)
+            if idle:
+                self.reuses += 1
+                return idle.pop(), (key, generation)
+        start_time = time.perf_counter()
+        crew = self.factory(model, **config)
+        elapsed = time.perf_counter() - start_time
+        with self._lock:
+            self.builds += 1
+            self.build_time_total += elapsed
+            self.last_build_time = elapsed
+        return crew, (key, generation)
+
+    def release(self, crew, token, discard=False):
+        """Return a crew to the pool (dropped if discard is set or the pool was invalidated)."""
+        key, generation = token
+        with self._lock:
+            if not discard and generation == self._generation:
+                self._idle.setdefault(key, []).append(crew)
+
+    @contextmanager
+    def crew(self, model, **config):
+        """with pool.crew(model) as crew: ... -- crews that raised are not reused."""
+        crew, token = self.acquire(model, **config)
+        try:
+            yield crew
+        except BaseException:
+            self.release(crew, token, discard=True)
+            raise
+        self.release(crew, token)
+
+    def invalidate(self):
+        """Drop all idle crews and refuse in-flight ones when they come back."""
+        with self._lock:
+            self._generation += 1
+            self._idle.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "reuses": self.reuses,
+                "idle": sum(len(crews) for crews in self._idle.values()),
+                "avg_build_time": self.build_time_total / self.builds if self.builds else None,
+                "last_build_time": self.last_build_time,
+            }
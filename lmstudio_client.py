@@ -0,0 +1,370 @@
+"""Shared HTTP client for the LM Studio OpenAI-compatible API.
+
+v2.py and program.py both talk to LM Studio through one pooled requests.Session, so
+connections are kept alive between calls, every request has a connect/read timeout,
+and transient failures (connection refused, 502/503/504 while a model is loading)
+are retried a bounded number of times with exponential backoff.
+
+With several LM Studio instances (different ports or hosts), EndpointRouter stands in
+for the client: each request goes to the healthy instance with the fewest outstanding
+requests, endpoints that keep failing are ejected until a health check passes again,
+and per-endpoint latency and throughput are tracked.
+
+requests is imported, and the shared client built, on first use rather than at import,
+so the GUIs can configure the client at startup without paying for it before their
+window is shown.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import tracing
+
+# ===================== Defaults =======================
+DEFAULT_BASE_URL = "http://localhost:1234/v1"
+CONNECT_TIMEOUT = 3.05   # seconds to establish the TCP connection
+READ_TIMEOUT = 120.0     # seconds to wait between bytes from the server (generation can be slow)
+MAX_RETRIES = 3          # retries for connection errors and retryable status codes
+BACKOFF_FACTOR = 0.5     # sleep 0.5s, 1s, 2s, ... between retries
+POOL_SIZE = 10           # keep-alive connections kept per host
+RETRY_STATUSES = (502, 503, 504)
+# Multi-endpoint routing
+HEALTH_CHECK_INTERVAL = 10.0   # seconds between /models probes of every endpoint
+HEALTH_CHECK_TIMEOUT = (0.5, 2.0)
+EJECT_AFTER_FAILURES = 3       # consecutive failures before an endpoint stops receiving requests
+THROUGHPUT_WINDOW = 60.0       # seconds of completed requests counted for requests/sec
+
+
+class LMStudioClient:
+    """Pooled, keep-alive HTTP client with timeouts, retries and timing hooks."""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE, connect_retries=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self._hooks = []
+        # Read errors are never retried: the server may already be generating, and a
+        # retried POST would run the whole completion a second time. read=False also makes
+        # a read timeout surface as ReadTimeout rather than a ConnectionError.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries if connect_retries is None else connect_retries,
+            read=False,
+            status=max_retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # retry POST too; only connect failures and 5xx-before-work qualify
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # LM Studio does not check the key, but OpenAI-compatible clients always send one
+        self.session.headers.update({"Authorization": "Bearer lm-studio"})
+
+    def add_timing_hook(self, hook):
+        """Register hook(method, url, status_code, elapsed) called after every request.
+
+        status_code is None when the request raised. For streamed requests elapsed is
+        the time until the response headers arrived, not until the body was consumed.
+        """
+        self._hooks.append(hook)
+
+    def remove_timing_hook(self, hook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, timeout=None, **kwargs):
+        url = self.url(path)
+        status = None
+        start_time = time.perf_counter()
+        span = tracing.span(f"http {method} {path}", url=url)
+        try:
+            with span as span_args:
+                resp = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                status = resp.status_code
+                if span_args is not None:
+                    span_args["status"] = status
+            return resp
+        finally:
+            elapsed = time.perf_counter() - start_time
+            for hook in list(self._hooks):
+                try:
+                    hook(method, url, status, elapsed)
+                except Exception:
+                    pass  # a broken hook must never break a request
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+# ===================== Multi-endpoint routing =======================
+def _never_sent(error):
+    """True if a requests ConnectionError failed before the request reached the server."""
+    from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+
+    cause = error.args[0] if error.args else None
+    if isinstance(cause, MaxRetryError):
+        cause = cause.reason
+    return isinstance(cause, (NewConnectionError, ConnectTimeoutError))
+
+
+class Endpoint:
+    """One LM Studio instance with its own pooled client and running statistics."""
+
+    def __init__(self, base_url, **settings):
+        # Refused connections fail over to another endpoint right away instead of backing off here
+        self.client = LMStudioClient(base_url, connect_retries=0, **settings)
+        self.base_url = self.client.base_url
+        self.outstanding = 0
+        self.completed = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.ejected = False
+        self.latency_total = 0.0
+        self.last_latency = None
+        self._finished = deque()  # completion times within THROUGHPUT_WINDOW
+
+    def stats(self, now):
+        while self._finished and now - self._finished[0] > THROUGHPUT_WINDOW:
+            self._finished.popleft()
+        return {
+            "base_url": self.base_url,
+            "healthy": not self.ejected,
+            "outstanding": self.outstanding,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_latency": self.latency_total / self.completed if self.completed else None,
+            "last_latency": self.last_latency,
+            "requests_per_sec": len(self._finished) / THROUGHPUT_WINDOW,
+        }
+
+
+class EndpointRouter:
+    """Drop-in replacement for LMStudioClient that spreads requests over several instances.
+
+    Connection failures fail over to the next endpoint. Responses opened with
+    stream=True count as outstanding until they are closed.
+    """
+
+    def __init__(self, base_urls, health_check_interval=HEALTH_CHECK_INTERVAL, **settings):
+        if not base_urls:
+            raise ValueError("EndpointRouter needs at least one base URL")
+        self.endpoints = [Endpoint(url, **settings) for url in base_urls]
+        self.base_url = self.endpoints[0].base_url
+        self.timeout = self.endpoints[0].client.timeout
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Health probes must answer fast and must not retry
+        self._probe = LMStudioClient(max_retries=0)
+        if health_check_interval and len(self.endpoints) > 1:
+            threading.Thread(target=self._health_check_loop, args=(health_check_interval,),
+                             name="endpoint-health", daemon=True).start()
+
+    # ---- routing ----
+    def _pick(self, exclude=()):
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            healthy = [e for e in candidates if not e.ejected]
+            # With every endpoint ejected, still try the least busy one rather than fail outright
+            pool = healthy or candidates
+            if not pool:
+                return None
+            endpoint = min(pool, key=lambda e: (e.outstanding, e.last_latency or 0.0))
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _finish(self, endpoint, elapsed, ok):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.completed += 1
+                endpoint.latency_total += elapsed
+                endpoint.last_latency = elapsed
+                endpoint.consecutive_failures = 0
+                endpoint._finished.append(time.monotonic())
+            else:
+                endpoint.failed += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= EJECT_AFTER_FAILURES:
+                    endpoint.ejected = True
+
+    @contextmanager
+    def lease(self):
+        """Reserve the least busy endpoint for work done outside this client (e.g. a crew run)."""
+        endpoint = self._pick()
+        start_time = time.perf_counter()
+        ok = False
+        try:
+            yield endpoint
+            ok = True
+        finally:
+            self._finish(endpoint, time.perf_counter() - start_time, ok)
+
+    def url(self, path):
+        return self.endpoints[0].client.url(path)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        import requests
+
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._pick(exclude=tried)
+            if endpoint is None:
+                if last_error is None:
+                    raise requests.exceptions.ConnectionError("no healthy LM Studio endpoint to send the request to")
+                raise last_error
+            tried.append(endpoint)
+            start_time = time.perf_counter()
+            try:
+                resp = endpoint.client.request(method, path, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                self._finish(endpoint, time.perf_counter() - start_time, False)
+                if not _never_sent(e):
+                    raise  # the server may have started on it; sending it again could run it twice
+                # Nothing reached the server: safe to send the same request elsewhere
+                last_error = e
+                continue
+            except Exception:
+                self._finish(endpoint, time.perf_counter() - start_time, False)
+                raise
+            ok = resp.status_code < 500
+            if not kwargs.get("stream"):
+                self._finish(endpoint, time.perf_counter() - start_time, ok)
+                return resp
+            # Streamed body: the endpoint stays busy until the caller closes the response
+            close = resp.close
+            closed = []
+
+            def close_and_finish(endpoint=endpoint, start_time=start_time, ok=ok, close=close, closed=closed):
+                if not closed:
+                    closed.append(True)
+                    self._finish(endpoint, time.perf_counter() - start_time, ok)
+                close()
+
+            resp.close = close_and_finish
+            return resp
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    # ---- hooks and reporting ----
+    def add_timing_hook(self, hook):
+        self._hooks.append(hook)
+        for endpoint in self.endpoints:
+            endpoint.client.add_timing_hook(hook)
+
+    def remove_timing_hook(self, hook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+        for endpoint in self.endpoints:
+            endpoint.client.remove_timing_hook(hook)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [endpoint.stats(now) for endpoint in self.endpoints]
+
+    def summary(self):
+        """One-line per-endpoint status for labels."""
+        parts = []
+        for s in self.stats():
+            host = s["base_url"].split("//", 1)[-1].split("/", 1)[0]
+            state = "up" if s["healthy"] else "EJECTED"
+            latency = f"{s['avg_latency']:.2f}s" if s["avg_latency"] is not None else "-"
+            parts.append(f"{host} {state} {s['outstanding']} out, avg {latency}, {s['requests_per_sec'] * 60:.0f}/min")
+        return " | ".join(parts)
+
+    def close(self):
+        self._stop.set()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+        self._probe.close()
+
+    # ---- health checks ----
+    def _health_check_loop(self, interval):
+        import requests
+
+        while not self._stop.wait(interval):
+            for endpoint in self.endpoints:
+                try:
+                    healthy = self._probe.get(endpoint.client.url("models"), timeout=HEALTH_CHECK_TIMEOUT).status_code == 200
+                except requests.exceptions.RequestException:
+                    healthy = False
+                with self._lock:
+                    if healthy:
+                        endpoint.ejected = False
+                        endpoint.consecutive_failures = 0
+                    else:
+                        endpoint.ejected = True
+
+
+# ===================== Shared instance =======================
+_client = None
+_settings = (None, {})   # arguments of the last configure(), applied when the client is next built
+_stale = False           # configure() was called since _client was built
+_client_lock = threading.Lock()
+
+
+def configure(base_urls=None, **settings):
+    """Replace the shared client with one built from settings (see LMStudioClient).
+
+    With more than one entry in base_urls the shared client is an EndpointRouter over them.
+    The client itself is built by the next get_client() call, so this is cheap at import time.
+    """
+    global _settings, _stale
+    with _client_lock:
+        _settings = (list(base_urls) if base_urls else None, dict(settings))
+        _stale = True
+
+
+def is_routed():
+    """Whether the shared client spreads requests over several instances (doesn't build it)."""
+    with _client_lock:
+        base_urls = _settings[0]
+    return bool(base_urls) and len(base_urls) > 1
+
+
+def get_client():
+    """Return the process-wide shared client, building it from the configured settings if needed."""
+    global _client, _stale
+    with _client_lock:
+        if _client is not None and not _stale:
+            return _client
+        base_urls, settings = _settings
+        settings = dict(settings)
+        if base_urls and len(base_urls) > 1:
+            new = EndpointRouter(base_urls, **settings)
+        else:
+            if base_urls:
+                settings["base_url"] = base_urls[0]
+            new = LMStudioClient(**settings)
+        old, _client, _stale = _client, new, False
+    if old is not None:
+        for hook in old._hooks:
+            new.add_timing_hook(hook)
+        old.close()
+    return new
@@ -0,0 +1,294 @@
+"""Control of the local LM Studio server: status, model list, load and unload.
+
+Each operation prefers LM Studio's REST API (/api/v0/models for the model list and
+load state, /api/v1/models/load and /unload on servers that have them) and returns
+structured values. Spawning the `lms` CLI costs a process start plus CLI startup per
+call, and its text output changes between versions, so it is only the fallback: when
+the server isn't running (the CLI can still list models) or doesn't have the endpoint
+(remembered for the rest of the session). Starting and stopping the server always
+go through the CLI. Every call is timed per operation and transport, so the overhead
+of the two paths can be compared:
+
+    python lmstudio_control.py bench --runs 10
+    python lmstudio_control.py bench --model qwen2.5-7b-instruct   # also load/unload
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+import lmstudio_client
+import lmstudio_core
+import tracing
+from benchmark import percentile
+
+LOAD_TIMEOUT = 600.0     # seconds to wait for a model load over REST
+REST_TIMEOUT = (1.0, 10.0)
+TIMING_HISTORY = 200     # calls kept per (operation, transport)
+MISSING_STATUSES = (405, 501)  # the server doesn't have this endpoint...
+UNKNOWN_ENDPOINT_TEXT = "Unexpected endpoint"  # ...nor does a 404 saying this (a 404 may also mean "no such model")
+# load() options and the `lms load` flags they map to on the CLI path
+CLI_LOAD_FLAGS = {"context_length": "--context-length", "gpu": "--gpu", "ttl": "--ttl"}
+
+
+class RestUnavailable(Exception):
+    """The REST path can't serve this call (server down or endpoint missing); use the CLI."""
+
+
+class UnsupportedOption(ValueError):
+    """A load() option the lms CLI has no flag for (the REST path passes every option through)."""
+
+
+class ServerControl:
+    """Status, model list and load/unload for one local server; thread-safe.
+
+    Operations raise RuntimeError with the server's or the CLI's message when a load or
+    unload fails, and RuntimeError naming both transports when the REST API can't serve a
+    call and the CLI is missing. Only CLI-only calls (transport="cli", start/stop) raise
+    FileNotFoundError for a missing CLI.
+    """
+
+    def __init__(self, base_url=lmstudio_client.DEFAULT_BASE_URL, load_timeout=LOAD_TIMEOUT):
+        root_url = base_url.rstrip("/")
+        # The REST API lives next to the OpenAI-compatible /v1 routes
+        self.root_url = root_url[:-len("/v1")] if root_url.endswith("/v1") else root_url
+        self.load_timeout = load_timeout
+        self._client = None   # built on first use, like the shared client
+        self._missing = set()  # operations whose REST endpoint this server doesn't have
+        self._timings = {}     # (operation, transport) -> deque of seconds
+        self._sizes = {}       # model -> bytes on disk, from `lms ls --json`
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = lmstudio_client.LMStudioClient(
+                self.root_url, connect_timeout=REST_TIMEOUT[0], read_timeout=REST_TIMEOUT[1], max_retries=0)
+        return self._client
+
+    # ---- operations ----
+    def status(self):
+        """{"running": bool, "loaded": [model, ...]}."""
+        return self.call("status")
+
+    def list_models(self):
+        """Names of the models available to load."""
+        return self.call("list_models")
+
+    def loaded_models(self):
+        return self.call("loaded_models")
+
+    def load(self, model, **options):
+        """Load model (options: context_length, gpu, ttl; cpu_threads over REST only); returns the seconds it took."""
+        start_time = time.perf_counter()
+        self.call("load", model, options)
+        return time.perf_counter() - start_time
+
+    def unload(self, model):
+        self.call("unload", model)
+
+    def start_server(self):
+        result = self._timed("start_server", "cli", lmstudio_core.run_lms, "server", "start")
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr if result.stderr else result.stdout)
+
+    def stop_server(self):
+        self._timed("stop_server", "cli", lmstudio_core.run_lms, "server", "stop")
+
+    def model_sizes(self, refresh=False):
+        """{model: bytes on disk}; read once from `lms ls --json` (REST doesn't report sizes)."""
+        with self._lock:
+            sizes = self._sizes
+        if refresh or not sizes:
+            sizes = self._timed("model_sizes", "cli", lmstudio_core.cli_model_sizes)
+            with self._lock:
+                self._sizes = sizes
+        return dict(sizes)
+
+    def call(self, operation, *args, transport=None):
+        """Run an operation over REST, falling back to the CLI; transport forces one of them."""
+        if transport == "rest" and operation in self._missing:
+            raise RestUnavailable(f"the server has no REST endpoint for {operation}")
+        rest_error = None
+        if transport != "cli":
+            if operation in self._missing:
+                rest_error = f"the server has no REST endpoint for {operation}"
+            else:
+                try:
+                    return self._timed(operation, "rest", getattr(self, f"_{operation}_rest"), *args)
+                except RestUnavailable as e:
+                    if transport == "rest":
+                        raise
+                    rest_error = str(e)
+        try:
+            return self._timed(operation, "cli", getattr(self, f"_{operation}_cli"), *args)
+        except FileNotFoundError as e:
+            if rest_error is None:
+                raise
+            raise RuntimeError(f"{operation} failed: LM Studio's REST API is unavailable ({rest_error}) "
+                               f"and the lms CLI was not found") from e
+
+    # ---- reporting ----
+    def stats(self):
+        """Per (operation, transport): calls, mean/p50/max seconds over the recent calls."""
+        with self._lock:
+            timings = {key: list(values) for key, values in self._timings.items()}
+        rows = []
+        for (operation, transport), values in sorted(timings.items()):
+            rows.append({"operation": operation, "transport": transport, "calls": len(values),
+                         "mean": sum(values) / len(values), "p50": percentile(values, 50), "max": max(values)})
+        return rows
+
+    def summary(self):
+        """One line per operation and transport for message boxes, e.g. "load: rest 2 x 1200 ms"."""
+        lines = []
+        for r in self.stats():
+            lines.append(f"{r['operation']}: {r['transport']} {r['calls']} x {r['mean'] * 1000:.0f} ms")
+        return "\n".join(lines)
+
+    # ---- internals ----
+    def _timed(self, operation, transport, fn, *args):
+        start_time = time.perf_counter()
+        try:
+            with tracing.span(f"control {operation}", transport=transport):
+                return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                self._timings.setdefault((operation, transport), deque(maxlen=TIMING_HISTORY)).append(elapsed)
+
+    def _rest(self, operation, method, path, timeout=None, **kwargs):
+        """Send a REST request; raises RestUnavailable when the CLI should handle it instead."""
+        import requests
+
+        try:
+            response = self.client.request(method, path, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            raise RestUnavailable(str(e)) from e
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"{method} {path} failed: {e}") from e
+        if response.status_code in MISSING_STATUSES or (
+                response.status_code == 404 and UNKNOWN_ENDPOINT_TEXT in response.text):
+            self._missing.add(operation)
+            raise RestUnavailable(f"HTTP {response.status_code} for {path}")
+        return response
+
+    def _rest_models(self, operation):
+        response = self._rest(operation, "GET", "api/v0/models")
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+        with tracing.span("parse rest models"):
+            return [m for m in response.json()["data"] if isinstance(m, dict) and m.get("id")]
+
+    def _status_rest(self):
+        try:
+            models = self._rest_models("status")
+        except RestUnavailable:
+            if "status" in self._missing:
+                raise
+            return {"running": False, "loaded": []}  # nothing listening: no need to ask the CLI
+        return {"running": True, "loaded": [m["id"] for m in models if m.get("state") == "loaded"]}
+
+    def _status_cli(self):
+        result = lmstudio_core.run_lms("server", "status", "--json")
+        try:
+            running = bool(json.loads(result.stdout).get("running"))
+        except (ValueError, AttributeError):
+            running = "ON" in result.stdout.upper().split()
+        return {"running": running, "loaded": self._loaded_models_cli() if running else []}
+
+    def _list_models_rest(self):
+        return [m["id"] for m in self._rest_models("list_models")]
+
+    def _list_models_cli(self):
+        return lmstudio_core.list_cli_models()
+
+    def _loaded_models_rest(self):
+        return [m["id"] for m in self._rest_models("loaded_models") if m.get("state") == "loaded"]
+
+    def _loaded_models_cli(self):
+        result = lmstudio_core.run_lms("ps", "--json")
+        if result.returncode != 0:
+            return []
+        try:
+            data = json.loads(result.stdout)
+        except ValueError:
+            return []
+        return [m.get("identifier") or m.get("modelKey") or m.get("path")
+                for m in data if isinstance(m, dict)]
+
+    def _load_rest(self, model, options):
+        body = dict(options, model=model)
+        response = self._rest("load", "POST", "api/v1/models/load", json=body,
+                              timeout=(REST_TIMEOUT[0], self.load_timeout))
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+
+    def _load_cli(self, model, options):
+        flags = []
+        for key, value in options.items():
+            if key not in CLI_LOAD_FLAGS:
+                raise UnsupportedOption(f"lms load has no option for {key}")
+            flags += [CLI_LOAD_FLAGS[key], str(value)]
+        # -y auto-confirms; without --gpu the CLI uses max GPU offload
+        result = lmstudio_core.run_lms("load", model, "-y", *flags)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr if result.stderr else result.stdout)
+
+    def _unload_rest(self, model):
+        # A model loaded without an explicit identifier has its model key as instance id
+        response = self._rest("unload", "POST", "api/v1/models/unload", json={"instance_id": model})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+
+    def _unload_cli(self, model):
+        result = lmstudio_core.run_lms("unload", model)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr if result.stderr else result.stdout)
+
+
+def format_table(rows):
+    lines = [f"{'operation':<14} {'transport':<9} {'calls':>5} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}"]
+    for r in rows:
+        lines.append(f"{r['operation']:<14} {r['transport']:<9} {r['calls']:>5} {r['mean'] * 1000:>9.1f} "
+                     f"{r['p50'] * 1000:>9.1f} {r['max'] * 1000:>9.1f}")
+    return "\n".join(lines)
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-call overhead of LM Studio control over REST and the lms CLI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="time status/list/loaded (and load/unload with --model) on both paths")
+    bench.add_argument("--runs", type=int, default=5)
+    bench.add_argument("--base-url", default=lmstudio_client.DEFAULT_BASE_URL)
+    bench.add_argument("--model", help="also time loading and unloading this model")
+    bench.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    control = ServerControl(args.base_url)
+    control.client  # build it (importing requests) up front so the first REST call isn't charged for that
+    calls = [("status",), ("list_models",), ("loaded_models",)]
+    if args.model:
+        calls += [("load", args.model, {}), ("unload", args.model)]
+    errors = []
+    for transport in ("cli", "rest"):
+        for _ in range(max(1, args.runs)):
+            for operation, *call_args in calls:
+                try:
+                    control.call(operation, *call_args, transport=transport)
+                except (RestUnavailable, FileNotFoundError, RuntimeError, ValueError) as e:
+                    errors.append(f"{operation} over {transport}: {e}")
+    if args.json:
+        print(json.dumps(control.stats(), indent=2))
+    else:
+        print(format_table(control.stats()))
+    for error in sorted(set(errors)):
+        print(f"FAIL {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""GUI-free request and parsing paths shared by v2.py, program.py and the benchmarks.
+
+Everything here talks to the OpenAI-compatible API through lmstudio_client (or to
+the `lms` CLI) and returns plain values, so it can be imported and exercised
+without Tk or a real LM Studio install.
+"""
+import json
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Optional
+
+import lmstudio_client
+import tracing
+
+DEFAULT_MAX_TOKENS = 100
+DEFAULT_TEMPERATURE = 0.7
+
+
+class CompletionError(Exception):
+    """The server answered with a non-200 status."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"HTTP {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class RequestCancelled(Exception):
+    """A request was cancelled through its CancelToken, or ran past its deadline."""
+
+    def __init__(self, reason):
+        super().__init__("deadline exceeded" if reason == "deadline" else reason)
+        self.reason = reason  # "cancelled" (or a caller-supplied reason) or "deadline"
+
+
+class CancelToken:
+    """Lets another thread abort a request, and optionally bounds it with a deadline.
+
+    Aborting a streamed request shuts its connection down: the reading thread wakes
+    up at once and LM Studio sees the client go away, so it stops generating. A
+    blocking (non-streamed) request can only be abandoned; the deadline bounds how
+    long the caller waits for it.
+    """
+
+    def __init__(self, timeout=None):
+        self.deadline = None
+        self.reason = None
+        self._response = None
+        self._timer = None
+        self._lock = threading.Lock()
+        if timeout is not None:
+            self.set_timeout(timeout)
+
+    def set_timeout(self, timeout):
+        """Start (or restart) the deadline: the request may take timeout seconds from now."""
+        self.deadline = time.monotonic() + timeout
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def remaining(self):
+        """Seconds left before the deadline (None without one)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason="cancelled"):
+        """Abort the request from any thread; no-op once it has finished."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            response = self._response
+        if response is not None:
+            _abort(response)
+
+    def check(self):
+        """Raise RequestCancelled if the request was cancelled or its deadline has passed."""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "deadline"
+        if self.reason is not None:
+            raise RequestCancelled(self.reason)
+
+    def timeout(self, default):
+        """(connect, read) timeout for the next request, with the read part capped at the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        connect, read = default
+        return connect, max(0.001, min(read, remaining))
+
+    @contextmanager
+    def attach(self, response):
+        """While active, cancel() (or the deadline passing) aborts response."""
+        with self._lock:
+            self._response = response
+            cancelled = self.reason is not None
+        if cancelled:
+            _abort(response)
+        elif self.deadline is not None:
+            self._timer = threading.Timer(self.remaining(), self.cancel, args=("deadline",))
+            self._timer.daemon = True
+            self._timer.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._response = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def _abort(response):
+    """Shut a streamed response's socket down, waking a thread blocked reading it."""
+    try:
+        sock = response.raw._fp.fp.raw._sock  # urllib3 -> http.client -> socket.SocketIO
+        sock.shutdown(socket.SHUT_RDWR)
+    except (AttributeError, OSError):
+        response.close()  # not a plain socket underneath: closing at least ends the read loop
+
+
+@dataclass
+class CompletionResult:
+    text: str
+    elapsed: float                 # seconds from sending the request to the last byte
+    ttft: Optional[float] = None   # seconds to the first token (streaming only)
+    tokens: int = 0                # completion tokens (usage if reported, else streamed chunks)
+
+    @property
+    def tokens_per_sec(self):
+        """Generation rate after the first token, or None if it can't be measured."""
+        if self.ttft is None or not self.tokens:
+            return None
+        gen_time = self.elapsed - self.ttft
+        return self.tokens / gen_time if gen_time > 0 else None
+
+
+# ===================== Payloads and parsing =======================
+def build_completion_payload(prompt, model=None, max_tokens=DEFAULT_MAX_TOKENS,
+                             temperature=DEFAULT_TEMPERATURE, stream=False, **params):
+    """Request body for /v1/completions; extra OpenAI parameters (top_p, stop, ...) pass through."""
+    payload = {
+        "model": model or "",  # LM Studio answers with the loaded model anyway
+        "prompt": prompt,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    payload.update(params)
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def sampling_params(payload):
+    """Everything in a payload that affects the generated text except model and prompt."""
+    return {k: v for k, v in payload.items() if k not in ("model", "prompt", "stream")}
+
+
+def choice_text(choice):
+    """Text fragment of one completion choice (full response or streamed chunk)."""
+    # Completion models use choices[0].text; chat models use message.content (or delta.content when streaming)
+    if "text" in choice:
+        return choice["text"] or ""
+    for key in ("message", "delta"):
+        if key in choice and choice[key].get("content"):
+            return choice[key]["content"]
+    return ""
+
+
+def parse_completion(data):
+    """Text of the first choice of a decoded completion response."""
+    choices = data.get("choices") or []
+    return choice_text(choices[0]) if choices else ""
+
+
+def parse_sse_line(line):
+    """Decode one server-sent-events line.
+
+    Returns the JSON chunk, the string "[DONE]" at end of stream, or None for
+    keep-alives, comments and malformed frames.
+    """
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return data
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def parse_embeddings(data):
+    """Embedding vectors of a decoded /v1/embeddings response, in input order."""
+    items = sorted(data["data"], key=lambda item: item.get("index", 0))
+    return [item["embedding"] for item in items]
+
+
+def parse_model_list(data):
+    """Model ids from a /v1/models response body; raises KeyError on unexpected shapes."""
+    return [model["id"] for model in data["data"]]
+
+
+def parse_lms_ls_text(stdout):
+    """Model names from the human-readable `lms ls` listing."""
+    models = []
+    for line in stdout.strip().splitlines():
+        # ignore empty lines or header lines if any
+        if line.strip() and "Models directory" not in line:
+            # split at ':' if output like 'ModelName: ...'
+            models.append(line.split(":")[0].strip())
+    return models
+
+
+def parse_lms_ls(stdout):
+    """Model names from `lms ls --json` output, falling back to the plain-text format."""
+    try:
+        data = json.loads(stdout)
+    except ValueError:
+        return parse_lms_ls_text(stdout)
+    # Some JSON entries might have 'name' or 'filename'; handle accordingly
+    return [m.get("name") or m.get("filename") or str(m) for m in data]
+
+
+def parse_lms_ls_sizes(stdout):
+    """{model name: size in bytes} from `lms ls --json` output; entries without a size are skipped."""
+    try:
+        data = json.loads(stdout)
+    except ValueError:
+        return {}
+    return {m.get("name") or m.get("filename"): m["sizeBytes"]
+            for m in data if isinstance(m, dict) and m.get("sizeBytes")}
+
+
+# ===================== Requests =======================
+def complete(payload, client=None, cancel=None):
+    """Blocking completion request; returns a CompletionResult or raises CompletionError.
+
+    With a CancelToken, waiting stops at its deadline and a cancelled request raises
+    RequestCancelled (the server still finishes generating it).
+    """
+    import requests
+
+    client = client or lmstudio_client.get_client()
+    payload = dict(payload, stream=False)
+    timeout = None
+    if cancel is not None:
+        cancel.check()
+        timeout = cancel.timeout(client.timeout)
+    start_time = time.perf_counter()
+    try:
+        resp = client.post("completions", json=payload, timeout=timeout)
+    except requests.exceptions.RequestException:
+        # Reads cut short by the deadline surface as timeouts (or connection errors after retries)
+        if cancel is not None:
+            cancel.check()
+        raise
+    elapsed = time.perf_counter() - start_time
+    if cancel is not None and cancel.cancelled:
+        raise RequestCancelled(cancel.reason)
+    if resp.status_code != 200:
+        raise CompletionError(resp.status_code, resp.text)
+    with tracing.span("parse completion json", bytes=len(resp.content)):
+        try:
+            data = resp.json()
+        except ValueError:
+            # Not JSON or unexpected format
+            return CompletionResult(text=resp.text, elapsed=elapsed)
+        usage = data.get("usage") or {}
+        return CompletionResult(text=parse_completion(data), elapsed=elapsed,
+                                tokens=usage.get("completion_tokens", 0))
+
+
+def stream_completion(payload, on_text=None, client=None, cancel=None):
+    """Streaming completion request.
+
+    on_text(fragment) is called from the calling thread for every token as it arrives.
+    Returns a CompletionResult with the full text, TTFT and token count. With a
+    CancelToken, cancel() or its deadline aborts the stream and RequestCancelled is
+    raised; the tokens received so far have already gone to on_text.
+    """
+    import requests
+
+    client = client or lmstudio_client.get_client()
+    payload = dict(payload, stream=True)
+    timeout = None
+    if cancel is not None:
+        cancel.check()
+        timeout = cancel.timeout(client.timeout)
+    start_time = time.perf_counter()
+    first_token_time = None
+    token_count = 0
+    usage_tokens = None
+    pieces = []
+    parse_time = 0.0  # per-chunk SSE parsing is summed into the span instead of one span per token
+    try:
+        with tracing.span("stream completion") as span_args, \
+                client.post("completions", json=payload, stream=True, timeout=timeout) as resp, \
+                (cancel.attach(resp) if cancel is not None else nullcontext()):
+            if resp.status_code != 200:
+                raise CompletionError(resp.status_code, resp.text)
+            # text/event-stream carries no charset, so requests would fall back to ISO-8859-1
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if cancel is not None and cancel.cancelled:
+                    break
+                parse_start = time.perf_counter()
+                chunk = parse_sse_line(line)
+                parse_time += time.perf_counter() - parse_start
+                if chunk is None:
+                    continue
+                if chunk == "[DONE]":
+                    break
+                if chunk.get("usage"):
+                    usage_tokens = chunk["usage"].get("completion_tokens", usage_tokens)
+                text = parse_completion(chunk)
+                if not text:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                token_count += 1  # LM Studio sends one token per chunk
+                pieces.append(text)
+                if on_text is not None:
+                    on_text(text)
+            if span_args is not None:
+                span_args.update(tokens=token_count, parse_ms=round(parse_time * 1000, 3))
+    except requests.exceptions.RequestException:
+        # An aborted stream, or a read cut short by the deadline, surfaces as a connection or read error
+        if cancel is not None:
+            cancel.check()
+        raise
+    if cancel is not None and cancel.cancelled:
+        raise RequestCancelled(cancel.reason)
+    elapsed = time.perf_counter() - start_time
+    ttft = first_token_time - start_time if first_token_time is not None else None
+    return CompletionResult(text="".join(pieces), elapsed=elapsed, ttft=ttft,
+                            tokens=usage_tokens or token_count)
+
+
+def embed(texts, model=None, client=None):
+    """Embedding vectors for texts from /v1/embeddings (needs an embedding model in LM Studio).
+
+    Raises CompletionError on a non-200 answer, requests.exceptions.RequestException
+    on transport errors and KeyError/ValueError when the body can't be parsed.
+    """
+    client = client or lmstudio_client.get_client()
+    with tracing.span("embeddings", count=len(texts)):
+        resp = client.post("embeddings", json={"model": model or "", "input": list(texts)})
+    if resp.status_code != 200:
+        raise CompletionError(resp.status_code, resp.text)
+    return parse_embeddings(resp.json())
+
+
+def run_lms(*args):
+    """Run an `lms` CLI command (captured text output), traced as "lms <command>".
+
+    Raises FileNotFoundError when the CLI is missing.
+    """
+    command = " ".join(args[:2]) if args and args[0] == "server" else (args[0] if args else "")
+    with tracing.span(f"lms {command}", args=" ".join(args)) as span_args:
+        result = subprocess.run(["lms", *args], capture_output=True, text=True)
+        if span_args is not None:
+            span_args["returncode"] = result.returncode
+        return result
+
+
+def list_cli_models():
+    """Models known to the `lms` CLI; raises FileNotFoundError when the CLI is missing."""
+    result = run_lms("ls", "--json")
+    if result.returncode == 0:
+        with tracing.span("parse lms ls"):
+            return parse_lms_ls(result.stdout)
+    # If the CLI returned an error (perhaps --json not supported), try without JSON
+    result = run_lms("ls")
+    if result.returncode == 0:
+        return parse_lms_ls_text(result.stdout)
+    return []
+
+
+def cli_model_sizes():
+    """On-disk model sizes reported by `lms ls --json`; empty when the CLI can't report them."""
+    try:
+        result = run_lms("ls", "--json")
+    except FileNotFoundError:
+        return {}
+    return parse_lms_ls_sizes(result.stdout) if result.returncode == 0 else {}
+
+
+def list_models(client=None):
+    """Ids of the models the server exposes on /v1/models.
+
+    Raises requests.exceptions.RequestException on transport/HTTP errors and
+    KeyError/ValueError when the body can't be parsed.
+    """
+    client = client or lmstudio_client.get_client()
+    response = client.get("models")
+    response.raise_for_status()
+    with tracing.span("parse model list json"):
+        return parse_model_list(response.json())
@@ -0,0 +1,258 @@
+"""Load-parameter autotuner: find the `lms load` settings that run a model fastest here.
+
+Loading with the defaults means max GPU offload, the model's default context length and
+LM Studio's default thread count, which is rarely best on CPU-only machines. autotune()
+loads the model once per candidate setting, runs a short fixed prompt against it and
+records the load time, tokens/sec and the peak RSS of the LM Studio processes (sampled
+with psutil while the trial runs). Settings are swept one option at a time (context
+length, then CPU threads, then GPU offload ratio), each starting from the best found so
+far, so a sweep costs one load per candidate value rather than one per combination. The
+winner is the fastest trial; trials within TOLERANCE of it are ranked by lower peak RSS
+and then by load time.
+
+The best setting per model is saved in cache/load_profiles.json; v2.py's Load Model
+applies it automatically. Options the server or CLI can't apply (the lms CLI has no
+thread-count flag, so threads are only tuned over the REST API) end that option's sweep.
+
+    python load_autotuner.py tune qwen2.5-7b-instruct --contexts 4096,8192 --runs 2
+    python load_autotuner.py show
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import lmstudio_client
+import lmstudio_core
+import tracing
+from lmstudio_control import ServerControl, UnsupportedOption
+from metrics_sampler import MetricsSampler
+
+DEFAULT_PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "load_profiles.json")
+AUTOTUNE_PROMPT = "Explain in one paragraph how a hash map handles collisions."
+AUTOTUNE_MAX_TOKENS = 64
+AUTOTUNE_RUNS = 2              # timed prompts per trial (after a one-token warm-up)
+CONTEXT_LENGTHS = (4096, 8192, 16384)
+GPU_OFFLOADS = ("off", 0.5, "max")  # `lms load --gpu` values: off, a 0-1 ratio, or max
+RSS_SAMPLE_INTERVAL = 0.1      # seconds between RSS samples during a trial
+TOLERANCE = 0.05               # trials this close to the fastest count as equally fast
+
+
+def thread_counts():
+    """Candidate CPU thread counts: half the physical cores, all physical cores, all logical ones."""
+    import psutil
+
+    logical = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+    physical = psutil.cpu_count(logical=False) or logical
+    return tuple(sorted({max(1, physical // 2), physical, logical}))
+
+
+def default_sweep():
+    """[(option, candidate values), ...] in the order they are tuned."""
+    return [("context_length", CONTEXT_LENGTHS), ("cpu_threads", thread_counts()), ("gpu", GPU_OFFLOADS)]
+
+
+def max_trials():
+    """Most loads default_sweep() can cost (the baseline plus every candidate), without importing psutil."""
+    return 1 + len(CONTEXT_LENGTHS) + 3 + len(GPU_OFFLOADS)  # thread_counts() yields at most 3
+
+
+def run_trial(control, model, options, prompt=AUTOTUNE_PROMPT, runs=AUTOTUNE_RUNS,
+              max_tokens=AUTOTUNE_MAX_TOKENS):
+    """Load model with options, time the prompt and unload it again.
+
+    Returns {"options", "load_time", "tokens_per_sec", "peak_rss", "error", "unsupported"};
+    error is the failure message (the measurements are then None where unknown) and
+    unsupported is set when the CLI has no flag for one of the options.
+    """
+    trial = {"options": dict(options), "load_time": None, "tokens_per_sec": None, "peak_rss": None,
+             "error": None, "unsupported": False}
+    sampler = MetricsSampler(interval=RSS_SAMPLE_INTERVAL)
+    sampler.start()
+    try:
+        with tracing.span("autotune trial", model=model, options=json.dumps(options)):
+            trial["load_time"] = control.load(model, **options)
+            payload = lmstudio_core.build_completion_payload(prompt, model=model, max_tokens=max_tokens)
+            lmstudio_core.complete(dict(payload, max_tokens=1))  # warm-up, not timed
+            rates = []
+            for _ in range(max(1, runs)):
+                rate = lmstudio_core.stream_completion(payload).tokens_per_sec
+                if rate:
+                    rates.append(rate)
+            trial["tokens_per_sec"] = sum(rates) / len(rates) if rates else None
+    except Exception as e:
+        trial["error"] = str(e) or type(e).__name__
+        trial["unsupported"] = isinstance(e, UnsupportedOption)
+    finally:
+        sampler.stop()
+        try:
+            control.unload(model)
+        except (FileNotFoundError, RuntimeError):
+            pass  # nothing loaded (the load failed) or the server went away
+    peak = max((sample["server_rss"] for sample in sampler.history()), default=0)
+    trial["peak_rss"] = peak or None  # 0: no LM Studio process was found
+    return trial
+
+
+def best_trial(trials, tolerance=TOLERANCE):
+    """The fastest successful trial; near-ties go to lower peak RSS, then faster load."""
+    measured = [t for t in trials if t["error"] is None and t["tokens_per_sec"]]
+    if not measured:
+        return None
+    fastest = max(t["tokens_per_sec"] for t in measured)
+    close = [t for t in measured if t["tokens_per_sec"] >= fastest * (1 - tolerance)]
+    return min(close, key=lambda t: (t["peak_rss"] or float("inf"), t["load_time"] or 0.0))
+
+
+def autotune(control, model, sweep=None, on_trial=None, **trial_settings):
+    """Sweep load options for model; returns (best trial or None, all trials).
+
+    Starts with a trial at the defaults. on_trial(trial, number, total) is called after
+    every trial; trial_settings (prompt, runs, max_tokens) go to run_trial.
+    """
+    sweep = default_sweep() if sweep is None else sweep
+    total = 1 + sum(len(values) for _, values in sweep)
+    trials = []
+
+    def trial(options):
+        result = run_trial(control, model, options, **trial_settings)
+        trials.append(result)
+        if on_trial is not None:
+            on_trial(result, len(trials), total)
+        return result
+
+    best = best_trial([trial({})])
+    for option, values in sweep:
+        base = dict(best["options"]) if best is not None else {}
+        candidates = [best] if best is not None else []
+        for value in values:
+            result = trial(dict(base, **{option: value}))
+            if result["unsupported"]:
+                break  # the CLI can't apply this option at all; the other values would fail too
+            candidates.append(result)
+        best = best_trial(candidates) or best
+    return best, trials
+
+
+class LoadProfiles:
+    """Best load options per model, kept in a small JSON file. Thread-safe."""
+
+    def __init__(self, path=DEFAULT_PROFILES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._profiles = dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            pass  # no profiles saved yet
+
+    def get(self, model):
+        """The saved profile of model (options plus the measurements behind it), or None."""
+        with self._lock:
+            profile = self._profiles.get(model)
+            return dict(profile) if profile is not None else None
+
+    def options(self, model):
+        """load() options for model; empty (LM Studio defaults) without a profile."""
+        profile = self.get(model)
+        return dict(profile["options"]) if profile is not None else {}
+
+    def save(self, model, trial, trials=None):
+        with self._lock:
+            self._profiles[model] = {
+                "options": dict(trial["options"]),
+                "load_time": trial["load_time"],
+                "tokens_per_sec": trial["tokens_per_sec"],
+                "peak_rss": trial["peak_rss"],
+                "trials": len(trials) if trials is not None else None,
+                "tuned_at": time.time(),
+            }
+            self._write()
+
+    def all(self):
+        with self._lock:
+            return {model: dict(profile) for model, profile in self._profiles.items()}
+
+    # ---- internals (call with self._lock held) ----
+    def _write(self):
+        # Write to a temp file and rename so a crash never leaves a half-written file
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._profiles, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def format_options(options):
+    return ", ".join(f"{key}={value}" for key, value in options.items()) or "defaults"
+
+
+def format_trial(trial):
+    if trial["error"] is not None:
+        return f"{format_options(trial['options'])}: failed ({trial['error'][:80]})"
+    rate = f"{trial['tokens_per_sec']:.1f} tok/s" if trial["tokens_per_sec"] else "n/a tok/s"
+    rss = f"{trial['peak_rss'] / (1024**3):.1f} GB" if trial["peak_rss"] else "n/a"
+    return f"{format_options(trial['options'])}: {rate}, load {trial['load_time']:.1f}s, peak RSS {rss}"
+
+
+def _parse_values(text, convert):
+    return tuple(convert(value) for value in text.split(",") if value.strip())
+
+
+def _gpu_value(text):
+    text = text.strip()
+    return text if text in ("off", "max") else float(text)
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the fastest `lms load` settings for a model on this machine.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tune = sub.add_parser("tune", help="sweep load options for a model and save the best profile")
+    tune.add_argument("model")
+    tune.add_argument("--base-url", default=lmstudio_client.DEFAULT_BASE_URL)
+    tune.add_argument("--contexts", help="comma-separated context lengths (empty to skip)",
+                      default=",".join(map(str, CONTEXT_LENGTHS)))
+    tune.add_argument("--threads", help="comma-separated CPU thread counts (default: from the core count)")
+    tune.add_argument("--gpu", help="comma-separated offload values: off, max or a 0-1 ratio",
+                      default=",".join(map(str, GPU_OFFLOADS)))
+    tune.add_argument("--runs", type=int, default=AUTOTUNE_RUNS, help="timed prompts per setting")
+    tune.add_argument("--profiles", default=DEFAULT_PROFILES_PATH)
+    tune.add_argument("--json", action="store_true", help="print the trials as JSON")
+    show = sub.add_parser("show", help="list the saved profiles")
+    show.add_argument("--profiles", default=DEFAULT_PROFILES_PATH)
+    args = parser.parse_args(argv)
+
+    profiles = LoadProfiles(args.profiles)
+    if args.command == "show":
+        for model, profile in sorted(profiles.all().items()):
+            print(f"{model}: {format_trial(dict(profile, error=None))}")
+        return 0
+
+    lmstudio_client.configure(base_url=args.base_url)
+    threads = _parse_values(args.threads, int) if args.threads is not None else thread_counts()
+    sweep = [("context_length", _parse_values(args.contexts, int)), ("cpu_threads", threads),
+             ("gpu", _parse_values(args.gpu, _gpu_value))]
+    sweep = [(option, values) for option, values in sweep if values]
+
+    def progress(trial, number, total):
+        if not args.json:
+            print(f"[{number}/{total}] {format_trial(trial)}", flush=True)
+
+    best, trials = autotune(ServerControl(args.base_url), args.model, sweep, on_trial=progress, runs=args.runs)
+    if args.json:
+        print(json.dumps({"best": best, "trials": trials}, indent=2))
+    if best is None:
+        print(f"FAIL no setting of {args.model} could be measured", file=sys.stderr)
+        return 1
+    profiles.save(args.model, best, trials)
+    if not args.json:
+        print(f"Best: {format_trial(best)} (saved to {args.profiles})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
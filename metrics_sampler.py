@@ -0,0 +1,182 @@
+"""Background host and LM Studio process metrics with history and export.
+
+A sampler thread records system CPU/memory and the CPU, RSS and thread count of the
+LM Studio server processes into a fixed-size ring buffer, so the Tk thread never
+calls psutil itself. Query start/end events are recorded alongside, and every sample
+carries the number of queries in flight, so resource usage can be lined up with
+inference activity. History exports as CSV; the latest values as a Prometheus
+text-format file (e.g. for node_exporter's textfile collector). psutil is imported on
+the sampler thread, so creating and starting a sampler adds nothing to GUI startup.
+"""
+import csv
+import os
+import threading
+import time
+from collections import deque
+
+SAMPLE_INTERVAL = 1.0      # seconds between samples
+HISTORY_SIZE = 3600        # samples kept (one hour at the default interval)
+EVENT_HISTORY_SIZE = 10000
+PROCESS_RESCAN_EVERY = 10  # re-discover server processes every N samples
+# Lower-case substrings of process names that belong to the LM Studio server
+SERVER_PROCESS_NAMES = ("lm studio", "lmstudio", "lm-studio", "llmster")
+
+SAMPLE_FIELDS = ("ts", "cpu_percent", "mem_percent", "mem_used", "mem_available", "mem_total",
+                 "server_cpu_percent", "server_rss", "server_threads", "server_processes",
+                 "active_queries", "events")
+
+
+class MetricsSampler:
+    """Samples metrics on a daemon thread; all public methods are thread-safe."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, history_size=HISTORY_SIZE,
+                 process_names=SERVER_PROCESS_NAMES):
+        self.interval = interval
+        self.process_names = tuple(name.lower() for name in process_names)
+        self.samples = deque(maxlen=history_size)
+        self.events = deque(maxlen=EVENT_HISTORY_SIZE)
+        self.queries_started = 0
+        self.queries_finished = 0
+        self._active = 0
+        self._pending_events = []   # event names since the last sample
+        self._server_procs = {}     # pid -> psutil.Process (kept for cpu_percent deltas)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ---- events ----
+    def mark(self, event, **fields):
+        """Record a named event (e.g. "query_start") with optional fields."""
+        with self._lock:
+            if event == "query_start":
+                self._active += 1
+                self.queries_started += 1
+            elif event == "query_end":
+                self._active = max(0, self._active - 1)
+                self.queries_finished += 1
+            self.events.append((time.time(), event, fields))
+            self._pending_events.append(event)
+
+    # ---- reading ----
+    def latest(self):
+        with self._lock:
+            return dict(self.samples[-1]) if self.samples else None
+
+    def history(self):
+        with self._lock:
+            return [dict(sample) for sample in self.samples]
+
+    # ---- export ----
+    def export_csv(self, samples_path, events_path=None):
+        """Write the sample history (and optionally the event log) as CSV files."""
+        with self._lock:
+            samples = list(self.samples)
+            events = list(self.events)
+        with open(samples_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=SAMPLE_FIELDS)
+            writer.writeheader()
+            writer.writerows(samples)
+        if events_path:
+            with open(events_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(("ts", "event", "fields"))
+                for ts, event, fields in events:
+                    writer.writerow((ts, event, " ".join(f"{k}={v}" for k, v in fields.items())))
+
+    def export_prometheus(self, path):
+        """Write the latest sample and query counters in Prometheus text exposition format."""
+        sample = self.latest()
+        with self._lock:
+            started, finished = self.queries_started, self.queries_finished
+        lines = []
+
+        def metric(name, kind, help_text, value):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+
+        if sample is not None:
+            metric("lmstudio_host_cpu_percent", "gauge", "System-wide CPU utilisation.", sample["cpu_percent"])
+            metric("lmstudio_host_memory_used_bytes", "gauge", "System memory in use.", sample["mem_used"])
+            metric("lmstudio_host_memory_percent", "gauge", "System memory in use (percent).", sample["mem_percent"])
+            metric("lmstudio_server_cpu_percent", "gauge", "CPU used by LM Studio server processes.",
+                   sample["server_cpu_percent"])
+            metric("lmstudio_server_rss_bytes", "gauge", "Resident memory of LM Studio server processes.",
+                   sample["server_rss"])
+            metric("lmstudio_server_threads", "gauge", "Threads in LM Studio server processes.",
+                   sample["server_threads"])
+            metric("lmstudio_queries_active", "gauge", "Queries in flight.", sample["active_queries"])
+        metric("lmstudio_queries_started_total", "counter", "Queries started.", started)
+        metric("lmstudio_queries_finished_total", "counter", "Queries finished.", finished)
+        # Write atomically so a scraper never reads a half-written file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    # ---- internals ----
+    def _run(self):
+        import psutil
+
+        psutil.cpu_percent(interval=None)  # prime the system-wide counter
+        count = 0
+        while not self._stop.is_set():
+            if count % PROCESS_RESCAN_EVERY == 0:
+                self._rescan_processes()
+            count += 1
+            try:
+                sample = self._sample()
+            except Exception:
+                sample = None  # a transient psutil failure must not kill the sampler
+            if sample is not None:
+                with self._lock:
+                    sample["active_queries"] = self._active
+                    sample["events"] = ";".join(self._pending_events)
+                    self._pending_events = []
+                    self.samples.append(sample)
+            self._stop.wait(self.interval)
+
+    def _rescan_processes(self):
+        import psutil
+
+        found = {}
+        for proc in psutil.process_iter(["name"]):
+            name = (proc.info.get("name") or "").lower()
+            if any(pattern in name for pattern in self.process_names):
+                # Reuse the existing Process object so cpu_percent keeps its baseline
+                found[proc.pid] = self._server_procs.get(proc.pid, proc)
+        self._server_procs = found
+
+    def _sample(self):
+        import psutil
+
+        mem = psutil.virtual_memory()
+        sample = {
+            "ts": time.time(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "mem_percent": mem.percent,
+            "mem_used": mem.used,
+            "mem_available": mem.available,
+            "mem_total": mem.total,
+            "server_cpu_percent": 0.0,
+            "server_rss": 0,
+            "server_threads": 0,
+            "server_processes": 0,
+        }
+        for pid, proc in list(self._server_procs.items()):
+            try:
+                with proc.oneshot():
+                    sample["server_cpu_percent"] += proc.cpu_percent(interval=None)
+                    sample["server_rss"] += proc.memory_info().rss
+                    sample["server_threads"] += proc.num_threads()
+                sample["server_processes"] += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._server_procs.pop(pid, None)
+        return sample
@@ -0,0 +1,214 @@
+"""Local OpenAI-compatible stand-in for LM Studio, for benchmarks and offline runs.
+
+Serves /v1/models and /v1/completions (blocking and streamed) with a configurable
+time-to-first-token and token rate, so the client side can be measured without a
+GPU, a model or network access. The REST model endpoints (/api/v0/models,
+/api/v1/models/load and /unload) are served too, with a configurable load time.
+/v1/embeddings returns hashed bag-of-words vectors: texts sharing most of their
+words come out similar, which is enough to exercise the semantic cache.
+
+    python mock_openai_server.py --port 1234 --ttft 0.2 --tokens-per-sec 40
+"""
+import argparse
+import json
+import math
+import re
+import socket
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["mock-model-small", "mock-model-large"]
+DEFAULT_TTFT = 0.05            # seconds before the first token
+DEFAULT_TOKENS_PER_SEC = 200.0  # generation rate after the first token
+DEFAULT_LOAD_TIME = 0.0         # seconds a REST model load takes
+EMBEDDING_DIM = 256
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, models=None, ttft=DEFAULT_TTFT, tokens_per_sec=DEFAULT_TOKENS_PER_SEC,
+                 load_time=DEFAULT_LOAD_TIME):
+        super().__init__(address, MockOpenAIHandler)
+        self.models = list(models or DEFAULT_MODELS)
+        self.loaded = set(self.models[:1])
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.load_time = load_time
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like LM Studio
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without TCP_NODELAY the body can sit
+        # behind Nagle/delayed-ACK for ~40ms and swamp the client-side numbers being measured
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/v0/models":
+            self.server.count_request()
+            return self._send_json(200, {"object": "list", "data": [
+                {"id": name, "object": "model", "type": "llm", "publisher": "mock",
+                 "state": "loaded" if name in self.server.loaded else "not-loaded"}
+                for name in self.server.models]})
+        if self.path.rstrip("/") != "/v1/models":
+            return self._send_json(404, {"error": f"Unexpected endpoint or method. ({self.command} {self.path})"})
+        self.server.count_request()
+        self._send_json(200, {
+            "object": "list",
+            "data": [{"id": name, "object": "model", "owned_by": "mock"} for name in self.server.models],
+        })
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+        if self.path.rstrip("/") in ("/api/v1/models/load", "/api/v1/models/unload"):
+            return self._load_or_unload(body)
+        if self.path.rstrip("/") == "/v1/embeddings":
+            return self._embeddings(body)
+        if self.path.rstrip("/") != "/v1/completions":
+            return self._send_json(404, {"error": f"Unexpected endpoint or method. ({self.command} {self.path})"})
+        self.server.count_request()
+        tokens = self._tokens_for(body)
+        if body.get("stream"):
+            self._stream_completion(body, tokens)
+        else:
+            self._sleep_for_generation(len(tokens))
+            self._send_json(200, {
+                "id": f"cmpl-{uuid.uuid4().hex[:12]}",
+                "object": "text_completion",
+                "model": body.get("model") or self.server.models[0],
+                "choices": [{"index": 0, "text": "".join(tokens), "finish_reason": "length"}],
+                "usage": {"prompt_tokens": len(str(body.get("prompt", "")).split()),
+                          "completion_tokens": len(tokens)},
+            })
+
+    # ---- helpers ----
+    def _load_or_unload(self, body):
+        self.server.count_request()
+        unload = self.path.rstrip("/").endswith("/unload")
+        model = body.get("instance_id" if unload else "model")
+        if model not in self.server.models:
+            return self._send_json(404, {"error": {"message": f"Model not found: {model}"}})
+        if unload:
+            self.server.loaded.discard(model)
+            return self._send_json(200, {"instance_id": model})
+        time.sleep(self.server.load_time)
+        self.server.loaded.add(model)
+        self._send_json(200, {"type": "llm", "instance_id": model, "status": "loaded",
+                              "load_time_seconds": self.server.load_time})
+
+    def _embeddings(self, body):
+        self.server.count_request()
+        texts = body.get("input", "")
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self._send_json(200, {
+            "object": "list",
+            "model": body.get("model") or "mock-embedding",
+            "data": [{"object": "embedding", "index": i, "embedding": embedding_for(text)}
+                     for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": sum(len(str(t).split()) for t in texts)},
+        })
+
+    def _tokens_for(self, body):
+        # Deterministic filler text: one "token" per word, max_tokens of them
+        count = max(1, int(body.get("max_tokens") or 16))
+        return [f" tok{i}" for i in range(count)]
+
+    def _sleep_for_generation(self, token_count):
+        rate = self.server.tokens_per_sec
+        time.sleep(self.server.ttft + (token_count - 1) / rate if rate > 0 else self.server.ttft)
+
+    def _stream_completion(self, body, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")  # SSE body ends when the socket closes
+        self.end_headers()
+        self.close_connection = True
+        delay = 1.0 / self.server.tokens_per_sec if self.server.tokens_per_sec > 0 else 0
+        completion_id = f"cmpl-{uuid.uuid4().hex[:12]}"
+        time.sleep(self.server.ttft)
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(delay)
+                chunk = {"id": completion_id, "object": "text_completion",
+                         "choices": [{"index": 0, "text": token, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-stream
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def embedding_for(text):
+    """Deterministic unit vector: every word adds +-1 to a dimension picked by its hash."""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"[a-z0-9]+", str(text).lower()):
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % EMBEDDING_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def start_server(host="127.0.0.1", port=0, **settings):
+    """Start a MockOpenAIServer on a background thread and return it (port 0 picks a free port)."""
+    server = MockOpenAIServer((host, port), **settings)
+    threading.Thread(target=server.serve_forever, name="mock-openai-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in for the LM Studio server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--ttft", type=float, default=DEFAULT_TTFT, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_TOKENS_PER_SEC)
+    parser.add_argument("--load-time", type=float, default=DEFAULT_LOAD_TIME, help="seconds a model load takes")
+    parser.add_argument("--model", action="append", dest="models", help="model id to advertise (repeatable)")
+    args = parser.parse_args()
+    server = MockOpenAIServer((args.host, args.port), models=args.models, ttft=args.ttft,
+                              tokens_per_sec=args.tokens_per_sec, load_time=args.load_time)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
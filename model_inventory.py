@@ -0,0 +1,113 @@
+"""Background, disk-cached model inventory.
+
+Listing models (`lms ls` or GET /v1/models) can take seconds on machines with large
+model directories, so the GUIs start from the last snapshot saved on disk and refresh
+it on a background thread. Refreshes are skipped while the snapshot is younger than
+its TTL (unless forced), and callers are told whether the list actually changed.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+DEFAULT_TTL = 300  # seconds a snapshot is considered fresh
+
+
+class ModelInventory:
+    """Model list snapshot backed by a JSON file and refreshed off the UI thread.
+
+    loader is a zero-argument callable returning a list of model names; it runs on
+    a worker thread. Callbacks also run on that worker thread, so GUI callers must
+    hand their work to the Tk thread themselves (root.after).
+    """
+
+    def __init__(self, name, loader, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.path = os.path.join(cache_dir, f"models-{name}.json")
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.models = []
+        self.fetched_at = 0.0
+        self.digest = None
+        self.last_refresh_time = None  # seconds the last loader call took
+        self._load_snapshot()
+
+    @staticmethod
+    def digest_of(models):
+        return hashlib.sha256(json.dumps(models).encode("utf-8")).hexdigest()
+
+    def snapshot(self):
+        """Last known model list (possibly stale, possibly empty on first run)."""
+        with self._lock:
+            return list(self.models)
+
+    def is_fresh(self):
+        return time.time() - self.fetched_at < self.ttl
+
+    def refresh_async(self, force=False, on_done=None, on_error=None):
+        """Reload the model list on a background thread.
+
+        Does nothing if a refresh is already running, or if the snapshot is still
+        fresh and force is False. on_done(models, changed) is called after a
+        successful load; on_error(exc) if the loader raised.
+        Returns True if a refresh was started.
+        """
+        with self._lock:
+            if self._refreshing or (not force and self.is_fresh()):
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(on_done, on_error), daemon=True).start()
+        return True
+
+    def refresh(self):
+        """Synchronous reload; returns (models, changed)."""
+        start_time = time.perf_counter()
+        models = list(self.loader())
+        elapsed = time.perf_counter() - start_time
+        digest = self.digest_of(models)
+        with self._lock:
+            changed = digest != self.digest
+            self.models = models
+            self.digest = digest
+            self.fetched_at = time.time()
+            self.last_refresh_time = elapsed
+            self._save_snapshot()
+        return models, changed
+
+    # ---- internals ----
+    def _refresh(self, on_done, on_error):
+        try:
+            models, changed = self.refresh()
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+            return
+        finally:
+            with self._lock:
+                self._refreshing = False
+        if on_done is not None:
+            on_done(models, changed)
+
+    def _load_snapshot(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.models = list(data["models"])
+            self.fetched_at = float(data["fetched_at"])
+            self.digest = data.get("digest") or self.digest_of(self.models)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # no usable snapshot yet; start empty
+
+    def _save_snapshot(self):
+        # Write to a temp file and rename so a crash never leaves a half-written snapshot
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"models": self.models, "fetched_at": self.fetched_at, "digest": self.digest}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # the in-memory list is still valid; the snapshot is only an optimization
@@ -0,0 +1,151 @@
+"""Per-model performance history and measured model recommendations.
+
+Every query and model load is recorded in a small SQLite file (latency, time to first
+token, tokens/sec, load time), so model choice can be based on what this machine
+actually measured rather than on a fixed rule of thumb. run_model_benchmark() fills the
+store for a list of models with a fixed prompt set; recommend() picks the model that
+meets a target latency with the best throughput.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import lmstudio_core
+from benchmark import percentile
+
+DEFAULT_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "model_stats.sqlite3")
+TARGET_LATENCY = 5.0   # seconds; default latency budget for recommendations
+RECENT_QUERIES = 50    # only the latest N queries per model count towards its summary
+MIN_SAMPLES = 3        # fewer measurements than this and a model isn't judged yet
+BENCHMARK_PROMPTS = (
+    "Summarize the benefits of unit testing in two sentences.",
+    "Write a Python function that reverses a string.",
+    "List three uses of a hash map.",
+)
+
+
+class ModelStats:
+    """Thread-safe store of query and load measurements per model."""
+
+    def __init__(self, path=DEFAULT_STATS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " id INTEGER PRIMARY KEY, ts REAL NOT NULL, model TEXT NOT NULL, latency REAL NOT NULL,"
+            " ttft REAL, tokens INTEGER, tokens_per_sec REAL, source TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS queries_model ON queries (model, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS loads ("
+            " id INTEGER PRIMARY KEY, ts REAL NOT NULL, model TEXT NOT NULL, load_time REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def record_query(self, model, latency, ttft=None, tokens=0, tokens_per_sec=None, source="query"):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO queries (ts, model, latency, ttft, tokens, tokens_per_sec, source)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), model, latency, ttft, tokens, tokens_per_sec, source),
+            )
+            self._db.commit()
+
+    def record_result(self, model, result, source="query"):
+        """Record an lmstudio_core.CompletionResult."""
+        self.record_query(model, result.elapsed, result.ttft, result.tokens, result.tokens_per_sec, source)
+
+    def record_load(self, model, load_time):
+        with self._lock:
+            self._db.execute("INSERT INTO loads (ts, model, load_time) VALUES (?, ?, ?)",
+                             (time.time(), model, load_time))
+            self._db.commit()
+
+    def summary(self, model):
+        """Latency percentiles, throughput and load time for one model, or None if unmeasured."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT latency, ttft, tokens_per_sec FROM queries WHERE model = ? ORDER BY id DESC LIMIT ?",
+                (model, RECENT_QUERIES)).fetchall()
+            loads, load_avg = self._db.execute(
+                "SELECT COUNT(*), AVG(load_time) FROM loads WHERE model = ?", (model,)).fetchone()
+        if not rows and not loads:
+            return None
+        latencies = [row[0] for row in rows]
+        ttfts = [row[1] for row in rows if row[1] is not None]
+        rates = [row[2] for row in rows if row[2]]
+        return {
+            "model": model,
+            "queries": len(rows),
+            "p50_latency": percentile(latencies, 50),
+            "p95_latency": percentile(latencies, 95),
+            "p50_ttft": percentile(ttfts, 50),
+            "tokens_per_sec": sum(rates) / len(rates) if rates else None,
+            "loads": loads,
+            "avg_load_time": load_avg,
+        }
+
+    def models(self):
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT model FROM queries UNION SELECT DISTINCT model FROM loads")
+            return sorted(row[0] for row in rows.fetchall())
+
+    def recommend(self, target_latency=TARGET_LATENCY, models=None):
+        """Pick a model whose p95 latency meets the target, preferring the highest tokens/sec.
+
+        Returns (summary, meets_target), or (None, False) when nothing has enough samples.
+        If no model meets the target, the one with the lowest p95 latency is returned.
+        """
+        candidates = []
+        for model in (models if models is not None else self.models()):
+            summary = self.summary(model)
+            if summary is not None and summary["queries"] >= MIN_SAMPLES:
+                candidates.append(summary)
+        if not candidates:
+            return None, False
+        meeting = [s for s in candidates if s["p95_latency"] <= target_latency]
+        if meeting:
+            return max(meeting, key=lambda s: (s["tokens_per_sec"] or 0, -s["p95_latency"])), True
+        return min(candidates, key=lambda s: s["p95_latency"]), False
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def run_model_benchmark(models, load_model, stats, prompts=BENCHMARK_PROMPTS, on_progress=None,
+                        max_tokens=lmstudio_core.DEFAULT_MAX_TOKENS):
+    """Load each model with load_model(model) and time the prompt set against it.
+
+    load_model returns the seconds the load itself took, so unloading the previous model
+    isn't counted. Load times and streamed query results are recorded in stats with source="benchmark".
+    on_progress(model, step, error) is called after each load/prompt (error is None on success).
+    A model that fails to load is skipped. Returns {model: summary}.
+    """
+    results = {}
+    for model in models:
+        try:
+            load_time = load_model(model)
+        except Exception as e:
+            if on_progress is not None:
+                on_progress(model, "load", e)
+            continue
+        stats.record_load(model, load_time)
+        if on_progress is not None:
+            on_progress(model, "load", None)
+        for n, prompt in enumerate(prompts, 1):
+            payload = lmstudio_core.build_completion_payload(prompt, model=model, max_tokens=max_tokens)
+            try:
+                result = lmstudio_core.stream_completion(payload)
+            except Exception as e:
+                if on_progress is not None:
+                    on_progress(model, f"prompt {n}/{len(prompts)}", e)
+                continue
+            stats.record_result(model, result, source="benchmark")
+            if on_progress is not None:
+                on_progress(model, f"prompt {n}/{len(prompts)}", None)
+        results[model] = stats.summary(model)
+    return results
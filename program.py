@@ -1,188 +1,203 @@
 import os
 import subprocess
-import queue
-import requests
 import tkinter as tk
 from tkinter import messagebox, Scrollbar, Text, Button, Frame, Entry, OptionMenu, StringVar, Label
 import threading
 import time
 
-from crewai import Agent, Task, Crew, Process
+import lmstudio_client
+import lmstudio_core
+import tracing
+from model_inventory import ModelInventory
+from research_crew import DEFAULT_RESEARCH_MAX_AGE, ResearchCrews, preload_crewai
+from result_log import ResultLog
+from server_lifecycle import ServerLifecycle
+from stage_pipeline import StagePipeline
+from topic_scheduler import DEFAULT_WORKERS, TopicScheduler, parse_topics
+from ui_dispatcher import UIDispatcher, append_text
 
 # ===================== Configuration: LM Studio API =======================
 LMSTUDIO_API_URL = "http://localhost:1234/v1"  # LM Studio API URL
+# Instances that API calls and crews are spread across (add other ports/hosts here); the server
+# controls below only manage the local one
+LMSTUDIO_API_URLS = [LMSTUDIO_API_URL]
+lmstudio_client.configure(base_urls=LMSTUDIO_API_URLS)  # shared keep-alive client (or router) with timeouts/retries
 
 current_model = None
 server_process = None  # Store the server process
-continuous_task_thread = None
-stop_continuous_task = threading.Event()
+topic_scheduler = None  # TopicScheduler running the "Run Forever" topics
+# "Run Forever" results go to an append-only, indexed log (read back with `python result_log.py`)
+result_log = ResultLog()
+# Lines kept in the chat window; older lines are trimmed so hours of "Run Forever" don't slow it down
+CHAT_SCROLLBACK_LINES = 5000
+# With tracing on (LMSTUDIO_TRACE=1) the recorded spans are written here when the window closes
+TRACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+# crewai (a large dependency tree) and requests are not imported before the window is shown;
+# the model refresh and a background crewai import start this long after it appears
+DEFERRED_START_MS = 200
 
 # ===================== Start LM Studio API Server =========================
-def start_lm_studio_server():
-    """Start LM Studio API server automatically."""
+def launch_lm_studio():
+    """Launch the LM Studio server process (runs on the lifecycle manager's worker thread)."""
+    global server_process
+    server_process = subprocess.Popen(
+        ["lmstudio", "--port", "1234"],
+        stdout=subprocess.DEVNULL,  # never read; a full PIPE buffer would stall the server
+        stderr=subprocess.DEVNULL,
+        shell=True if os.name == "nt" else False,
+    )
+    return server_process
+
+def terminate_lm_studio():
+    """Terminate the server process we launched, killing it if it doesn't exit within 5s."""
     global server_process
-    if server_process is None or server_process.poll() is not None:  # Check if server is already running
+    if server_process:
+        server_process.terminate()
         try:
-            # Launch the LM Studio server in the background
-            server_process = subprocess.Popen(
-                ["lmstudio", "--port", "1234"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True if os.name == "nt" else False,
-            )
-            time.sleep(5)  # Wait a few seconds for the server to start
-            print("LM Studio server started.")
-            return server_process
-        except FileNotFoundError:
-            print("Error: 'lmstudio' command not found. Make sure LM Studio is installed and in your PATH.")
-            messagebox.showerror("Error", "LM Studio executable ('lmstudio') not found. Ensure it's installed and in your PATH.")
-            return None
-        except Exception as e:
-            print(f"Failed to start LM Studio API server: {e}")
-            messagebox.showerror("Error", f"Failed to start LM Studio API server: {e}")
-            return None
-    else:
+            server_process.wait(5)
+        except subprocess.TimeoutExpired:
+            server_process.kill()
+        server_process = None
+
+# Starts/stops the server off the UI thread; readiness is detected by polling /v1/models
+server_lifecycle = ServerLifecycle(launch_lm_studio, terminate_lm_studio, base_url=LMSTUDIO_API_URL)
+
+def start_lm_studio_server():
+    """Start LM Studio API server automatically (returns immediately; readiness is reported in the chat)."""
+    if server_process is not None and server_process.poll() is None:  # Check if server is already running
         print("LM Studio server is already running.")
         return server_process
 
-def stop_lm_studio_server():
-    """Stop the LM Studio API server."""
-    global server_process
-    if server_process:
+    def ready(cold_start_time, already_running):
+        if already_running:
+            message = "LM Studio server is already running."
+        else:
+            message = f"LM Studio server started (ready in {cold_start_time:.1f}s)."
+        print(message)
+        append_chat("System", message + "\n")
+        refresh_models()
+
+    def failed(e):
+        if isinstance(e, FileNotFoundError):
+            print("Error: 'lmstudio' command not found. Make sure LM Studio is installed and in your PATH.")
+            ui.call(lambda: messagebox.showerror("Error", "LM Studio executable ('lmstudio') not found. Ensure it's installed and in your PATH."))
+        else:
+            print(f"Failed to start LM Studio API server: {e}")
+            ui.call(lambda: messagebox.showerror("Error", f"Failed to start LM Studio API server: {e}"))
+
+    if server_lifecycle.start_async(on_ready=ready, on_error=failed):
+        append_chat("System", "Starting LM Studio server...\n")
+    return server_process
+
+def stop_lm_studio_server(wait=False):
+    """Stop the LM Studio API server (in the background unless wait is True)."""
+    if not server_process:
+        return
+    if wait:
         try:
-            server_process.terminate()
-            server_process.wait(5)
-            if server_process.poll() is None:
-                server_process.kill()
+            server_lifecycle.stop()
             print("LM Studio server stopped.")
-            server_process = None
         except Exception as e:
             print(f"Error stopping LM Studio server: {e}")
-
-# ===================== Agent Definitions =========================
-class ResearcherAgent:
-    def __init__(self):
-        self.agent = Agent(
-            role='Senior Research Analyst',
-            goal='Uncover cutting-edge developments in AI and machine learning',
-            backstory="""You are a Senior Research Analyst at a leading tech think tank.
-            Your expertise lies in identifying emerging trends and technologies in AI.
-            You have a knack for sifting through vast amounts of information to find the most relevant and impactful insights.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=current_model,
-            max_iter=10,
-        )
-
-class WriterAgent:
-    def __init__(self):
-        self.agent = Agent(
-            role='Tech Content Strategist',
-            goal='Craft compelling and informative blog posts about AI advancements',
-            backstory="""You are a Tech Content Strategist at a popular AI-focused blog.
-            You have a talent for translating complex technical topics into engaging and accessible content for a broad audience.
-            You work closely with researchers to create content that informs and inspires.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=current_model,
-            max_iter=10
-        )
+        return
+    server_lifecycle.stop_async(on_stopped=lambda: print("LM Studio server stopped."),
+                                on_error=lambda e: print(f"Error stopping LM Studio server: {e}"))
 
 # ===================== Model Management =======================
-def load_available_models():
-    """Fetches the list of available models from the LM Studio /models API."""
-    try:
-        response = requests.get(f"{LMSTUDIO_API_URL}/models")
-        response.raise_for_status()
-        models_data = response.json()['data']
-        return [model['id'] for model in models_data]
-    except requests.exceptions.RequestException as e:
-        messagebox.showerror("Error", f"Could not load models from LM Studio: {e}")
-        return []
-    except (KeyError, ValueError) as e:
-        messagebox.showerror("Error", f"Error parsing LM Studio response: {e}")
-        return []
+# Models are listed off the UI thread and cached on disk so the window opens instantly
+model_inventory = ModelInventory("api", lmstudio_core.list_models)
 
 def set_model(model_name):
     """Sets the global current_model for use in agents."""
     global current_model
+    if model_name != current_model:
+        crews.invalidate()  # agents hold the model they were built with
     current_model = model_name
     print(f"Model set to: {current_model}")
 
 # ===================== Continuous Task Management =======================
-def create_dump_directory():
-    """Create the /dumps directory if it doesn't exist."""
-    dump_dir = os.path.join(os.path.dirname(__file__), 'dumps')
-    if not os.path.exists(dump_dir):
-        os.makedirs(dump_dir)
-    return dump_dir
-
-def continuous_task(user_query):
-    """Performs the task continuously until stopped."""
-    global stop_continuous_task
-    dump_dir = create_dump_directory()
-    counter = 0
-
-    while not stop_continuous_task.is_set():
-        try:
-            researcher = ResearcherAgent()
-            writer = WriterAgent()
-
-            crew = Crew(
-                agents=[researcher.agent, writer.agent],
-                tasks=[
-                    Task(
-                        description=f"Research this topic: {user_query}",
-                        agent=researcher.agent,
-                    ),
-                    Task(
-                        description=f"Write a compelling summary of the research on: {user_query}",
-                        agent=writer.agent,
-                        expected_output="A well-written, concise summary suitable for a blog post."
-                    )
-                ],
-                process=Process.sequential,
-                verbose=2
-            )
-            result = crew.kickoff()
-
-            # Write result to a file
-            file_path = os.path.join(dump_dir, f"output_{counter}.txt")
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(result)
-
-            counter += 1
-            time.sleep(60)  # Wait for a minute before next execution
-        except Exception as e:
-            append_chat("System", f"Error in continuous workflow: {e}\n")
-            time.sleep(60)  # Wait before retrying in case of error
+# Researcher/writer crews on a warm pool; researcher output is memoized per (topic, model) so
+# repeated topics can start at the writer stage (see research_crew.py)
+crews = ResearchCrews()
+
+def set_research_max_age(*args):
+    """Picks up the age limit typed in the GUI (0 disables reuse)."""
+    try:
+        crews.max_age = max(0.0, float(research_age_var.get())) * 60
+    except ValueError:
+        pass  # keep the previous value while the user is typing
+
+def set_match_similar_topics():
+    """Optionally a reworded topic reuses the research of a similar earlier one."""
+    crews.match_similar = match_similar_var.get()
+
+def forget_research():
+    """Manually invalidates all memoized research."""
+    crews.forget()
+    append_chat("System", "Cached research cleared.\n")
+
+def run_research_crew(user_query):
+    """Runs the researcher and writer stages in sequence on one topic and returns the result."""
+    try:
+        return crews.run(user_query, current_model)
+    finally:
+        ui.call(lambda: pool_label.config(text=crews.summary()))
+
+def continuous_task(topic):
+    """Runs one crew for a scheduled topic and appends the result to the result log."""
+    model = current_model
+    start_time = time.time()
+    result = run_research_crew(topic.query)
+    result_log.append(topic.query, result, model=model, latency=time.time() - start_time)
+    return result
 
 def start_continuous_task():
-    """Starts the continuous task."""
-    global continuous_task_thread, stop_continuous_task
-    if continuous_task_thread is None or not continuous_task_thread.is_alive():
-        stop_continuous_task.clear()
+    """Starts the continuous task for every topic in the input box (see topic_scheduler.parse_topics)."""
+    global topic_scheduler
+    if topic_scheduler is None or not topic_scheduler.is_running():
         user_query = user_input.get()
         if not user_query:
             messagebox.showwarning("Warning", "Please enter a query before starting the continuous task.")
             return
-        continuous_task_thread = threading.Thread(target=continuous_task, args=(user_query,), daemon=True)
-        continuous_task_thread.start()
-        append_chat("System", "Continuous task started.\n")
+        try:
+            topics = parse_topics(user_query)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        if not topics:
+            messagebox.showwarning("Warning", "Please enter a query before starting the continuous task.")
+            return
+
+        def finished(topic, result, latency):
+            stats = topic_scheduler.stats()
+            append_chat(
+                "System", f"Finished '{topic.query}' in {latency:.1f}s "
+                          f"({stats['running']} running, limit {stats['concurrency_limit']}/{stats['max_workers']}, "
+                          f"{topic_scheduler.queue_depth()} waiting)\n")
+
+        def failed(topic, e):
+            append_chat("System", f"Error in continuous workflow for '{topic.query}': {e}\n")
+
+        topic_scheduler = TopicScheduler(continuous_task, topics, max_workers=int(workers_var.get()),
+                                         on_result=finished, on_error=failed)
+        topic_scheduler.start()
+        append_chat("System", f"Continuous task started for {len(topics)} topic(s).\n")
 
 def stop_continuous_task_func():
-    """Stops the continuous task."""
-    global stop_continuous_task, continuous_task_thread
-    if continuous_task_thread and continuous_task_thread.is_alive():
-        stop_continuous_task.set()
-        continuous_task_thread.join()
-        append_chat("System", "Continuous task stopped.\n")
+    """Stops the continuous task without waiting for crews in flight (they finish in the background)."""
+    if topic_scheduler and topic_scheduler.is_running():
+        topic_scheduler.stop(wait=False)
+        running = topic_scheduler.stats()["running"]
+        finishing = f" ({running} run(s) still finishing)" if running else ""
+        append_chat("System", f"Continuous task stopped{finishing}.\n")
     else:
         messagebox.showinfo("Info", "No continuous task running.")
 
 # ===================== GUI Setup (Tkinter) =======================
 root = tk.Tk()
 root.title("CatGPT V0")
+# Worker threads queue their widget updates here; the Tk thread applies them once per frame
+ui = UIDispatcher(root)
 
 # Top frame for model controls and server management
 top_frame = Frame(root)
@@ -196,16 +211,33 @@ model_var = StringVar(root)
 model_dropdown = OptionMenu(top_frame, model_var, *["Select Model"])
 model_dropdown.pack(side="left", padx=5)
 
-def refresh_models(*args):
-    """Refreshes the model list in the dropdown."""
-    models = load_available_models()
+def show_models(models):
+    """Fills the dropdown with models, keeping the current selection if it still exists."""
     menu = model_dropdown["menu"]
     menu.delete(0, "end")
     for model in models:
         menu.add_command(label=model, command=lambda value=model: model_var.set(value))
-    if models:
+    if models and model_var.get() not in models:
         model_var.set(models[0])  # Set default selection
-model_var.trace('w', refresh_models)
+
+def refresh_models(force=True):
+    """Refreshes the model list in the background and updates the dropdown if it changed."""
+    def done(models, changed):
+        if changed:
+            ui.call(lambda: show_models(models))
+
+    def failed(e):
+        import requests
+        if isinstance(e, requests.exceptions.RequestException):
+            message = f"Could not load models from LM Studio: {e}"
+        else:
+            message = f"Error parsing LM Studio response: {e}"
+        ui.call(lambda: messagebox.showerror("Error", message))
+
+    model_inventory.refresh_async(force=force, on_done=done, on_error=failed)
+
+refresh_models_button = Button(top_frame, text="Refresh", command=refresh_models)
+refresh_models_button.pack(side="left", padx=5)
 
 # Set Model Button
 set_model_button = Button(top_frame, text="Set Model", command=lambda: set_model(model_var.get()))
@@ -218,6 +250,35 @@ server_button.pack(side="left", padx=5)
 stop_server_button = Button(top_frame, text="Stop Server", command=stop_lm_studio_server)
 stop_server_button.pack(side="left", padx=5)
 
+# Crew pool and research cache statistics
+pool_label = Label(root, text="Crews: none built yet", anchor="w")
+pool_label.pack(side="top", fill="x", padx=10)
+
+# Pipeline stage queue depths and timings
+pipeline_label = Label(root, text="", anchor="w")
+pipeline_label.pack(side="top", fill="x", padx=10)
+
+# Per-instance outstanding requests, latency and throughput (only with several instances)
+endpoint_label = Label(root, text="", anchor="w")
+if len(LMSTUDIO_API_URLS) > 1:
+    endpoint_label.pack(side="top", fill="x", padx=10)
+
+# Research memoization controls: reuse research younger than N minutes, or forget it all
+research_frame = Frame(root)
+research_frame.pack(side="top", fill="x", padx=5)
+research_age_label = Label(research_frame, text="Reuse research newer than (min, 0 = never):")
+research_age_label.pack(side="left", padx=5)
+research_age_var = StringVar(root, value=str(DEFAULT_RESEARCH_MAX_AGE))
+research_age_entry = Entry(research_frame, textvariable=research_age_var, width=6)
+research_age_var.trace_add("write", set_research_max_age)
+research_age_entry.pack(side="left")
+match_similar_var = tk.BooleanVar(root, value=False)
+match_similar_check = tk.Checkbutton(research_frame, text="Match similar topics", variable=match_similar_var,
+                                     command=set_match_similar_topics)
+match_similar_check.pack(side="left", padx=5)
+forget_research_button = Button(research_frame, text="Forget Research", command=forget_research)
+forget_research_button.pack(side="left", padx=5)
+
 # Main chat area
 chat_frame = Frame(root)
 chat_frame.pack(side="top", fill="both", expand=True, padx=5, pady=5)
@@ -240,6 +301,17 @@ def send_message():
     """Sends the user's message and initiates the autonomous workflow."""
     message = user_input.get()
     if message:
+        if pipeline_var.get():
+            if not current_model:
+                messagebox.showerror("Error", "Please select a model before running the workflow.")
+                return
+            append_chat("You", message + "\n")
+            user_input.delete(0, tk.END)
+            # Each ';'-separated topic is queued; research of the next overlaps writing of the previous
+            for topic in (t.strip() for t in message.split(";")):
+                if topic:
+                    topic_pipeline.submit({"topic": topic, "model": current_model, "submitted": time.time()})
+            return
         append_chat("You", message + "\n")
         user_input.delete(0, tk.END)
         threading.Thread(target=run_autonomous_workflow, args=(message,), daemon=True).start()
@@ -247,11 +319,16 @@ def send_message():
 send_button = Button(input_frame, text="Send", command=send_message)
 send_button.pack(side="left", padx=5)
 
+pipeline_var = tk.BooleanVar(root, value=True)
+pipeline_check = tk.Checkbutton(input_frame, text="Pipeline", variable=pipeline_var)
+pipeline_check.pack(side="left")
+
 def append_chat(speaker, message):
-    chat_log.configure(state="normal")
-    chat_log.insert(tk.END, f"{speaker}: {message}")
-    chat_log.configure(state="disabled")
-    chat_log.yview(tk.END)
+    """Queues a chat line; safe from any thread (lines queued within one UI frame are written together)."""
+    ui.append(write_chat, f"{speaker}: {message}")
+
+def write_chat(text):
+    append_text(chat_log, text, CHAT_SCROLLBACK_LINES)
 
 # Continuous task buttons
 continuous_task_frame = Frame(input_frame)
@@ -263,45 +340,88 @@ start_button.pack(side="left")
 stop_button = Button(continuous_task_frame, text="Stop", command=stop_continuous_task_func)
 stop_button.pack(side="left")
 
+# Upper bound on crews running at once in "Run Forever" mode; the scheduler ramps up to it
+workers_label = Label(continuous_task_frame, text="Workers:")
+workers_label.pack(side="left", padx=(5, 0))
+workers_var = StringVar(root, value=str(DEFAULT_WORKERS))
+workers_spin = tk.Spinbox(continuous_task_frame, from_=1, to=8, width=3, textvariable=workers_var, state="readonly")
+workers_spin.pack(side="left")
+
 # ===================== Autonomous Workflow =====================
 def run_autonomous_workflow(user_query):
     """Runs the researcher and writer agents in sequence."""
     if not current_model:
-        messagebox.showerror("Error", "Please select a model before running the workflow.")
+        ui.call(messagebox.showerror, "Error", "Please select a model before running the workflow.")
         return
 
     try:
-        researcher = ResearcherAgent()
-        writer = WriterAgent()
-
-        crew = Crew(
-            agents=[researcher.agent, writer.agent],
-            tasks=[
-                Task(
-                    description=f"Research this topic: {user_query}",
-                    agent=researcher.agent,
-                ),
-                Task(
-                    description=f"Write a compelling summary of the research on: {user_query}",
-                    agent=writer.agent,
-                    expected_output="A well-written, concise summary suitable for a blog post."
-                )
-            ],
-            process=Process.sequential,
-            verbose=2
-        )
-        result = crew.kickoff()
+        result = run_research_crew(user_query)
         append_chat("CrewAI", result + "\n")
 
     except Exception as e:
         append_chat("System", f"Error in autonomous workflow: {e}\n")
 
+# ===================== Pipelined Workflow =====================
+RESEARCH_STAGE_WORKERS = 1  # researcher crews running at once
+WRITE_STAGE_WORKERS = 1     # writer crews running at once
+WRITE_QUEUE_SIZE = 2        # researched topics allowed to wait for a writer before research pauses
+
+def pipeline_research(job):
+    job["research"] = crews.research(job["topic"], job["model"])
+    return job
+
+def pipeline_write(job):
+    job["result"] = crews.write(job["topic"], job["research"], job["model"])
+    return job
+
+def pipeline_finished(job):
+    latency = time.time() - job["submitted"]
+    append_chat("CrewAI", f"[{job['topic']}] ({latency:.1f}s) {job['result']}\n")
+    ui.call(lambda: pool_label.config(text=crews.summary()))
+
+def pipeline_failed(job, stage, e):
+    append_chat("System", f"Error in {stage} stage for '{job['topic']}': {e}\n")
+
+topic_pipeline = StagePipeline(
+    [("research", pipeline_research, RESEARCH_STAGE_WORKERS),
+     ("write", pipeline_write, WRITE_STAGE_WORKERS, WRITE_QUEUE_SIZE)],
+    on_result=pipeline_finished, on_error=pipeline_failed,
+)
+
+def update_pipeline_label():
+    pipeline_label.config(text="Pipeline: " + topic_pipeline.summary())
+    if lmstudio_client.is_routed():
+        endpoint_label.config(text="Endpoints: " + lmstudio_client.get_client().summary())
+    root.after(1000, update_pipeline_label)
+
 # ===================== Main Event Loop =========================
 def on_closing():
-    stop_lm_studio_server()  # Ensure server is closed before closing the window
+    if topic_scheduler is not None:
+        topic_scheduler.stop(wait=False)  # no new crews; in-flight ones die with the process
+    stop_lm_studio_server(wait=True)  # Ensure server is closed before closing the window
+    result_log.close()  # flush buffered results
+    crews.close()
+    if tracing.is_enabled():
+        export_trace()
     root.destroy()
 
+def export_trace():
+    """Writes the Chrome trace of this session and prints where the time went."""
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    path = os.path.join(TRACE_DIR, f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    count = tracing.export_chrome(path)
+    print(f"Wrote {count} spans to {path}")
+    print(tracing.summary_table())
+
 root.protocol("WM_DELETE_WINDOW", on_closing)
 
-refresh_models()  # Load models on startup
+ui.start()
+update_pipeline_label()
+show_models(model_inventory.snapshot())  # Start from the last known model list
+
+def start_background_work():
+    refresh_models(force=False)  # refresh the model list if the snapshot is stale
+    preload_crewai(on_error=lambda e: append_chat("System", f"crewai could not be imported: {e}\n"))
+
+root.after(DEFERRED_START_MS, start_background_work)
 root.mainloop()
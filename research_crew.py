@@ -0,0 +1,189 @@
+"""Researcher and writer crews for program.py and the headless research service.
+
+A topic goes through two one-agent crews: the researcher collects notes and the writer
+turns them into a summary. Crews are built once per model and stage and reused from a
+warm CrewPool, researcher output is memoized per (topic, model) so a repeated topic can
+start at the writer stage, and, optionally, a reworded topic reuses the research of a
+similar earlier one. Nothing here needs Tk; crewai is imported on the first crew build.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import lmstudio_client
+import tracing
+from crew_pool import CrewPool
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Deadline for one agent's work on a task (crewai stops the agent and returns its best answer so far)
+AGENT_MAX_EXECUTION_TIME = 600  # seconds
+RESEARCH_CACHE_PARAMS = {"stage": "research"}
+DEFAULT_RESEARCH_MAX_AGE = 60  # minutes; older research is redone
+
+
+# ===================== Agent Definitions =========================
+def agent_llm(model, endpoint=None):
+    """LLM setting for an agent: the model name, bound to a specific instance when routing."""
+    if endpoint is None:
+        return model
+    from crewai import LLM  # only needed (and only present in newer crewai) with several instances
+    return LLM(model=f"openai/{model}", base_url=endpoint, api_key="lm-studio")
+
+
+def preload_crewai(on_error=None):
+    """Imports crewai on a background thread so the first crew build doesn't wait for it."""
+    def load():
+        with tracing.span("import crewai"):
+            try:
+                import crewai  # noqa: F401
+            except ImportError as e:
+                if on_error is not None:
+                    on_error(e)
+
+    threading.Thread(target=load, name="preload-crewai", daemon=True).start()
+
+
+class ResearcherAgent:
+    def __init__(self, model=None, endpoint=None):
+        from crewai import Agent
+        self.agent = Agent(
+            role='Senior Research Analyst',
+            goal='Uncover cutting-edge developments in AI and machine learning',
+            backstory="""You are a Senior Research Analyst at a leading tech think tank.
+            Your expertise lies in identifying emerging trends and technologies in AI.
+            You have a knack for sifting through vast amounts of information to find the most relevant and impactful insights.""",
+            verbose=True,
+            allow_delegation=False,
+            llm=agent_llm(model, endpoint),
+            max_iter=10,
+            max_execution_time=AGENT_MAX_EXECUTION_TIME,
+        )
+
+
+class WriterAgent:
+    def __init__(self, model=None, endpoint=None):
+        from crewai import Agent
+        self.agent = Agent(
+            role='Tech Content Strategist',
+            goal='Craft compelling and informative blog posts about AI advancements',
+            backstory="""You are a Tech Content Strategist at a popular AI-focused blog.
+            You have a talent for translating complex technical topics into engaging and accessible content for a broad audience.
+            You work closely with researchers to create content that informs and inspires.""",
+            verbose=True,
+            allow_delegation=False,
+            llm=agent_llm(model, endpoint),
+            max_iter=10,
+            max_execution_time=AGENT_MAX_EXECUTION_TIME,
+        )
+
+
+def build_research_crew(model, stage, endpoint=None):
+    """Builds a one-agent crew for a pipeline stage ("research" or "write") on a model.
+
+    The topic (and, for the writer, the research notes) are filled in at kickoff.
+    endpoint pins the crew to one LM Studio instance when several are configured.
+    """
+    from crewai import Crew, Process, Task
+    if stage == "research":
+        agent = ResearcherAgent(model, endpoint).agent
+        task = Task(
+            description="Research this topic: {topic}",
+            agent=agent,
+        )
+    else:
+        agent = WriterAgent(model, endpoint).agent
+        task = Task(
+            description="Write a compelling summary of the research on: {topic}\n\nResearch notes:\n{research}",
+            agent=agent,
+            expected_output="A well-written, concise summary suitable for a blog post."
+        )
+    return Crew(
+        agents=[agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=2
+    )
+
+
+@contextmanager
+def crew_endpoint():
+    """Reserves the least busy LM Studio instance for one crew run (None with a single instance)."""
+    client = lmstudio_client.get_client()
+    if not isinstance(client, lmstudio_client.EndpointRouter):
+        yield None
+        return
+    with client.lease() as endpoint:
+        yield endpoint.base_url
+
+
+# ===================== Research and write stages =========================
+class ResearchCrews:
+    """Runs topics through the researcher and writer stages; safe to call from many threads.
+
+    max_age (seconds, 0 disables reuse) and match_similar may be changed at any time;
+    workers read them on every run.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=DEFAULT_RESEARCH_MAX_AGE * 60, match_similar=False):
+        # Crews are built once per model and stage and reused across runs; invalidate() drops them
+        self.pool = CrewPool(build_research_crew)
+        self.research_cache = ResponseCache(os.path.join(cache_dir, "research.sqlite3"), ttl=None)
+        # Topics are embedded through /v1/embeddings, so matching needs an embedding model in LM Studio
+        self.similar_research = SemanticCache(os.path.join(cache_dir, "research-semantic.sqlite3"), ttl=None)
+        self.max_age = max_age
+        self.match_similar = match_similar
+
+    def research(self, topic, model):
+        """Researcher stage: returns research notes, reusing fresh cached notes when available."""
+        match_similar = self.match_similar
+        if self.max_age > 0:
+            research = self.research_cache.get(model, topic, RESEARCH_CACHE_PARAMS, max_age=self.max_age)
+            if research is not None:
+                return research
+            if match_similar:
+                match = self.similar_research.lookup(model, topic, RESEARCH_CACHE_PARAMS, max_age=self.max_age)
+                if match is not None:
+                    return match.response
+        with crew_endpoint() as endpoint, self.pool.crew(model, stage="research", endpoint=endpoint) as crew, \
+                tracing.span("crew.kickoff", stage="research", topic=topic):
+            research = str(crew.kickoff(inputs={"topic": topic}))
+        self.research_cache.put(model, topic, RESEARCH_CACHE_PARAMS, research)
+        if match_similar:
+            self.similar_research.put(model, topic, RESEARCH_CACHE_PARAMS, research)
+        return research
+
+    def write(self, topic, research, model):
+        """Writer stage: turns research notes into the final summary."""
+        with crew_endpoint() as endpoint, self.pool.crew(model, stage="write", endpoint=endpoint) as crew, \
+                tracing.span("crew.kickoff", stage="write", topic=topic):
+            return str(crew.kickoff(inputs={"topic": topic, "research": research}))
+
+    def run(self, topic, model):
+        """Runs the researcher and writer stages in sequence on one topic and returns the result."""
+        return self.write(topic, self.research(topic, model), model)
+
+    def invalidate(self):
+        """Drops the pooled crews (their agents hold the model they were built with)."""
+        self.pool.invalidate()
+
+    def forget(self):
+        """Invalidates all memoized research."""
+        self.research_cache.clear()
+        self.similar_research.clear()
+
+    def summary(self):
+        stats = self.pool.stats()
+        research = self.research_cache.stats()
+        research_text = f"research cache {research['hits']} hits / {research['misses']} misses"
+        if self.match_similar:
+            research_text += f", {self.similar_research.summary()}"
+        if not stats["builds"]:
+            return f"Crews: none built yet; {research_text}"
+        return (f"Crews: {stats['builds']} built (avg {stats['avg_build_time']:.2f}s, "
+                f"last {stats['last_build_time']:.2f}s), {stats['reuses']} reused; {research_text}")
+
+    def close(self):
+        self.research_cache.close()
+        self.similar_research.close()
@@ -0,0 +1,433 @@
+"""Headless research-job service: program.py's crews behind a local HTTP API.
+
+Clients submit topics as jobs; a bounded pool of workers runs each through the
+researcher and writer crews (research_crew.py) against the configured model, so batch
+scripts and other tools can drive the pipeline without the Tk window. The job queue is
+bounded too: when it is full, submissions get 503 with Retry-After instead of piling
+up. Finished jobs are kept in memory (the most recent MAX_KEPT_JOBS) and appended to
+the service's own result log (results/service, so it never contends with program.py's).
+
+    python research_service.py --model qwen2.5-7b-instruct --port 8765 --workers 2
+
+    POST   /jobs                {"topic": "...", "model": "..."} -> 202 and the queued job
+    GET    /jobs                recent jobs, without results
+    GET    /jobs/<id>?wait=30   the job; with wait, blocks until it has finished (long poll)
+    GET    /jobs/<id>/events    server-sent events: the job on every status change, until it ends
+    DELETE /jobs/<id>           cancel a queued job (running crews can't be interrupted)
+    GET    /stats               queue depth, running jobs, counters and latency percentiles
+    GET    /metrics             the same in Prometheus text format
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import lmstudio_client
+import tracing
+from benchmark import percentile
+from research_crew import ResearchCrews, preload_crewai
+from result_log import DEFAULT_LOG_DIR, ResultLog
+
+DEFAULT_PORT = 8765
+DEFAULT_RESULT_DIR = os.path.join(DEFAULT_LOG_DIR, "service")
+DEFAULT_WORKERS = 2      # crews running at once
+MAX_QUEUED = 100         # jobs waiting for a worker; more are rejected with 503
+MAX_KEPT_JOBS = 1000     # finished jobs kept for polling; the oldest are dropped first
+LATENCY_HISTORY = 1000   # finished jobs kept for the latency percentiles
+MAX_WAIT = 300.0         # longest long-poll wait (seconds)
+KEEPALIVE_INTERVAL = 15.0  # seconds between SSE keep-alive comments while a job is unchanged
+RETRY_AFTER = 5          # seconds clients are asked to wait when the queue is full
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """The job queue is at its limit; the client should retry later."""
+
+
+@dataclass
+class Job:
+    id: str
+    topic: str
+    model: str
+    submitted: float
+    status: str = "queued"  # queued, running, done, failed or cancelled
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    version: int = 0        # bumped on every change, for event streams
+
+    def to_dict(self, include_result=True):
+        data = {"id": self.id, "topic": self.topic, "model": self.model, "status": self.status,
+                "submitted": self.submitted, "started": self.started, "finished": self.finished,
+                "queue_wait": None, "run_time": None, "latency": None, "version": self.version}
+        if self.started is not None:
+            data["queue_wait"] = self.started - self.submitted
+        if self.finished is not None:
+            data["latency"] = self.finished - self.submitted
+            if self.started is not None:
+                data["run_time"] = self.finished - self.started
+        if include_result:
+            data["result"] = self.result
+            data["error"] = self.error
+        return data
+
+
+class JobService:
+    """Bounded queue of research jobs run by a fixed pool of worker threads; thread-safe."""
+
+    def __init__(self, crews, model=None, workers=DEFAULT_WORKERS, max_queued=MAX_QUEUED, result_log=None):
+        self.crews = crews
+        self.model = model  # default for jobs that don't name one
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.result_log = result_log
+        self.started_at = time.time()
+        self.counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "cancelled": 0}
+        self._queue = deque()       # queued jobs, oldest first; cancelling one removes it
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._running = 0
+        self._stopping = False
+        self._queue_waits = deque(maxlen=LATENCY_HISTORY)
+        self._run_times = deque(maxlen=LATENCY_HISTORY)
+        self._latencies = deque(maxlen=LATENCY_HISTORY)
+        self._changed = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"research-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Let running jobs finish, then end the workers; jobs still queued stay queued."""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+
+    # ---- jobs ----
+    def submit(self, topic, model=None):
+        """Queue a topic; returns the job as a dict.
+
+        Raises ValueError without a topic or model, QueueFull when the queue is at its limit.
+        """
+        if not isinstance(topic, (str, type(None))) or not isinstance(model, (str, type(None))):
+            raise ValueError("topic and model must be strings")
+        topic = (topic or "").strip()
+        model = model or self.model
+        if not topic:
+            raise ValueError("topic is required")
+        if not model:
+            raise ValueError("model is required (no default model configured)")
+        job = Job(uuid.uuid4().hex[:12], topic, model, time.time())
+        with self._changed:
+            if len(self._queue) >= self.max_queued:
+                self.counts["rejected"] += 1
+                raise QueueFull(f"{self.max_queued} jobs already queued")
+            self._queue.append(job)
+            self._jobs[job.id] = job
+            self.counts["submitted"] += 1
+            self._changed.notify_all()
+            return job.to_dict()
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def wait(self, job_id, after_version=None, timeout=None):
+        """Block until the job changes past after_version (or, without one, has finished).
+
+        Returns the job as a dict (possibly unchanged on timeout), or None for an unknown id.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if after_version is None:
+                self._changed.wait_for(lambda: job.status in FINAL_STATUSES, timeout)
+            else:
+                self._changed.wait_for(lambda: job.version > after_version, timeout)
+            return job.to_dict()
+
+    def cancel(self, job_id):
+        """Cancel a queued job; returns the job dict (unchanged if it had already started), None if unknown."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                self._queue.remove(job)
+                self._finish(job, "cancelled")
+            return job.to_dict()
+
+    def recent(self, limit=100):
+        with self._changed:
+            jobs = list(self._jobs.values())[-limit:]
+            return [job.to_dict(include_result=False) for job in jobs]
+
+    # ---- metrics ----
+    def stats(self):
+        """Queue depth, running jobs, counters and p50/p95 queue wait, run time and latency (s)."""
+        with self._changed:
+            stats = dict(self.counts, queued=len(self._queue), running=self._running, workers=self.workers,
+                         max_queued=self.max_queued, uptime=time.time() - self.started_at)
+            series = {"queue_wait": list(self._queue_waits), "run_time": list(self._run_times),
+                      "latency": list(self._latencies)}
+        for name, values in series.items():
+            stats[f"{name}_p50"] = percentile(values, 50)
+            stats[f"{name}_p95"] = percentile(values, 95)
+        stats["crews"] = self.crews.summary()
+        return stats
+
+    def prometheus(self):
+        """stats() in Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value if value is not None else 'NaN'}")
+
+        metric("research_jobs_queued", "gauge", "Jobs waiting for a worker.", [("", stats["queued"])])
+        metric("research_jobs_running", "gauge", "Jobs being run by a crew.", [("", stats["running"])])
+        metric("research_workers", "gauge", "Size of the worker pool.", [("", stats["workers"])])
+        metric("research_jobs_total", "counter", "Jobs by outcome.",
+               [(f'{{status="{status}"}}', stats[status])
+                for status in ("submitted", "rejected", "done", "failed", "cancelled")])
+        for name, help_text in (("queue_wait", "Time from submission to start"), ("run_time", "Crew run time"),
+                                ("latency", "Time from submission to the result")):
+            metric(f"research_job_{name}_seconds", "summary", f"{help_text} over recent jobs.",
+                   [('{quantile="0.5"}', stats[f"{name}_p50"]), ('{quantile="0.95"}', stats[f"{name}_p95"])])
+        return "\n".join(lines) + "\n"
+
+    # ---- internals ----
+    def _work(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._queue or self._stopping)
+                if self._stopping:
+                    return
+                job = self._queue.popleft()
+                job.status = "running"
+                job.started = time.time()
+                job.version += 1
+                self._running += 1
+                self._changed.notify_all()
+            try:
+                with tracing.span("research job", topic=job.topic):
+                    result = str(self.crews.run(job.topic, job.model))
+            except Exception as e:
+                with self._changed:
+                    job.error = str(e) or type(e).__name__
+                    self._finish(job, "failed")
+                continue
+            # The result stands even if it can't be logged; the failure is reported on the job
+            log_error = None
+            if self.result_log is not None:
+                try:
+                    self.result_log.append(job.topic, result, model=job.model, latency=time.time() - job.submitted,
+                                           source="service", job=job.id)
+                except Exception as e:
+                    log_error = f"result not logged: {e or type(e).__name__}"
+                    print(f"Job {job.id}: {log_error}", file=sys.stderr)
+            with self._changed:
+                job.result = result
+                job.error = log_error
+                self._finish(job, "done")
+
+    def _finish(self, job, status):
+        """Record a job's final status (call with self._changed held)."""
+        if job.status == "running":
+            self._running -= 1
+            self._queue_waits.append(job.started - job.submitted)
+        job.status = status
+        job.finished = time.time()
+        job.version += 1
+        self.counts[status] += 1
+        if status != "cancelled":
+            self._run_times.append(job.finished - job.started)
+            self._latencies.append(job.finished - job.submitted)
+        # Forget the oldest finished jobs once too many are kept
+        excess = sum(1 for j in self._jobs.values() if j.finished is not None) - MAX_KEPT_JOBS
+        if excess > 0:
+            for old in [j.id for j in self._jobs.values() if j.finished is not None][:excess]:
+                del self._jobs[old]
+        self._changed.notify_all()
+
+
+# ===================== HTTP API =======================
+class ResearchServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, ResearchServiceHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class ResearchServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # one line per poll would drown the console
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        service = self.server.service
+        if parts == ["jobs"]:
+            return self._send_json(200, {"jobs": service.recent()})
+        if parts == ["stats"]:
+            return self._send_json(200, service.stats())
+        if parts == ["metrics"]:
+            return self._send(200, service.prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            return self._stream_events(parts[1])
+        if len(parts) == 2 and parts[0] == "jobs":
+            try:
+                wait = min(MAX_WAIT, float(query["wait"][0])) if "wait" in query else None
+            except ValueError:
+                return self._send_json(400, {"error": "wait must be a number of seconds"})
+            job = service.wait(parts[1], timeout=wait) if wait else service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": f"no job {parts[1]}"})
+            return self._send_json(200, job)
+        self._send_json(404, {"error": f"unknown endpoint {self.command} {url.path}"})
+
+    def do_POST(self):
+        if [p for p in urlsplit(self.path).path.split("/") if p] != ["jobs"]:
+            return self._send_json(404, {"error": f"unknown endpoint {self.command} {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True  # the body can't be skipped without a length
+            return self._send_json(400, {"error": "Content-Length must be a non-negative integer"})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("expected a JSON object")
+            job = self.server.service.submit(body.get("topic"), body.get("model"))
+        except QueueFull as e:
+            return self._send_json(503, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER)})
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job, {"Location": f"/jobs/{job['id']}"})
+
+    def do_DELETE(self):
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": f"unknown endpoint {self.command} {self.path}"})
+        job = self.server.service.cancel(parts[1])
+        if job is None:
+            return self._send_json(404, {"error": f"no job {parts[1]}"})
+        self._send_json(200 if job["status"] == "cancelled" else 409, job)
+
+    # ---- helpers ----
+    def _stream_events(self, job_id):
+        service = self.server.service
+        job = service.get(job_id)
+        if job is None:
+            return self._send_json(404, {"error": f"no job {job_id}"})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")  # the stream ends when the socket closes
+        self.end_headers()
+        self.close_connection = True
+        try:
+            self._write_event(job)
+            while job["status"] not in FINAL_STATUSES:
+                update = service.wait(job_id, after_version=job["version"], timeout=KEEPALIVE_INTERVAL)
+                if update is None:
+                    break  # dropped from the kept jobs
+                if update["version"] == job["version"]:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                job = update
+                self._write_event(job)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
+
+    def _write_event(self, job):
+        self.wfile.write(f"event: {job['status']}\ndata: {json.dumps(job)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status, data, headers=None):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_service(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Start the workers and the HTTP server (on a background thread); returns the server."""
+    service.start()
+    server = ResearchServiceServer((host, port), service)
+    threading.Thread(target=server.serve_forever, name="research-service", daemon=True).start()
+    return server
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run program.py's research crews as a local HTTP job service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", help="model for jobs that don't name one")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="crews running at once")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED, help="queued jobs before submissions get 503")
+    parser.add_argument("--base-url", action="append", dest="base_urls",
+                        help=f"LM Studio API URL (repeatable; default {lmstudio_client.DEFAULT_BASE_URL})")
+    parser.add_argument("--result-dir", default=DEFAULT_RESULT_DIR, help="result log directory")
+    parser.add_argument("--no-result-log", action="store_true", help="don't append results to the result log")
+    args = parser.parse_args(argv)
+
+    lmstudio_client.configure(base_urls=args.base_urls or [lmstudio_client.DEFAULT_BASE_URL])
+    preload_crewai(on_error=lambda e: print(f"crewai could not be imported: {e}", file=sys.stderr))
+    crews = ResearchCrews()
+    result_log = None if args.no_result_log else ResultLog(args.result_dir)
+    service = JobService(crews, model=args.model, workers=args.workers, max_queued=args.max_queued,
+                         result_log=result_log)
+    server = start_service(service, args.host, args.port)
+    print(f"Research service listening on {server.url} ({service.workers} workers, model {args.model or 'per job'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        service.stop()  # crews in flight die with the process
+        if result_log is not None:
+            result_log.close()
+        crews.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Two-tier cache for completion responses.
+
+Responses are keyed on (model, prompt, sampling params). Lookups hit a small in-memory
+LRU first and fall back to a SQLite file on disk, so repeated evaluation prompts
+survive restarts. Disk entries expire after a TTL and the least recently used ones
+are evicted once the file grows past a size budget.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ===================== Defaults =======================
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "responses.sqlite3")
+MEMORY_ENTRIES = 256                 # responses kept in the in-memory LRU tier
+MAX_DISK_BYTES = 64 * 1024 * 1024    # evict least recently used disk entries past this total size
+TTL_SECONDS = 7 * 24 * 3600          # entries older than this are treated as misses and dropped
+
+
+def cache_key(model, prompt, params):
+    """Stable hash of the model, prompt and sampling parameters (order-independent)."""
+    blob = json.dumps({"model": model or "", "prompt": prompt, "params": params or {}},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of a size- and TTL-bounded SQLite store. Thread-safe."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_entries=MEMORY_ENTRIES,
+                 max_disk_bytes=MAX_DISK_BYTES, ttl=TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self._memory = OrderedDict()  # key -> (response, created)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+
+    def get(self, model, prompt, params, max_age=None):
+        """Return the cached response text, or None on a miss.
+
+        max_age (seconds) tightens the cache-wide TTL for this lookup only.
+        """
+        key = cache_key(model, prompt, params)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1], now, max_age):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+            if self._db is not None:
+                row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if self._expired(row[1], now, max_age):
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    else:
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.hits += 1
+                        return row[0]
+                    self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, params, response):
+        key = cache_key(model, prompt, params)
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._db is None:
+                return
+            size = len(response.encode("utf-8"))
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def delete(self, model, prompt, params):
+        """Forget one entry in both tiers."""
+        key = cache_key(model, prompt, params)
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_entries = disk_bytes = 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.hits - self.memory_hits,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- internals (call with self._lock held) ----
+    def _expired(self, created, now, max_age=None):
+        ttl = self.ttl if max_age is None else (max_age if self.ttl is None else min(self.ttl, max_age))
+        return ttl is not None and now - created > ttl
+
+    def _remember(self, key, response, created):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used rows until we are back under budget
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
@@ -0,0 +1,232 @@
+"""Append-only, indexed log of crew results.
+
+Results are appended to gzip-compressed JSONL segments that rotate once they reach
+a size limit, so a long "Run Forever" session costs constant I/O per result instead
+of one small file each. Writes are batched: records are flushed and fsync'ed every
+BATCH_SIZE records or FLUSH_INTERVAL seconds, whichever comes first. A small SQLite
+index maps topic/timestamp/model to (segment, line) so results can be streamed back
+out without decompressing everything.
+
+    python result_log.py topics
+    python result_log.py cat --topic "AI chips" --since 2025-02-01 --limit 10
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MAX_SEGMENT_BYTES = 16 * 1024 * 1024  # rotate to a new segment past this compressed size
+BATCH_SIZE = 32                       # flush + fsync after this many pending records...
+FLUSH_INTERVAL = 2.0                  # ...or after this many seconds
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class ResultLog:
+    """Thread-safe writer and reader for the segmented result log."""
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, max_segment_bytes=MAX_SEGMENT_BYTES,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(log_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(log_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY, ts REAL NOT NULL, topic TEXT, model TEXT,"
+            " segment TEXT NOT NULL, line INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_topic_ts ON results (topic, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_ts ON results (ts)")
+        self._db.commit()
+        self._segment = None   # name of the segment being written
+        self._raw = None       # underlying file object (for fsync)
+        self._gz = None
+        self._line = 0         # next line number in the current segment
+        self._pending = []     # index rows not yet flushed
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_periodically, name="result-log-flush", daemon=True)
+        self._flusher.start()
+
+    # ---- writing ----
+    def append(self, topic, result, model=None, **fields):
+        """Append one result; returns its timestamp. Extra fields are stored with the record."""
+        ts = time.time()
+        record = dict(fields, ts=ts, topic=topic, model=model, result=str(result))
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._closed:
+                raise ValueError("ResultLog is closed")
+            if self._gz is None:
+                self._open_segment()
+            self._gz.write(line)
+            self._pending.append((ts, topic, model, self._segment, self._line))
+            self._line += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        return ts
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._close_segment()
+            self._closed = True
+            self._db.close()
+
+    # ---- reading ----
+    def topics(self):
+        """(topic, count, first_ts, last_ts) for every topic in the log (flushed records only)."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT topic, COUNT(*), MIN(ts), MAX(ts) FROM results GROUP BY topic ORDER BY topic").fetchall()
+
+    def query(self, topic=None, model=None, since=None, until=None, limit=None):
+        """Yield matching records (dicts) in write order, streaming one segment at a time."""
+        clauses, args = [], []
+        for column, op, value in (("topic", "=", topic), ("model", "=", model), ("ts", ">=", since), ("ts", "<", until)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                args.append(value)
+        sql = "SELECT segment, line FROM results"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            self._flush()  # make everything appended so far visible
+            rows = self._db.execute(sql, args).fetchall()
+        # Group consecutive rows by segment so each segment is decompressed once
+        start = 0
+        while start < len(rows):
+            segment = rows[start][0]
+            end = start
+            while end < len(rows) and rows[end][0] == segment:
+                end += 1
+            wanted = {line for _, line in rows[start:end]}
+            for line_no, record in self._read_segment(segment):
+                if line_no in wanted:
+                    yield record
+            start = end
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.log_dir)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    # ---- internals (call with self._lock held) ----
+    def _open_segment(self):
+        # Always start a fresh segment: a segment left open by a crash has no gzip
+        # trailer, and appending a second stream to it would complicate recovery
+        existing = self.segments()
+        number = int(existing[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1 if existing else 1
+        while True:
+            self._segment = f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+            try:
+                self._raw = open(os.path.join(self.log_dir, self._segment), "xb")
+                break
+            except FileExistsError:
+                number += 1  # another process sharing the directory took this number first
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._line = 0
+
+    def _close_segment(self):
+        if self._gz is not None:
+            self._gz.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            self._raw.close()
+        self._gz = self._raw = self._segment = None
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        # Data first, index second: an index row never points at bytes that aren't on disk
+        self._gz.flush(zlib.Z_SYNC_FLUSH)
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._db.executemany("INSERT INTO results (ts, topic, model, segment, line) VALUES (?, ?, ?, ?, ?)",
+                             self._pending)
+        self._db.commit()
+        self._pending = []
+        if self._raw.tell() >= self.max_segment_bytes:
+            self._close_segment()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval / 2)
+            with self._lock:
+                if self._closed:
+                    return
+                if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush()
+
+    def _read_segment(self, segment):
+        path = os.path.join(self.log_dir, segment)
+        line_no = 0
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for text in f:
+                    if not text.endswith("\n"):
+                        break  # partial record at the end of a segment that is still open
+                    yield line_no, json.loads(text)
+                    line_no += 1
+        except EOFError:
+            pass  # segment still being written (or cut short by a crash): no gzip trailer yet
+
+
+# ===================== CLI =======================
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the crew result log.")
+    parser.add_argument("--dir", default=DEFAULT_LOG_DIR, help="log directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("topics", help="list topics with result counts")
+    cat = sub.add_parser("cat", help="stream matching results as JSON lines")
+    cat.add_argument("--topic")
+    cat.add_argument("--model")
+    cat.add_argument("--since", type=_parse_time, help="ISO date/time or Unix timestamp")
+    cat.add_argument("--until", type=_parse_time, help="ISO date/time or Unix timestamp")
+    cat.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    log = ResultLog(args.dir)
+    try:
+        if args.command == "topics":
+            for topic, count, first_ts, last_ts in log.topics():
+                first = datetime.fromtimestamp(first_ts).isoformat(timespec="seconds")
+                last = datetime.fromtimestamp(last_ts).isoformat(timespec="seconds")
+                print(f"{count:6d}  {first}  {last}  {topic}")
+        else:
+            for record in log.query(args.topic, args.model, args.since, args.until, args.limit):
+                sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
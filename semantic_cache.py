@@ -0,0 +1,333 @@
+"""Near-duplicate prompt cache backed by embeddings from the local server.
+
+The exact-match ResponseCache misses paraphrases ("what's the capital of France" vs
+"What is France's capital?"). This cache embeds every prompt through /v1/embeddings
+and keeps the unit vectors of earlier prompts in a NumPy matrix, one row per entry.
+A lookup is one matrix-vector product: the closest earlier prompt for the same model
+and sampling parameters is a hit when its cosine similarity reaches the threshold,
+and its response is returned. The index holds at most max_entries rows; past that the
+least recently used row is overwritten. Entries are also kept in a SQLite file so the
+index survives restarts. Embedding and search time are recorded for every lookup.
+
+NumPy is imported and the index loaded on first use, not at construction.
+
+    python semantic_cache.py bench --entries 5000 --dim 768
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+import lmstudio_core
+import tracing
+from benchmark import percentile
+from response_cache import cache_key
+
+# ===================== Defaults =======================
+DEFAULT_SEMANTIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "semantic.sqlite3")
+# Embedding model bundled with LM Studio; any loaded embedding model works
+EMBEDDING_MODEL = "text-embedding-nomic-embed-text-v1.5"
+SIMILARITY_THRESHOLD = 0.92  # cosine similarity at or above which an earlier prompt counts as the same
+MAX_ENTRIES = 5000           # rows in the index; the least recently used is overwritten past this
+TTL_SECONDS = 7 * 24 * 3600  # same default as ResponseCache
+RECENT_VECTORS = 64          # prompt -> vector memo, so put() after a missed lookup doesn't embed again
+TIMING_HISTORY = 500         # lookups kept for the latency percentiles
+
+
+@dataclass
+class SemanticMatch:
+    response: str
+    similarity: float
+    prompt: str        # the earlier prompt whose response is reused
+    lookup_time: float  # seconds spent embedding and searching
+
+
+class SemanticCache:
+    """Embedding index of earlier prompts and their responses. Thread-safe.
+
+    lookup() and put() never raise: when the prompt can't be embedded (no embedding
+    model loaded, server down, NumPy missing) they count an error, keep its message
+    in last_error and behave like a miss.
+    """
+
+    def __init__(self, path=DEFAULT_SEMANTIC_PATH, embed=None, threshold=SIMILARITY_THRESHOLD,
+                 max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, embedding_model=EMBEDDING_MODEL):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedding_model = embedding_model
+        self._embed = embed or (lambda texts: lmstudio_core.embed(texts, model=self.embedding_model))
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.last_error = None
+        self._embed_times = deque(maxlen=TIMING_HISTORY)
+        self._search_times = deque(maxlen=TIMING_HISTORY)
+        self._recent = OrderedDict()  # prompt -> unit vector
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._np = None
+        # Index rows: vectors[i] belongs to entries[i] = (key, prompt, response); a group is one
+        # (model, sampling params) pair, and only rows of the query's group can match
+        self._vectors = None     # (max_entries, dim) float32, allocated with the first vector
+        self._group_ids = None   # int32 per row, -1 for a free row
+        self._created = None     # float64 per row
+        self._accessed = None    # float64 per row
+        self._entries = []
+        self._rows = {}          # key -> row
+        self._groups = {}        # group hash -> group id
+        self._db = None
+
+    def lookup(self, model, prompt, params, max_age=None):
+        """Return a SemanticMatch for the closest earlier prompt, or None on a miss.
+
+        max_age (seconds) tightens the cache-wide TTL for this lookup only.
+        """
+        start_time = time.perf_counter()
+        try:
+            self._ensure_loaded()
+            vector = self._vector(prompt)
+        except Exception as e:
+            self._failed(e)
+            return None
+        embedded = time.perf_counter()
+        with self._lock, tracing.span("semantic search", entries=len(self._rows)):
+            match = self._search(vector, self._group(model, params), max_age)
+            end_time = time.perf_counter()
+            self._embed_times.append(embedded - start_time)
+            self._search_times.append(end_time - embedded)
+            if match is None:
+                self.misses += 1
+                return None
+            row, similarity = match
+            self.hits += 1
+            now = time.time()
+            self._accessed[row] = now
+            key, earlier_prompt, response = self._entries[row]
+            if self._db is not None:
+                self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            return SemanticMatch(response, similarity, earlier_prompt, end_time - start_time)
+
+    def put(self, model, prompt, params, response):
+        """Index prompt with its response; returns False when the prompt couldn't be embedded."""
+        try:
+            self._ensure_loaded()
+            vector = self._vector(prompt)
+        except Exception as e:
+            self._failed(e)
+            return False
+        key = cache_key(model, prompt, params)
+        group = cache_key(model, "", params)
+        now = time.time()
+        with self._lock:
+            if self._vectors is not None and vector.shape[0] != self._vectors.shape[1]:
+                # The embedding model changed; old vectors can't be compared with new ones
+                self._reset()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM entries")
+            evicted = self._store(key, group, prompt, response, vector, now, now)
+            if self._db is not None:
+                if evicted is not None:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (evicted,))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, grp, prompt, response, vector, embedding_model, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, group, prompt, response, vector.tobytes(), self.embedding_model, now, now))
+                self._db.commit()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self):
+        """Hits, misses, errors, index size and p50/p95 embedding, search and total lookup time (s)."""
+        with self._lock:
+            embed_times = list(self._embed_times)
+            search_times = list(self._search_times)
+            stats = {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                     "entries": len(self._rows), "max_entries": self.max_entries}
+        lookup_times = [e + s for e, s in zip(embed_times, search_times)]
+        for name, values in (("embed", embed_times), ("search", search_times), ("lookup", lookup_times)):
+            stats[f"{name}_p50"] = percentile(values, 50)
+            stats[f"{name}_p95"] = percentile(values, 95)
+        return stats
+
+    def summary(self):
+        """One line for labels, e.g. "similar 3 hits / 9 misses, lookup p50 14 ms"."""
+        stats = self.stats()
+        text = f"similar {stats['hits']} hits / {stats['misses']} misses"
+        if stats["lookup_p50"] is not None:
+            text += f", lookup p50 {stats['lookup_p50'] * 1000:.0f} ms"
+        return text
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- internals ----
+    def _ensure_loaded(self):
+        """Import NumPy and read the stored entries into the index (first call only)."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            import numpy
+
+            self._np = numpy
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " key TEXT PRIMARY KEY, grp TEXT NOT NULL, prompt TEXT NOT NULL, response TEXT NOT NULL,"
+                    " vector BLOB NOT NULL, embedding_model TEXT NOT NULL,"
+                    " created REAL NOT NULL, accessed REAL NOT NULL)")
+                # Vectors from another embedding model live in a different space
+                self._db.execute("DELETE FROM entries WHERE embedding_model != ?", (self.embedding_model,))
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+                rows = self._db.execute(
+                    "SELECT key, grp, prompt, response, vector, created, accessed FROM entries"
+                    " ORDER BY accessed DESC LIMIT ?", (self.max_entries,)).fetchall()
+                self._db.execute("DELETE FROM entries WHERE key NOT IN"
+                                 " (SELECT key FROM entries ORDER BY accessed DESC LIMIT ?)", (self.max_entries,))
+                self._db.commit()
+                with tracing.span("semantic index load", entries=len(rows)):
+                    for key, group, prompt, response, blob, created, accessed in reversed(rows):
+                        vector = numpy.frombuffer(blob, dtype=numpy.float32)
+                        if self._vectors is not None and vector.shape[0] != self._vectors.shape[1]:
+                            continue
+                        self._store(key, group, prompt, response, vector, created, accessed)
+            self._loaded = True
+
+    def _vector(self, prompt):
+        """Unit-length float32 embedding of prompt (memoized for the most recent prompts)."""
+        with self._lock:
+            vector = self._recent.get(prompt)
+            if vector is not None:
+                self._recent.move_to_end(prompt)
+                return vector
+        np = self._np
+        vector = np.array(self._embed([prompt])[0], dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or not norm:
+            raise ValueError("the server returned an empty embedding")
+        vector /= norm
+        with self._lock:
+            self._recent[prompt] = vector
+            while len(self._recent) > RECENT_VECTORS:
+                self._recent.popitem(last=False)
+        return vector
+
+    def _failed(self, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = str(error) or type(error).__name__
+
+    # ---- index (call with self._lock held) ----
+    def _group(self, model, params):
+        return self._groups.get(cache_key(model, "", params), -1)
+
+    def _search(self, vector, group_id, max_age):
+        """(row, similarity) of the best row in group_id at or above the threshold, or None."""
+        if group_id < 0 or self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            return None
+        np = self._np
+        used = len(self._entries)
+        similarities = self._vectors[:used] @ vector
+        candidates = self._group_ids[:used] == group_id
+        ttl = self.ttl if max_age is None else (max_age if self.ttl is None else min(self.ttl, max_age))
+        if ttl is not None:
+            candidates &= self._created[:used] >= time.time() - ttl
+        similarities = np.where(candidates, similarities, -np.inf)
+        row = int(np.argmax(similarities))
+        similarity = float(similarities[row])
+        return (row, similarity) if similarity >= self.threshold else None
+
+    def _store(self, key, group, prompt, response, vector, created, accessed):
+        """Write one entry to a row; returns the key it evicted, if any."""
+        np = self._np
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._group_ids = np.full(self.max_entries, -1, dtype=np.int32)
+            self._created = np.zeros(self.max_entries)
+            self._accessed = np.zeros(self.max_entries)
+        evicted = None
+        row = self._rows.get(key)
+        if row is None:
+            if len(self._entries) < self.max_entries:
+                row = len(self._entries)
+                self._entries.append(None)
+            else:
+                row = int(np.argmin(self._accessed[:len(self._entries)]))
+                evicted = self._entries[row][0]
+                del self._rows[evicted]
+            self._rows[key] = row
+        self._vectors[row] = vector
+        self._group_ids[row] = self._groups.setdefault(group, len(self._groups))
+        self._created[row] = created
+        self._accessed[row] = accessed
+        self._entries[row] = (key, prompt, response)
+        return evicted
+
+    def _reset(self):
+        self._vectors = self._group_ids = self._created = self._accessed = None
+        self._entries = []
+        self._rows.clear()
+        self._groups.clear()
+        self._recent.clear()
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search latency of the semantic cache index (no server needed).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="fill an in-memory index with random vectors and time lookups")
+    bench.add_argument("--entries", type=int, default=MAX_ENTRIES)
+    bench.add_argument("--dim", type=int, default=768, help="embedding size (nomic-embed-text: 768)")
+    bench.add_argument("--lookups", type=int, default=200)
+    bench.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    import numpy
+
+    rng = numpy.random.default_rng(0)
+    vectors = {}  # prompt -> vector handed out by the fake embedder
+
+    def fake_embed(texts):
+        return [vectors.setdefault(text, rng.standard_normal(args.dim).astype(numpy.float32)) for text in texts]
+
+    cache = SemanticCache(path=None, embed=fake_embed, max_entries=args.entries)
+    start_time = time.perf_counter()
+    for i in range(args.entries):
+        cache.put("bench-model", f"prompt {i}", {}, f"response {i}")
+    fill_time = time.perf_counter() - start_time
+    for i in range(args.lookups):
+        cache.lookup("bench-model", f"prompt {i * 7 % args.entries}", {})  # indexed: hits
+        cache.lookup("bench-model", f"new prompt {i}", {})                  # unseen: misses
+    stats = dict(cache.stats(), fill_time=fill_time)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"{stats['entries']} entries x {args.dim} dims, filled in {fill_time:.2f}s; "
+              f"{stats['hits']} hits / {stats['misses']} misses")
+        print(f"search p50 {stats['search_p50'] * 1000:.3f} ms, p95 {stats['search_p95'] * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
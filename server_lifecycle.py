@@ -0,0 +1,127 @@
+"""Non-blocking LM Studio server lifecycle with readiness probing.
+
+Starting and stopping run on a worker thread. Instead of sleeping for a fixed time
+or matching CLI wording, readiness is detected by polling GET /v1/models with
+exponential backoff, and the measured cold-start time is reported back.
+"""
+import threading
+import time
+
+import lmstudio_client
+import tracing
+
+READY_TIMEOUT = 120.0      # give up waiting for the server after this many seconds
+PROBE_INITIAL_DELAY = 0.1  # first wait between readiness probes...
+PROBE_MAX_DELAY = 0.5      # ...doubling up to this cap (probes are cheap; keeps overshoot small)
+PROBE_TIMEOUT = (0.5, 2.0)  # connect/read timeout of a single probe
+
+
+class ServerNotReady(Exception):
+    """The server did not answer /v1/models before the deadline (or its process exited)."""
+
+
+class ServerLifecycle:
+    """Starts/stops an LM Studio server off the UI thread and probes it for readiness.
+
+    start_fn launches the server and may return a subprocess.Popen; if that process
+    fails (non-zero exit) before the server is ready, waiting stops early. stop_fn shuts it down.
+    Both run on a worker thread. Callbacks also run there, so GUI callers must hand
+    their work to the Tk thread themselves (root.after).
+    """
+
+    def __init__(self, start_fn, stop_fn, base_url=lmstudio_client.DEFAULT_BASE_URL,
+                 ready_timeout=READY_TIMEOUT, initial_delay=PROBE_INITIAL_DELAY, max_delay=PROBE_MAX_DELAY):
+        self.start_fn = start_fn
+        self.stop_fn = stop_fn
+        self.ready_timeout = ready_timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.base_url = base_url
+        self._probe_client = None  # built on first probe, keeping requests out of GUI startup
+        self.cold_start_time = None  # seconds from launch to first successful probe
+        self._busy = threading.Lock()
+
+    @property
+    def probe_client(self):
+        # Probes must fail fast, so they get their own client without retries
+        if self._probe_client is None:
+            self._probe_client = lmstudio_client.LMStudioClient(
+                self.base_url, connect_timeout=PROBE_TIMEOUT[0], read_timeout=PROBE_TIMEOUT[1],
+                max_retries=0, pool_size=1)
+        return self._probe_client
+
+    def is_ready(self):
+        """True if the server answers /v1/models right now."""
+        try:
+            return self.probe_client.get("models").status_code == 200
+        except Exception:
+            return False
+
+    def wait_until_ready(self, timeout=None, process=None):
+        """Poll until the server is ready; returns the seconds waited or raises ServerNotReady."""
+        timeout = self.ready_timeout if timeout is None else timeout
+        start_time = time.perf_counter()
+        delay = self.initial_delay
+        while True:
+            if self.is_ready():
+                return time.perf_counter() - start_time
+            # A non-zero exit means the launch failed; exit code 0 may just be a launcher
+            # that handed off to a background server, so keep probing in that case
+            if process is not None and process.poll() not in (None, 0):
+                raise ServerNotReady(f"Server process exited with code {process.returncode} before becoming ready")
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= timeout:
+                raise ServerNotReady(f"Server not ready after {elapsed:.1f}s")
+            time.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * 2, self.max_delay)
+
+    def start(self):
+        """Blocking start; returns (cold_start_seconds, already_running)."""
+        if self.is_ready():
+            return 0.0, True
+        start_time = time.perf_counter()
+        with tracing.span("server start"):
+            with tracing.span("server launch"):
+                process = self.start_fn()
+            with tracing.span("server wait ready"):
+                self.wait_until_ready(self.ready_timeout - (time.perf_counter() - start_time),
+                                      process if hasattr(process, "poll") else None)
+        self.cold_start_time = time.perf_counter() - start_time
+        return self.cold_start_time, False
+
+    def stop(self):
+        with tracing.span("server stop"):
+            self.stop_fn()
+
+    def start_async(self, on_ready=None, on_error=None):
+        """Start on a worker thread; on_ready(cold_start_seconds, already_running) or on_error(exc).
+
+        Returns False (and does nothing) if a start/stop is already in progress.
+        """
+        return self._run_async(self.start, on_ready, on_error)
+
+    def stop_async(self, on_stopped=None, on_error=None):
+        """Stop on a worker thread; on_stopped() or on_error(exc)."""
+        return self._run_async(self.stop, on_stopped, on_error)
+
+    def _run_async(self, action, on_done, on_error):
+        if not self._busy.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                result = action()
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+                return
+            finally:
+                self._busy.release()
+            if on_done is not None:
+                if isinstance(result, tuple):
+                    on_done(*result)
+                else:
+                    on_done()
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
@@ -0,0 +1,120 @@
+"""Pipelined execution of multi-stage jobs.
+
+Each stage has its own bounded pool of worker threads and an input queue, so while
+stage 2 (e.g. the writer) works on job N, stage 1 (the researcher) can already run
+job N+1 and the inference server never sits idle between stages. Queues between
+stages are bounded, which applies back-pressure instead of letting an early stage
+race arbitrarily far ahead. Per-stage queue depth and timings are kept for display.
+"""
+import queue
+import threading
+import time
+
+_STOP = object()  # sentinel that tells a stage worker to exit
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=0):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.busy = 0
+        self.done = 0
+        self.failed = 0
+        self.time_total = 0.0
+        self.last_time = None
+
+
+class StagePipeline:
+    """Runs jobs through stages in order; each stage fn(job) returns the job for the next stage.
+
+    stages is a list of (name, fn, workers) or (name, fn, workers, queue_size) tuples.
+    on_result(job) is called with the output of the last stage, on_error(job, stage_name, exc)
+    when a stage raises (the job is dropped). Both run on worker threads.
+    """
+
+    def __init__(self, stages, on_result=None, on_error=None):
+        self.stages = [Stage(*spec) for spec in stages]
+        self.on_result = on_result
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job):
+        """Queue a job for the first stage (blocks if that stage's queue is full)."""
+        self.stages[0].queue.put(job)
+
+    def pending(self):
+        """Jobs queued or running in any stage."""
+        with self._lock:
+            return sum(stage.queue.qsize() + stage.busy for stage in self.stages)
+
+    def stats(self):
+        with self._lock:
+            return [{
+                "stage": stage.name,
+                "queued": stage.queue.qsize(),
+                "busy": stage.busy,
+                "workers": stage.workers,
+                "done": stage.done,
+                "failed": stage.failed,
+                "avg_time": stage.time_total / stage.done if stage.done else None,
+                "last_time": stage.last_time,
+            } for stage in self.stages]
+
+    def summary(self):
+        """One-line description of the pipeline state for status labels."""
+        parts = []
+        for s in self.stats():
+            avg = f", avg {s['avg_time']:.1f}s" if s["avg_time"] is not None else ""
+            parts.append(f"{s['stage']}: {s['queued']} queued, {s['busy']}/{s['workers']} busy{avg}")
+        return " -> ".join(parts)
+
+    def stop(self):
+        """Let workers finish their current job and exit; queued jobs are abandoned."""
+        for stage in self.stages:
+            while True:
+                try:
+                    stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in range(stage.workers):
+                stage.queue.put(_STOP)
+
+    # ---- internals ----
+    def _work(self, index):
+        stage = self.stages[index]
+        while True:
+            job = stage.queue.get()
+            if job is _STOP:
+                return
+            with self._lock:
+                stage.busy += 1
+            start_time = time.perf_counter()
+            try:
+                job = stage.fn(job)
+            except Exception as e:
+                with self._lock:
+                    stage.busy -= 1
+                    stage.failed += 1
+                if self.on_error is not None:
+                    self.on_error(job, stage.name, e)
+                continue
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                stage.done += 1
+                stage.time_total += elapsed
+                stage.last_time = elapsed
+            # The job counts as busy here until it is handed off, so pending() never misses it
+            if index + 1 < len(self.stages):
+                self.stages[index + 1].queue.put(job)  # blocks while the next stage is backed up
+            with self._lock:
+                stage.busy -= 1
+            if index + 1 == len(self.stages) and self.on_result is not None:
+                self.on_result(job)
@@ -0,0 +1,145 @@
+"""Cold-start benchmark for the GUI entry points (v2.py and program.py).
+
+Every run starts a fresh interpreter that executes the script with a small probe
+installed: it records when the main window is created (everything before that is
+imports and module setup) and when the event loop first goes idle after the window
+was drawn (first paint), then exits without running the app any further. The probe
+also notes which heavy dependencies were already imported at first paint, since those
+should load lazily or in the background. Thresholds apply to the median over all runs;
+the script exits non-zero when one is exceeded.
+
+    python startup_benchmark.py                        # both entry points, 5 runs each
+    python startup_benchmark.py v2.py --runs 10 --max-first-paint 1.0 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmark import percentile
+
+ENTRY_POINTS = ("v2.py", "program.py")
+DEFAULT_RUNS = 5
+MAX_IMPORT = 0.75       # seconds from interpreter start to window creation
+MAX_FIRST_PAINT = 1.5   # seconds from interpreter start to the first drawn, idle window
+RUN_TIMEOUT = 60.0
+# Dependencies that are expensive to import and aren't needed to show the window
+HEAVY_MODULES = ("crewai", "requests", "psutil", "numpy")
+_MARKER = "STARTUP-PROBE "
+
+# Runs in the child interpreter: argv is [script, marker, heavy module names...]
+_PROBE = r"""
+import json, os, runpy, sys, time
+start = time.perf_counter()
+import tkinter
+
+script, marker, heavy = sys.argv[1], sys.argv[2], sys.argv[3:]
+marks = {}
+tk_init, tk_mainloop = tkinter.Tk.__init__, tkinter.Tk.mainloop
+
+def init(self, *args, **kwargs):
+    marks.setdefault("import", time.perf_counter() - start)
+    tk_init(self, *args, **kwargs)
+
+def painted(root):
+    root.update_idletasks()
+    marks["first_paint"] = time.perf_counter() - start
+    marks["loaded"] = [name for name in heavy if name in sys.modules]
+    print(marker + json.dumps(marks), flush=True)
+    os._exit(0)  # skip the app's shutdown path; background threads die with the process
+
+def mainloop(self, n=0):
+    self.after_idle(painted, self)
+    tk_mainloop(self, n)
+
+tkinter.Tk.__init__, tkinter.Tk.mainloop = init, mainloop
+sys.argv = [script]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+def probe(script, timeout=RUN_TIMEOUT):
+    """Start script once in a fresh interpreter; returns its startup timings in seconds.
+
+    "process" is the wall time the parent waited, so it includes interpreter startup.
+    """
+    cwd = os.path.dirname(os.path.abspath(script))
+    start_time = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _PROBE, os.path.abspath(script), _MARKER, *HEAVY_MODULES],
+                          cwd=cwd, capture_output=True, text=True, timeout=timeout)
+    elapsed = time.perf_counter() - start_time
+    for line in proc.stdout.splitlines():
+        if line.startswith(_MARKER):
+            marks = json.loads(line[len(_MARKER):])
+            marks["process"] = elapsed
+            return marks
+    raise RuntimeError(f"{script} exited with {proc.returncode} before its window was shown:\n"
+                       f"{proc.stderr.strip()[-2000:]}")
+
+
+def run_startup_benchmark(script, runs=DEFAULT_RUNS):
+    samples = [probe(script) for _ in range(runs)]
+    result = {"script": script, "runs": runs,
+              "loaded": sorted({name for s in samples for name in s["loaded"]})}
+    for key in ("import", "first_paint", "process"):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        result[key] = percentile(values, 50)
+        result[key + "_max"] = max(values) if values else None
+    return result
+
+
+def format_table(results):
+    lines = [f"{'script':<12} {'runs':>4} {'import':>8} {'paint':>8} {'process':>8} {'paint max':>9}  loaded at paint"]
+    for r in results:
+        lines.append(f"{r['script']:<12} {r['runs']:>4} {r['import']:>8.3f} {r['first_paint']:>8.3f} "
+                     f"{r['process']:>8.3f} {r['first_paint_max']:>9.3f}  {', '.join(r['loaded']) or '-'}")
+    return "\n".join(lines)
+
+
+def check_thresholds(results, max_import=None, max_first_paint=None):
+    """Return a list of human-readable threshold violations (empty when all pass)."""
+    failures = []
+    for r in results:
+        if max_import is not None and r["import"] > max_import:
+            failures.append(f"{r['script']}: import {r['import']:.3f}s > {max_import:.3f}s")
+        if max_first_paint is not None and r["first_paint"] > max_first_paint:
+            failures.append(f"{r['script']}: first paint {r['first_paint']:.3f}s > {max_first_paint:.3f}s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import and first-paint time of the GUI entry points.")
+    parser.add_argument("scripts", nargs="*", help=f"scripts to start (default: {' '.join(ENTRY_POINTS)})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="cold starts per script (median is reported)")
+    parser.add_argument("--max-import", type=float, default=MAX_IMPORT,
+                        help="fail if median time to window creation (s) exceeds this")
+    parser.add_argument("--max-first-paint", type=float, default=MAX_FIRST_PAINT,
+                        help="fail if median time to first paint (s) exceeds this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    scripts = args.scripts or [os.path.join(here, name) for name in ENTRY_POINTS]
+    try:
+        results = [run_startup_benchmark(script, max(1, args.runs)) for script in scripts]
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"FAIL {e}", file=sys.stderr)
+        return 2
+    for r in results:
+        r["script"] = os.path.basename(r["script"])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results))
+    failures = check_thresholds(results, args.max_import, args.max_first_paint)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import json
+
+import lmstudio_core
+from batch_runner import BatchRun, load_checkpoint
+
+
+def write_lines(path, lines):
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_checkpoint_skips_failures_and_cuts_a_partial_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_lines(output, [
+        json.dumps({"id": "1", "text": "ok", "error": None}) + "\n",
+        json.dumps({"id": "2", "text": None, "error": "timeout"}) + "\n",
+        '{"id": "3", "te',
+    ])
+    assert load_checkpoint(str(output)) == {"1"}
+    assert len(read_records(output)) == 2
+
+
+def test_missing_output_is_an_empty_checkpoint(tmp_path):
+    assert load_checkpoint(str(tmp_path / "none.jsonl")) == set()
+
+
+def test_resume_runs_only_unfinished_prompts(tmp_path, monkeypatch):
+    prompts = tmp_path / "prompts.jsonl"
+    write_lines(prompts, [
+        json.dumps("one") + "\n",
+        json.dumps({"id": "two", "prompt": "two"}) + "\n",
+        "\n",
+        json.dumps("three") + "\n",
+    ])
+    output = tmp_path / "out.jsonl"
+    write_lines(output, [
+        json.dumps({"id": "1", "prompt": "one", "text": "ONE", "error": None}) + "\n",
+        json.dumps({"id": "two", "prompt": "two", "text": None, "error": "refused"}) + "\n",
+        '{"id": "4", "pro',  # killed mid-write
+    ])
+    sent = []
+
+    def complete(payload):
+        sent.append(payload["prompt"])
+        return lmstudio_core.CompletionResult(text=payload["prompt"].upper(), elapsed=0.01, tokens=1)
+
+    monkeypatch.setattr(lmstudio_core, "complete", complete)
+    stats = BatchRun(str(prompts), str(output), concurrency=2).run()
+
+    assert sorted(sent) == ["three", "two"]
+    assert stats["error"] is None
+    assert (stats["total"], stats["skipped"], stats["completed"], stats["failed"]) == (3, 1, 2, 0)
+    latest = {record["id"]: record for record in read_records(output)}
+    assert {id_: record["text"] for id_, record in latest.items()} == {"1": "ONE", "two": "TWO", "4": "THREE"}
+
+
+def test_failed_prompts_are_recorded_and_retried_next_run(tmp_path, monkeypatch):
+    prompts = tmp_path / "prompts.jsonl"
+    write_lines(prompts, [json.dumps("flaky") + "\n"])
+    output = tmp_path / "out.jsonl"
+    outcomes = [RuntimeError("server down"), lmstudio_core.CompletionResult(text="done", elapsed=0.01)]
+
+    def complete(payload):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(lmstudio_core, "complete", complete)
+    assert BatchRun(str(prompts), str(output)).run()["failed"] == 1
+    assert BatchRun(str(prompts), str(output)).run()["completed"] == 1
+    assert [record["error"] for record in read_records(output)] == ["server down", None]
+    assert load_checkpoint(str(output)) == {"1"}
@@ -0,0 +1,56 @@
+import socket
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import mock_openai_server  # noqa: E402
+from lmstudio_client import EndpointRouter  # noqa: E402
+
+PAYLOAD = {"prompt": "hello", "max_tokens": 4}
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**settings):
+        server = mock_openai_server.start_server(**settings)
+        server.handle_error = lambda request, address: None  # timed-out clients hang up mid-response
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def unused_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+
+
+def test_refused_connection_fails_over(servers):
+    server = servers(ttft=0.0)
+    router = EndpointRouter([unused_url(), server.base_url], health_check_interval=0)
+    try:
+        for _ in range(2):  # the first try may land on either endpoint
+            assert router.post("completions", json=PAYLOAD).status_code == 200
+        assert server.requests_served == 2
+        dead = router.endpoints[0]
+        assert dead.failed >= 1 and dead.outstanding == 0
+    finally:
+        router.close()
+
+
+def test_read_timeout_is_not_replayed_on_another_endpoint(servers):
+    slow = [servers(ttft=1.0), servers(ttft=1.0)]
+    router = EndpointRouter([s.base_url for s in slow], health_check_interval=0, read_timeout=0.3)
+    try:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            router.post("completions", json=PAYLOAD)
+        assert sum(s.requests_served for s in slow) == 1
+    finally:
+        router.close()
@@ -0,0 +1,41 @@
+import socket
+
+import pytest
+
+pytest.importorskip("requests")
+
+import lmstudio_core  # noqa: E402
+from lmstudio_control import ServerControl  # noqa: E402
+
+
+@pytest.fixture
+def no_cli(monkeypatch):
+    def run_lms(*args):
+        raise FileNotFoundError(2, "No such file or directory", "lms")
+
+    monkeypatch.setattr(lmstudio_core, "run_lms", run_lms)
+
+
+@pytest.fixture
+def unreachable():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return ServerControl(f"http://127.0.0.1:{port}/v1")
+
+
+def test_no_server_and_no_cli_names_both_transports(no_cli, unreachable):
+    with pytest.raises(RuntimeError) as excinfo:
+        unreachable.list_models()
+    message = str(excinfo.value)
+    assert "REST API is unavailable" in message and "lms CLI was not found" in message
+    assert isinstance(excinfo.value.__cause__, FileNotFoundError)
+
+
+def test_status_without_a_server_needs_no_cli(no_cli, unreachable):
+    assert unreachable.status() == {"running": False, "loaded": []}
+
+
+def test_cli_only_calls_still_raise_file_not_found(no_cli, unreachable):
+    with pytest.raises(FileNotFoundError):
+        unreachable.call("list_models", transport="cli")
@@ -0,0 +1,157 @@
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from research_service import JobService, QueueFull, start_service
+
+
+class FakeCrews:
+    """Stands in for ResearchCrews; each run blocks until release() is called."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def run(self, topic, model):
+        self.started.release()
+        self.gate.wait(5)
+        if topic == "boom":
+            raise RuntimeError("crew failed")
+        return f"{topic} ({model})"
+
+    def release(self):
+        self.gate.set()
+
+    def summary(self):
+        return {}
+
+
+class BrokenLog:
+    def append(self, *args, **kwargs):
+        raise ValueError("ResultLog is closed")
+
+
+@pytest.fixture
+def crews():
+    crews = FakeCrews()
+    yield crews
+    crews.release()
+
+
+def busy_service(crews, **kwargs):
+    """A one-worker service whose worker is stuck on a first job."""
+    service = JobService(crews, model="m", workers=1, **kwargs)
+    service.start()
+    running = service.submit("first")
+    assert crews.started.acquire(timeout=5)
+    return service, running
+
+
+def test_queue_limit_and_cancel_frees_a_slot(crews):
+    service, _ = busy_service(crews, max_queued=2)
+    queued = [service.submit("a"), service.submit("b")]
+    with pytest.raises(QueueFull):
+        service.submit("c")
+    assert service.cancel(queued[0]["id"])["status"] == "cancelled"
+    assert service.stats()["queued"] == 1
+    late = service.submit("c")
+    crews.release()
+    assert service.wait(late["id"], timeout=5)["result"] == "c (m)"
+    assert service.get(queued[0]["id"])["status"] == "cancelled"
+    stats = service.stats()
+    assert (stats["done"], stats["cancelled"], stats["rejected"], stats["queued"]) == (3, 1, 1, 0)
+
+
+def test_running_job_cannot_be_cancelled(crews):
+    service, running = busy_service(crews)
+    assert service.cancel(running["id"])["status"] == "running"
+    assert service.cancel("nope") is None
+
+
+def test_stop_does_not_block_on_a_full_queue(crews):
+    service, _ = busy_service(crews, max_queued=1)
+    waiting = service.submit("waiting")
+    stopper = threading.Thread(target=service.stop)
+    stopper.start()
+    stopper.join(1)
+    assert not stopper.is_alive()
+    crews.release()
+    for thread in service._threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert service.get(waiting["id"])["status"] == "queued"
+
+
+def test_failures_do_not_cost_a_worker(crews):
+    crews.release()
+    service = JobService(crews, model="m", workers=1, result_log=BrokenLog())
+    service.start()
+    failed = service.wait(service.submit("boom")["id"], timeout=5)
+    assert (failed["status"], failed["error"]) == ("failed", "crew failed")
+    unlogged = service.wait(service.submit("x")["id"], timeout=5)
+    assert unlogged["status"] == "done" and unlogged["result"] == "x (m)"
+    assert "ResultLog is closed" in unlogged["error"]
+    # The worker is still there for the next job
+    assert service.wait(service.submit("y")["id"], timeout=5)["status"] == "done"
+    service.stop()
+
+
+def request(method, url, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, dict(resp.headers), json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+
+def test_http_api(crews):
+    service = JobService(crews, model="m", workers=1, max_queued=1)
+    server = start_service(service, port=0)  # starts the worker too
+    try:
+        status, _, running = request("POST", f"{server.url}/jobs", {"topic": "first"})
+        assert status == 202 and crews.started.acquire(timeout=5)
+        status, headers, job = request("POST", f"{server.url}/jobs", {"topic": "queued"})
+        assert status == 202 and headers["Location"] == f"/jobs/{job['id']}"
+        status, headers, _ = request("POST", f"{server.url}/jobs", {"topic": "too many"})
+        assert status == 503 and "Retry-After" in headers
+        assert request("POST", f"{server.url}/jobs", {"topic": ""})[0] == 400
+        assert request("DELETE", f"{server.url}/jobs/{running['id']}")[0] == 409
+        status, _, cancelled = request("DELETE", f"{server.url}/jobs/{job['id']}")
+        assert status == 200 and cancelled["status"] == "cancelled"
+        assert request("POST", f"{server.url}/jobs", {"topic": "now fits"})[0] == 202
+        assert request("GET", f"{server.url}/jobs/unknown")[0] == 404
+        crews.release()
+        status, _, finished = request("GET", f"{server.url}/jobs/{running['id']}?wait=5")
+        assert status == 200 and finished["status"] == "done"
+    finally:
+        server.shutdown()
+        service.stop()
+
+
+def test_bad_submissions_get_400(crews):
+    service = JobService(crews, model="m", workers=1)
+    server = start_service(service, port=0)
+    try:
+        for body in ({"topic": 5}, {"topic": "x", "model": ["m"]}, ["not", "an", "object"]):
+            status, _, error = request("POST", f"{server.url}/jobs", body)
+            assert status == 400 and "error" in error
+        host, port = server.server_address[:2]
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        try:
+            conn.putrequest("POST", "/jobs")
+            conn.putheader("Content-Length", "lots")
+            conn.endheaders()
+            resp = conn.getresponse()
+            assert resp.status == 400 and "Content-Length" in json.loads(resp.read())["error"]
+        finally:
+            conn.close()
+        assert service.stats()["submitted"] == 0
+    finally:
+        server.shutdown()
+        service.stop()
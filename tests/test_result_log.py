@@ -0,0 +1,80 @@
+import gzip
+import os
+
+from result_log import SEGMENT_PREFIX, SEGMENT_SUFFIX, ResultLog
+
+
+def make_log(path, **kwargs):
+    kwargs.setdefault("flush_interval", 60.0)  # flushes only when the tests ask for them
+    return ResultLog(str(path), **kwargs)
+
+
+def test_query_filters_and_keeps_write_order(tmp_path):
+    log = make_log(tmp_path)
+    try:
+        log.append("chips", "first", model="a")
+        log.append("energy", "other", model="a")
+        log.append("chips", "second", model="b")
+        assert [r["result"] for r in log.query(topic="chips")] == ["first", "second"]
+        assert [r["result"] for r in log.query(model="a")] == ["first", "other"]
+        assert [r["result"] for r in log.query(limit=1)] == ["first"]
+    finally:
+        log.close()
+
+
+def test_segments_roll_over_past_the_size_limit(tmp_path):
+    log = make_log(tmp_path, max_segment_bytes=1, batch_size=1)
+    try:
+        for n in range(3):
+            log.append("topic", f"result {n}")
+        assert len(log.segments()) == 3
+        assert [r["result"] for r in log.query()] == ["result 0", "result 1", "result 2"]
+    finally:
+        log.close()
+
+
+def test_reopen_reads_earlier_results_and_writes_a_new_segment(tmp_path):
+    log = make_log(tmp_path)
+    log.append("topic", "before")
+    log.close()
+
+    log = make_log(tmp_path)
+    try:
+        assert [r["result"] for r in log.query()] == ["before"]
+        log.append("topic", "after")
+        assert [r["result"] for r in log.query()] == ["before", "after"]
+        assert len(log.segments()) == 2
+        assert [(topic, count) for topic, count, _, _ in log.topics()] == [("topic", 2)]
+    finally:
+        log.close()
+
+
+def test_reopen_after_a_crash_reads_the_flushed_records(tmp_path):
+    crashed = make_log(tmp_path)
+    crashed.append("topic", "flushed")
+    crashed.flush()
+    crashed._raw.close()  # died without writing the gzip trailer
+    crashed._gz = crashed._raw = None
+    crashed._closed = True
+
+    log = make_log(tmp_path)
+    try:
+        log.append("topic", "next run")
+        assert [r["result"] for r in log.query()] == ["flushed", "next run"]
+    finally:
+        log.close()
+
+
+def test_segment_taken_by_another_process_is_skipped(tmp_path):
+    log = make_log(tmp_path)
+    try:
+        # Another process created the segment after this one listed the directory
+        taken = os.path.join(str(tmp_path), f"{SEGMENT_PREFIX}000001{SEGMENT_SUFFIX}")
+        with gzip.open(taken, "wb"):
+            pass
+        log.segments = lambda: []
+        log.append("topic", "mine")
+        assert log._segment == f"{SEGMENT_PREFIX}000002{SEGMENT_SUFFIX}"
+        assert [r["result"] for r in log.query()] == ["mine"]
+    finally:
+        log.close()
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from semantic_cache import SemanticCache  # noqa: E402
+
+VECTORS = {
+    "ai chips": [1.0, 0.0, 0.0],
+    "ai chip makers": [0.99, 0.1, 0.0],
+    "solar power": [0.0, 1.0, 0.0],
+    "wind power": [0.0, 0.0, 1.0],
+}
+
+
+def embed(texts):
+    return [VECTORS[text] for text in texts]
+
+
+def make_cache(path=None, **kwargs):
+    return SemanticCache(path=path, embed=embed, threshold=0.9, ttl=None, **kwargs)
+
+
+def test_similar_prompt_matches_within_its_model_only():
+    cache = make_cache()
+    cache.put("model-a", "ai chips", {}, "notes")
+    match = cache.lookup("model-a", "ai chip makers", {})
+    assert match.response == "notes" and match.prompt == "ai chips"
+    assert cache.lookup("model-b", "ai chip makers", {}) is None
+    assert cache.lookup("model-a", "ai chip makers", {"temperature": 0.1}) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.put("model-a", "ai chips", {}, "chips")
+    cache.put("model-b", "solar power", {}, "solar")
+    assert cache.lookup("model-a", "ai chips", {}) is not None  # model-b's entry is now the oldest
+    cache.put("model-a", "wind power", {}, "wind")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("model-b", "solar power", {}) is None
+    assert cache.lookup("model-a", "ai chips", {}).response == "chips"
+
+
+def test_entries_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "semantic.sqlite3")
+    cache = make_cache(path)
+    cache.put("model-a", "ai chips", {}, "notes")
+    cache.close()
+
+    cache = make_cache(path)
+    try:
+        assert cache.lookup("model-a", "ai chip makers", {}).response == "notes"
+    finally:
+        cache.close()
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from topic_scheduler import DEFAULT_INTERVAL, Topic, TopicScheduler, parse_topics
+
+
+def test_parse_topics_options_and_default_interval():
+    a, b = parse_topics("a | interval=0.1 priority=2; b")
+    assert (a.query, a.interval, a.priority) == ("a", 0.1, 2)
+    assert (b.query, b.interval, b.priority) == ("b", DEFAULT_INTERVAL, 0)
+    assert DEFAULT_INTERVAL > 0
+    with pytest.raises(ValueError):
+        parse_topics("a | speed=3")
+
+
+def test_topics_without_an_interval_do_not_rerun_back_to_back():
+    runs = []
+    lock = threading.Lock()
+
+    def run(topic):
+        with lock:
+            runs.append(topic.query)
+        time.sleep(0.01)
+
+    scheduler = TopicScheduler(run, parse_topics("a | interval=0.1; b"), max_workers=2)
+    scheduler.start()
+    time.sleep(0.6)
+    scheduler.stop()
+    assert runs.count("b") == 1
+    assert 2 <= runs.count("a") <= 7
+
+
+def finish(scheduler, topic, latency):
+    topic.running = True
+    scheduler.running += 1
+    scheduler._finish(topic, latency, None)
+    return topic.next_due - time.monotonic()
+
+
+def test_saturated_server_pushes_the_next_run_back():
+    topic = Topic("a", interval=10.0)
+    scheduler = TopicScheduler(lambda t: None, [topic])
+    assert finish(scheduler, topic, 1.0) == pytest.approx(10.0, abs=0.05)
+    # Latency balloons to 10x the best run: the ratio EWMA passes the slowdown factor
+    delays = [finish(scheduler, topic, 10.0) for _ in range(3)]
+    assert scheduler.latency_ratio > scheduler.slowdown_factor
+    assert all(delay > 10.0 + 5.0 for delay in delays)
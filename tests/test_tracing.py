@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def traced():
+    was_enabled = tracing.is_enabled()
+    tracing.clear()
+    tracing.enable()
+    yield
+    if not was_enabled:
+        tracing.disable()
+    tracing.clear()
+
+
+def complete_events(trace):
+    return {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+
+
+def test_spans_are_not_recorded_while_disabled(traced):
+    tracing.disable()
+    with tracing.span("ignored"):
+        pass
+    assert complete_events(tracing.chrome_trace()) == {}
+
+
+def test_nested_spans_fall_inside_their_parent(traced):
+    with tracing.span("outer", topic="chips") as args:
+        with tracing.span("inner"):
+            pass
+        args["status"] = 200
+    events = complete_events(tracing.chrome_trace())
+    outer, inner = events["outer"], events["inner"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 0.001  # rounding to 1 ns
+    assert outer["args"] == {"topic": "chips", "status": 200}
+    assert outer["tid"] == inner["tid"] == threading.get_ident()
+
+
+def test_spans_are_attributed_to_their_thread(traced):
+    def work():
+        with tracing.span("in worker"):
+            pass
+
+    worker = threading.Thread(target=work, name="trace-worker")
+    worker.start()
+    worker.join()
+    with tracing.span("in main"):
+        pass
+    trace = tracing.chrome_trace()
+    events = complete_events(trace)
+    assert events["in worker"]["tid"] != events["in main"]["tid"]
+    names = {e["tid"]: e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert names[events["in worker"]["tid"]] == "trace-worker"
+    assert names[events["in main"]["tid"]] == threading.current_thread().name
+
+
+def test_export_chrome_writes_trace_event_json(traced, tmp_path):
+    with tracing.span("request", url=object()):
+        pass
+    with tracing.span("parse"):
+        pass
+    path = tmp_path / "trace.json"
+    assert tracing.export_chrome(str(path)) == 2
+    trace = json.loads(path.read_text(encoding="utf-8"))
+    assert trace["displayTimeUnit"] == "ms"
+    phases = sorted(e["ph"] for e in trace["traceEvents"])
+    assert phases == ["M", "X", "X"]
+    for event in trace["traceEvents"]:
+        assert {"name", "ph", "pid", "tid", "args"} <= event.keys()
+    request = complete_events(trace)["request"]
+    assert request["dur"] >= 0 and isinstance(request["args"]["url"], str)  # unserializable args become str
+
+
+def test_summary_table_orders_by_total_time():
+    events = [("fast", 0.001), ("slow", 0.5), ("fast", 0.003), ("slow", 0.25)]
+    lines = tracing.summary_table(events=events).splitlines()
+    assert lines[0].split() == ["span", "count", "total", "s", "mean", "ms", "max", "ms"]
+    assert lines[1].split() == ["slow", "2", "0.750", "375.00", "500.00"]
+    assert lines[2].split() == ["fast", "2", "0.004", "2.00", "3.00"]
+    assert len(tracing.summary_table(limit=1, events=events).splitlines()) == 2
+    assert tracing.summary_table(events=[]) == "No spans recorded."
@@ -0,0 +1,198 @@
+"""Multi-topic scheduler for program.py's "Run Forever" mode.
+
+Topics are re-run on a bounded worker pool. Each topic has its own minimum interval
+between runs and a priority that decides which due topic goes first. Instead of a
+fixed sleep, the number of crews in flight adapts to the measured latency: it starts
+at one, grows while runs stay close to each topic's best observed latency and there
+is work waiting, and shrinks when latency inflates (the server is saturated). While
+the server is saturated, topics also wait longer before their next run.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_INTERVAL = 60.0       # seconds between the end of one run of a topic and the next
+DEFAULT_WORKERS = 2           # upper bound on crews running at once
+SLOWDOWN_FACTOR = 1.5         # latency above best * factor counts as "server saturated"
+LATENCY_SMOOTHING = 0.3       # weight of the newest sample in the latency ratio EWMA
+ERROR_BACKOFF_BASE = 5.0      # first retry delay after a failed run...
+ERROR_BACKOFF_MAX = 300.0     # ...doubling per consecutive failure up to this cap
+OVERLOAD_DELAY_MAX = 300.0    # cap on the extra wait added to a topic while the server is saturated
+
+
+@dataclass
+class Topic:
+    query: str
+    interval: float = DEFAULT_INTERVAL
+    priority: int = 0  # lower runs first when several topics are due
+    # Runtime state, maintained by the scheduler
+    next_due: float = 0.0
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    last_latency: Optional[float] = None
+    best_latency: Optional[float] = field(default=None, repr=False)
+
+
+def parse_topics(text, default_interval=DEFAULT_INTERVAL):
+    """Parse "topic a | interval=120 priority=1; topic b" into Topic objects.
+
+    Topics are separated by ';'. Options after '|' are key=value pairs
+    (interval in seconds, priority as an integer).
+    """
+    topics = []
+    for entry in text.split(";"):
+        query, _, options = entry.partition("|")
+        query = query.strip()
+        if not query:
+            continue
+        topic = Topic(query, interval=default_interval)
+        for option in options.replace(",", " ").split():
+            key, _, value = option.partition("=")
+            key = key.strip().lower()
+            try:
+                if key == "interval":
+                    topic.interval = max(0.0, float(value))
+                elif key == "priority":
+                    topic.priority = int(value)
+                else:
+                    raise ValueError(f"unknown option '{key}'")
+            except ValueError as e:
+                raise ValueError(f"Invalid option '{option}' for topic '{query}': {e}") from None
+        topics.append(topic)
+    return topics
+
+
+class TopicScheduler:
+    """Runs run_fn(topic) repeatedly for every topic on a bounded, latency-paced pool.
+
+    on_result(topic, result, latency) and on_error(topic, exc) are called from worker
+    threads. GUI callers must hand their work to the Tk thread themselves.
+    """
+
+    def __init__(self, run_fn, topics, max_workers=DEFAULT_WORKERS, on_result=None, on_error=None,
+                 slowdown_factor=SLOWDOWN_FACTOR):
+        self.run_fn = run_fn
+        self.topics = list(topics)
+        self.max_workers = max(1, max_workers)
+        self.on_result = on_result
+        self.on_error = on_error
+        self.slowdown_factor = slowdown_factor
+        self.concurrency_limit = 1  # slow start; grows while latency stays near the best seen
+        self.latency_ratio = None   # EWMA of latency / topic's best latency
+        self.running = 0
+        self.completed = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._executor = None
+        self._dispatcher = None
+
+    # ---- control ----
+    def start(self):
+        self._stop.clear()
+        now = time.monotonic()
+        for topic in self.topics:
+            topic.next_due = now
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="topic-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, wait=True):
+        """Stop dispatching new runs; with wait=True also wait for in-flight runs to finish."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def is_running(self):
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def queue_depth(self):
+        """Topics that are due but waiting for a worker."""
+        now = time.monotonic()
+        with self._cond:
+            return sum(1 for t in self.topics if not t.running and t.next_due <= now)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self.running,
+                "concurrency_limit": self.concurrency_limit,
+                "max_workers": self.max_workers,
+                "completed": self.completed,
+                "latency_ratio": self.latency_ratio,
+                "topics": [(t.query, t.runs, t.failures, t.last_latency) for t in self.topics],
+            }
+
+    # ---- internals ----
+    def _dispatch(self):
+        while not self._stop.is_set():
+            with self._cond:
+                now = time.monotonic()
+                due = [t for t in self.topics if not t.running and t.next_due <= now]
+                if due and self.running < self.concurrency_limit:
+                    topic = min(due, key=lambda t: (t.priority, t.next_due))
+                    topic.running = True
+                    self.running += 1
+                else:
+                    # Sleep until the next topic becomes due or a worker frees up
+                    waiting = [t.next_due for t in self.topics if not t.running]
+                    timeout = max(0.05, min(waiting) - now) if waiting and not due else None
+                    self._cond.wait(timeout)
+                    continue
+            self._executor.submit(self._run, topic)
+
+    def _run(self, topic):
+        start_time = time.monotonic()
+        try:
+            result = self.run_fn(topic)
+        except Exception as e:
+            self._finish(topic, None, e)
+            if self.on_error is not None:
+                self.on_error(topic, e)
+            return
+        latency = time.monotonic() - start_time
+        self._finish(topic, latency, None)
+        if self.on_result is not None:
+            self.on_result(topic, result, latency)
+
+    def _finish(self, topic, latency, error):
+        with self._cond:
+            now = time.monotonic()
+            topic.running = False
+            self.running -= 1
+            if error is not None:
+                topic.failures += 1
+                backoff = ERROR_BACKOFF_BASE * 2 ** min(topic.failures - 1, 16)
+                topic.next_due = now + min(ERROR_BACKOFF_MAX, backoff)
+            else:
+                topic.failures = 0
+                topic.runs += 1
+                topic.last_latency = latency
+                topic.next_due = now + topic.interval
+                self.completed += 1
+                self._adapt(topic, latency)
+                if self.latency_ratio > self.slowdown_factor:
+                    # Saturated: hold the topic back by the latency it lost to the backlog
+                    topic.next_due += min(OVERLOAD_DELAY_MAX, latency * (self.latency_ratio - 1))
+            self._cond.notify_all()
+
+    def _adapt(self, topic, latency):
+        # Compare against the topic's own best run so long and short topics mix fairly
+        if topic.best_latency is None or latency < topic.best_latency:
+            topic.best_latency = latency
+        ratio = latency / topic.best_latency if topic.best_latency > 0 else 1.0
+        if self.latency_ratio is None:
+            self.latency_ratio = ratio
+        else:
+            self.latency_ratio = LATENCY_SMOOTHING * ratio + (1 - LATENCY_SMOOTHING) * self.latency_ratio
+        waiting = any(not t.running and t.next_due <= time.monotonic() for t in self.topics)
+        if self.latency_ratio > self.slowdown_factor and self.concurrency_limit > 1:
+            self.concurrency_limit -= 1
+        elif self.latency_ratio <= self.slowdown_factor and waiting and self.concurrency_limit < self.max_workers:
+            self.concurrency_limit += 1
@@ -0,0 +1,136 @@
+"""Opt-in tracing of nested timed spans, exportable as Chrome trace-event JSON.
+
+Code wraps interesting steps (lms CLI calls, HTTP requests, JSON parsing, crew kickoffs,
+Tk update callbacks) in `with tracing.span("name", key=value):`. While tracing is off
+that costs one function call; while on, every span is recorded with its thread, and
+spans opened inside other spans nest, so a trace viewer (chrome://tracing,
+https://ui.perfetto.dev) shows them as a flame chart per thread. slowest() and
+summary_table() answer "where did the time go?" without a viewer.
+
+Enable with LMSTUDIO_TRACE=1 in the environment or tracing.enable().
+
+    python tracing.py summary trace.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+MAX_SPANS = 200000  # oldest spans are dropped past this many
+SUMMARY_ROWS = 15
+
+_enabled = os.environ.get("LMSTUDIO_TRACE", "") not in ("", "0")
+_spans = deque(maxlen=MAX_SPANS)  # (name, start_us, duration_us, thread id, thread name, args)
+_null = nullcontext()
+_pid = os.getpid()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    _spans.clear()
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as a span (a no-op while tracing is off)."""
+    if not _enabled:
+        return _null
+    return _span(name, args)
+
+
+@contextmanager
+def _span(name, args):
+    start = time.perf_counter()
+    try:
+        yield args  # callers may add results (status codes, sizes) to the span's args
+    finally:
+        end = time.perf_counter()
+        thread = threading.current_thread()
+        _spans.append((name, start * 1e6, (end - start) * 1e6, thread.ident, thread.name, args))
+
+
+def chrome_trace():
+    """The recorded spans in Chrome trace-event format ("X" complete events plus thread names)."""
+    events = []
+    threads = {}
+    for name, start, dur, tid, tname, args in list(_spans):
+        threads[tid] = tname
+        events.append({"name": name, "ph": "X", "ts": round(start, 3), "dur": round(dur, 3),
+                       "pid": _pid, "tid": tid, "args": {k: _jsonable(v) for k, v in args.items()}})
+    for tid, tname in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": tname}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome(path):
+    """Write the trace as JSON for chrome://tracing or Perfetto; returns the number of spans."""
+    trace = chrome_trace()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    return sum(1 for e in trace["traceEvents"] if e["ph"] == "X")
+
+
+def slowest(limit=SUMMARY_ROWS, events=None):
+    """Per span name: count, total, mean and max duration (seconds), slowest total first."""
+    totals = {}
+    for name, dur in events if events is not None else ((s[0], s[2] / 1e6) for s in list(_spans)):
+        entry = totals.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += dur
+        entry[2] = max(entry[2], dur)
+    rows = [{"name": name, "count": count, "total": total, "mean": total / count, "max": worst}
+            for name, (count, total, worst) in totals.items()]
+    rows.sort(key=lambda r: r["total"], reverse=True)
+    return rows[:limit]
+
+
+def summary_table(limit=SUMMARY_ROWS, events=None):
+    rows = slowest(limit, events)
+    if not rows:
+        return "No spans recorded."
+    width = max(len("span"), max(len(r["name"]) for r in rows))
+    lines = [f"{'span':<{width}}  {'count':>6}  {'total s':>9}  {'mean ms':>9}  {'max ms':>9}"]
+    for r in rows:
+        lines.append(f"{r['name']:<{width}}  {r['count']:>6}  {r['total']:>9.3f}  "
+                     f"{r['mean'] * 1000:>9.2f}  {r['max'] * 1000:>9.2f}")
+    return "\n".join(lines)
+
+
+def _jsonable(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+
+
+# ===================== CLI =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a Chrome trace written by tracing.export_chrome.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="print the spans with the most total time")
+    summary.add_argument("trace")
+    summary.add_argument("--limit", type=int, default=SUMMARY_ROWS)
+    args = parser.parse_args(argv)
+
+    with open(args.trace, encoding="utf-8") as f:
+        trace = json.load(f)
+    events = [(e["name"], e["dur"] / 1e6) for e in trace.get("traceEvents", []) if e.get("ph") == "X"]
+    print(summary_table(args.limit, events))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
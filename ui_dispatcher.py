@@ -0,0 +1,98 @@
+"""Thread-safe UI update queue drained on the Tk thread at a fixed frame rate.
+
+Worker threads never touch widgets. They push calls and text appends here, and the Tk
+thread applies everything queued once per frame. Consecutive appends to the same sink are
+merged into a single widget update, so a stream of tokens or a burst of results costs
+one insert per frame instead of one Tk callback each. trim_text() keeps Text widgets to
+a bounded scrollback so long sessions don't slow the window down.
+"""
+import queue
+import tkinter as tk
+
+import tracing
+
+FRAME_INTERVAL_MS = 33   # ~30 updates per second
+MAX_EVENTS_PER_FRAME = 5000  # anything beyond this waits for the next frame, keeping frames short
+
+
+class UIDispatcher:
+    """Queue of UI work for one Tk root; call()/append() are safe from any thread."""
+
+    def __init__(self, root, frame_interval_ms=FRAME_INTERVAL_MS):
+        self.root = root
+        self.frame_interval_ms = frame_interval_ms
+        self._events = queue.SimpleQueue()
+        self.frames = 0
+        self.merged = 0  # appends folded into a previous one
+
+    def start(self):
+        self.root.after(self.frame_interval_ms, self._drain)
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the Tk thread, in order with everything else queued."""
+        self._events.put((fn, args, None, None))
+
+    def append(self, fn, text, key=None):
+        """Hand text to fn on the Tk thread as fn(text), or fn(key, text) when key is given.
+
+        Consecutive appends with the same fn and key are concatenated into one call.
+        """
+        self._events.put((fn, None, key, text))
+
+    # ---- internals (Tk thread) ----
+    def _drain(self):
+        try:
+            pending_fn = pending_key = None
+            parts = []
+            for _ in range(MAX_EVENTS_PER_FRAME):
+                try:
+                    fn, args, key, text = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if args is None and parts and fn is pending_fn and key == pending_key:
+                    parts.append(text)
+                    self.merged += 1
+                    continue
+                if parts:
+                    self._flush(pending_fn, pending_key, parts)
+                    parts = []
+                if args is None:
+                    pending_fn, pending_key = fn, key
+                    parts.append(text)
+                else:
+                    self._run(fn, args)
+            if parts:
+                self._flush(pending_fn, pending_key, parts)
+            self.frames += 1
+        finally:
+            self.root.after(self.frame_interval_ms, self._drain)
+
+    def _flush(self, fn, key, parts):
+        text = "".join(parts)
+        self._run(fn, (text,) if key is None else (key, text))
+
+    @staticmethod
+    def _run(fn, args):
+        try:
+            with tracing.span(f"ui {getattr(fn, '__name__', 'call')}"):
+                fn(*args)
+        except Exception as e:
+            # One failing update must not stop the loop that drives every other one
+            print(f"UI update {getattr(fn, '__name__', fn)} failed: {e}")
+
+
+def trim_text(widget, max_lines):
+    """Delete the oldest lines of a Text widget so at most max_lines remain."""
+    lines = int(widget.index("end-1c").split(".")[0])
+    if lines > max_lines:
+        widget.delete("1.0", f"{lines - max_lines + 1}.0")
+
+
+def append_text(widget, text, max_lines=None):
+    """Append to a (possibly read-only) Text widget, trim its scrollback and scroll to the end."""
+    widget.configure(state="normal")
+    widget.insert(tk.END, text)
+    if max_lines is not None:
+        trim_text(widget, max_lines)
+    widget.configure(state="disabled")
+    widget.see(tk.END)
@@ -1,9 +1,25 @@
-import subprocess
+import itertools
+import queue
 import threading
-import requests
-import psutil
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
+
+import batch_runner
+import lmstudio_client
+import lmstudio_core
+import tracing
+from load_autotuner import LoadProfiles, autotune, default_sweep, format_options, format_trial, max_trials
+from lmstudio_control import ServerControl, UnsupportedOption
+from metrics_sampler import MetricsSampler
+from model_inventory import ModelInventory
+from model_stats import MIN_SAMPLES, TARGET_LATENCY, ModelStats, run_model_benchmark
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from server_lifecycle import ServerLifecycle
+from ui_dispatcher import UIDispatcher, append_text
 
 # Ensure LM Studio's CLI is available. If not, inform the user.
 # (In a real scenario, you might check `shutil.which("lms")` and prompt to install via `npx lmstudio install-cli` if missing.)
@@ -11,6 +27,42 @@ from tkinter import ttk, scrolledtext, messagebox
 # LM Studio server default configuration
 LMSTUDIO_PORT = 1234  # default port for LM Studio API server
 API_BASE_URL = f"http://localhost:{LMSTUDIO_PORT}/v1"
+# LM Studio instances queries are spread across (other ports/hosts can be added). With more than
+# one, requests go to the instance with the fewest outstanding requests and failing ones are ejected;
+# Start/Stop Server and model loading still act on the local instance through the CLI.
+API_BASE_URLS = [API_BASE_URL]
+# All HTTP calls go through one pooled keep-alive client with timeouts and retries
+lmstudio_client.configure(base_urls=API_BASE_URLS)
+# Server status, the model list and load/unload use LM Studio's REST API when the server has it,
+# falling back to spawning the lms CLI (always used for Start/Stop Server)
+control = ServerControl(API_BASE_URL)
+
+# Lines kept in the response box; older output is trimmed so the widget stays fast
+OUTPUT_SCROLLBACK_LINES = 2000
+# Delay before the model refresh, server probe and metrics sampler start (see start_background_work)
+DEFERRED_START_MS = 200
+
+# Host and LM Studio process metrics are sampled on a background thread into a ring
+# buffer; the GUI only reads the latest sample. Exports go to metrics/ next to this script.
+metrics = MetricsSampler()
+METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+
+# Query queue: prompts are queued and run on a bounded worker pool so several can be in flight at once
+DEFAULT_CONCURRENCY = 2   # queries sent to LM Studio at the same time (adjustable in the GUI)
+MAX_CONCURRENCY = 8       # size of the worker pool / upper bound for the concurrency spinner
+QUERY_DEADLINE = 300.0    # seconds a query may run before its stream is aborted
+
+# Completed responses are cached by (model, prompt, sampling params): memory LRU + SQLite file on disk
+response_cache = ResponseCache()
+# Optional "Match similar" tier: prompts are embedded through /v1/embeddings (needs an embedding
+# model in LM Studio) and a paraphrase of an earlier prompt gets that prompt's response
+SEMANTIC_THRESHOLD = 0.92  # cosine similarity needed to reuse an earlier response
+semantic_cache = SemanticCache(threshold=SEMANTIC_THRESHOLD)
+# Per-model latency, tokens/sec and load time of every query and load, used for model recommendations
+model_stats = ModelStats()
+target_latency = TARGET_LATENCY  # seconds; set from the GUI, read by worker threads
+# Best load settings per model found by "Autotune Load"; Load Model applies them automatically
+load_profiles = LoadProfiles()
 
 # Global state variables
 server_running = False
@@ -20,8 +72,11 @@ started_server_this_session = False
 # Initialize main application window
 root = tk.Tk()
 root.title("LM Studio Controller")
-root.geometry("600x500")  # width x height
+root.geometry("600x750" if len(API_BASE_URLS) > 1 else "600x720")  # width x height
 root.resizable(False, False)  # fixed window size for simplicity
+# Worker threads queue their widget updates here; the Tk thread applies them once per frame
+# (streamed tokens for the same query are merged into one insert)
+ui = UIDispatcher(root)
 
 # Define GUI elements
 status_label = tk.Label(root, text="Server Status: Stopped", fg="red")
@@ -35,17 +90,63 @@ load_button = tk.Button(root, text="Load Model")
 prompt_label = tk.Label(root, text="Prompt:")
 prompt_text = scrolledtext.ScrolledText(root, height=5, width=70)
 run_button = tk.Button(root, text="Run Query")
+stream_var = tk.BooleanVar(value=True)
+stream_check = tk.Checkbutton(root, text="Stream tokens", variable=stream_var)
+concurrency_frame = tk.Frame(root)
+concurrency_label = tk.Label(concurrency_frame, text="Parallel queries:")
+concurrency_var = tk.StringVar(value=str(DEFAULT_CONCURRENCY))
+concurrency_spin = tk.Spinbox(concurrency_frame, from_=1, to=MAX_CONCURRENCY, width=3,
+                              textvariable=concurrency_var, state="readonly")
+bypass_cache_var = tk.BooleanVar(value=False)
+bypass_cache_check = tk.Checkbutton(concurrency_frame, text="Bypass cache", variable=bypass_cache_var)
+semantic_var = tk.BooleanVar(value=False)
+semantic_check = tk.Checkbutton(concurrency_frame, text="Match similar", variable=semantic_var)
 output_label = tk.Label(root, text="Response:")
 output_text = scrolledtext.ScrolledText(root, height=10, width=70)
 output_text.configure(state="disabled")  # make output read-only initially
+# Queue view: one row per submitted query with its status and latency; select a row to show its response
+queue_side = tk.Frame(root)
+queue_label = tk.Label(queue_side, text="Queue:")
+# Batch mode: run a JSONL prompt file with the same concurrency; results stream to <file>.results.jsonl
+batch_button = tk.Button(queue_side, text="Batch...")
+# Cancel the selected query: queued ones never start, running ones have their stream aborted
+# (which also stops generation on the server)
+cancel_button = tk.Button(queue_side, text="Cancel")
+queue_view = ttk.Treeview(root, columns=("id", "prompt", "status", "latency"), show="headings", height=5)
+for column, heading, width in (("id", "#", 40), ("prompt", "Prompt", 270), ("status", "Status", 80), ("latency", "Latency", 80)):
+    queue_view.heading(column, text=heading)
+    queue_view.column(column, width=width, anchor="w", stretch=False)
 # Labels for resource usage and tips
-usage_label = tk.Label(root, text="CPU: 0%   Memory: 0%")
+usage_label = tk.Label(root, text="CPU: 0%   Memory: 0%", justify="left")
+export_frame = tk.Frame(root)
+export_button = tk.Button(export_frame, text="Export Metrics")
+# Opt-in span tracing (also on when LMSTUDIO_TRACE=1); the trace is written with the metrics export
+trace_var = tk.BooleanVar(value=tracing.is_enabled())
+trace_check = tk.Checkbutton(export_frame, text="Trace", variable=trace_var,
+                             command=lambda: tracing.enable() if trace_var.get() else tracing.disable())
 tip_label = tk.Label(root, text="", fg="orange")  # will display performance tips when needed
+perf_label = tk.Label(root, text="")  # time-to-first-token and tokens/sec of the last streamed query
+cache_label = tk.Label(root, text="Cache: 0 hits / 0 misses")
+endpoint_label = tk.Label(root, text="", justify="left", wraplength=580)  # per-instance load, latency and throughput
+# Measured model recommendations: target latency and a button to benchmark every listed model
+benchmark_frame = tk.Frame(root)
+target_label = tk.Label(benchmark_frame, text="Target latency (s):")
+target_var = tk.StringVar(value=f"{TARGET_LATENCY:g}")
+target_entry = tk.Entry(benchmark_frame, textvariable=target_var, width=5)
+benchmark_button = tk.Button(benchmark_frame, text="Benchmark Models")
+# Load a new model next to the current one and switch once it is warmed up (when RAM allows)
+hot_swap_var = tk.BooleanVar(value=True)
+hot_swap_check_button = tk.Checkbutton(benchmark_frame, text="Hot swap on load", variable=hot_swap_var)
+# Sweep context length, CPU threads and GPU offload for the selected model and keep the fastest setting
+autotune_button = tk.Button(benchmark_frame, text="Autotune Load")
 
 # Place GUI elements using grid geometry for a structured layout
 status_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
 start_button.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 stop_button.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+export_button.pack(side="left")
+trace_check.pack(side="left")
+export_frame.grid(row=0, column=3, padx=5, pady=5, sticky="w")
 
 model_label.grid(row=1, column=0, padx=5, pady=5, sticky="e")
 model_combo.grid(row=1, column=1, padx=5, pady=5, sticky="we", columnspan=2)
@@ -53,13 +154,35 @@ load_button.grid(row=1, column=3, padx=5, pady=5, sticky="w")
 
 prompt_label.grid(row=2, column=0, padx=5, pady=(10,5), sticky="ne")
 prompt_text.grid(row=2, column=1, padx=5, pady=(10,5), columnspan=3)
+concurrency_label.pack(side="left")
+concurrency_spin.pack(side="left")
+bypass_cache_check.pack(side="left", padx=(10,0))
+semantic_check.pack(side="left")
+concurrency_frame.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+stream_check.grid(row=3, column=2, padx=5, pady=5, sticky="e")
 run_button.grid(row=3, column=3, padx=5, pady=5, sticky="e")
 
 output_label.grid(row=4, column=0, padx=5, pady=(10,5), sticky="nw")
 output_text.grid(row=4, column=1, padx=5, pady=(10,5), columnspan=3)
 
-usage_label.grid(row=5, column=0, padx=5, pady=5, sticky="w")
-tip_label.grid(row=5, column=1, padx=5, pady=5, columnspan=3, sticky="w")
+queue_label.pack(side="top", anchor="e")
+batch_button.pack(side="top", anchor="e", pady=(5,0))
+cancel_button.pack(side="top", anchor="e", pady=(5,0))
+queue_side.grid(row=5, column=0, padx=5, pady=5, sticky="ne")
+queue_view.grid(row=5, column=1, padx=5, pady=5, columnspan=3, sticky="w")
+
+usage_label.grid(row=6, column=0, padx=5, pady=5, sticky="w")
+tip_label.grid(row=6, column=1, padx=5, pady=5, columnspan=3, sticky="w")
+cache_label.grid(row=7, column=0, padx=5, pady=(0,5), sticky="w")
+perf_label.grid(row=7, column=1, padx=5, pady=(0,5), columnspan=3, sticky="w")
+target_label.pack(side="left")
+target_entry.pack(side="left")
+benchmark_button.pack(side="left", padx=(10,0))
+hot_swap_check_button.pack(side="left", padx=(10,0))
+autotune_button.pack(side="left", padx=(10,0))
+benchmark_frame.grid(row=8, column=1, padx=5, pady=(0,5), columnspan=3, sticky="w")
+if len(API_BASE_URLS) > 1:
+    endpoint_label.grid(row=9, column=0, padx=5, pady=(0,5), columnspan=4, sticky="w")
 
 # Configure some widget options
 start_button.configure(width=10)
@@ -71,268 +194,709 @@ load_button.config(state="disabled")
 run_button.config(state="disabled")
 stop_button.config(state="disabled")
 
-# Function to update the model dropdown with available models
-def refresh_model_list():
-    try:
-        # Use the LM Studio CLI to list models in JSON for easy parsing
-        result = subprocess.run(["lms", "ls", "--json"], capture_output=True, text=True)
-        model_list = []
-        if result.returncode == 0:
-            import json
-            try:
-                data = json.loads(result.stdout)
-                # Assuming data is a list of models with 'filename' or 'name' field
-                for m in data:
-                    # Some JSON entries might have 'name' or 'filename'; handle accordingly
-                    name = m.get("name") or m.get("filename") or str(m)
-                    model_list.append(name)
-            except json.JSONDecodeError:
-                # If JSON parsing failed, fallback to plain text parsing
-                lines = result.stdout.strip().splitlines()
-                for line in lines:
-                    # ignore empty lines or header lines if any
-                    if line.strip() and "Models directory" not in line:
-                        # Take the first token or whole line as model name (assuming name is one word or rest of line)
-                        model_name = line.split(":")[0]  # split at ':' if output like 'ModelName: ...'
-                        model_list.append(model_name.strip())
-        else:
-            # If the CLI returned an error (perhaps --json not supported), try without JSON
-            result = subprocess.run(["lms", "ls"], capture_output=True, text=True)
-            if result.returncode == 0:
-                lines = result.stdout.strip().splitlines()
-                for line in lines:
-                    if line.strip() and "Models directory" not in line:
-                        model_name = line.split(":")[0]
-                        model_list.append(model_name.strip())
-    except FileNotFoundError:
-        messagebox.showerror("LM Studio CLI not found", 
-            "The 'lms' CLI tool for LM Studio is not found. Please ensure LM Studio is installed and the CLI is set up.")
-        return []
+# Model inventory: listed (REST, or `lms ls` while the server is down) on a background thread;
+# the GUI starts from the last snapshot on disk
+model_inventory = ModelInventory("lms", control.list_models)
 
-    # Update the combobox values
+# Update the combobox values (main thread), keeping the current selection if it still exists
+def show_model_list(model_list):
+    selected = model_var.get()
     model_combo['values'] = model_list
+    if selected in model_list:
+        return
     if model_list:
         model_combo.current(0)  # pre-select the first model by default
-    return model_list
+    else:
+        model_var.set("")
+
+def show_cli_missing(error):
+    messagebox.showerror("LM Studio CLI not found",
+        "The 'lms' CLI tool for LM Studio is not found. Please ensure LM Studio is installed and the CLI is set up.")
+
+# Function to refresh the model dropdown in the background; on_done(models) runs on the main thread
+def refresh_model_list(force=True, on_done=None):
+    def done(model_list, changed):
+        def apply():
+            if changed or list(model_combo['values']) != model_list:
+                show_model_list(model_list)
+            if on_done is not None:
+                on_done(model_list)
+        ui.call(apply)
+
+    def failed(error):
+        if isinstance(error, FileNotFoundError):
+            ui.call(lambda: show_cli_missing(error))
+        else:
+            ui.call(lambda: messagebox.showerror("Model List Failed", f"Could not list models:\n{error}"))
+
+    return model_inventory.refresh_async(force=force, on_done=done, on_error=failed)
+
+# Server lifecycle: `lms server start/stop` run off the UI thread and readiness is
+# detected by probing /v1/models rather than by matching CLI output
+server_lifecycle = ServerLifecycle(control.start_server, control.stop_server, base_url=API_BASE_URL)
 
 # Function to start the LM Studio server
 def start_server():
+    # Launch (or detect) the server in the background; the buttons stay disabled meanwhile
+    if not server_lifecycle.start_async(on_ready=lambda *r: ui.call(lambda: on_server_ready(*r)),
+                                        on_error=lambda e: ui.call(lambda: on_server_start_failed(e))):
+        return  # a start/stop is already in progress
+    status_label.config(text="Server Status: Starting...", fg="orange")
+    start_button.config(state="disabled")
+    stop_button.config(state="disabled")
+
+def on_server_ready(cold_start_time, already_running):
     global server_running, started_server_this_session
-    # Double-check if not already running
-    try:
-        status_res = subprocess.run(["lms", "server", "status"], capture_output=True, text=True)
-        if "ON" in status_res.stdout or "running" in status_res.stdout:
-            # Server already running
-            server_running = True
-        else:
-            # Launch the server
-            status_label.config(text="Server Status: Starting...", fg="orange")
-            root.update_idletasks()
-            result = subprocess.run(["lms", "server", "start"], capture_output=True, text=True)
-            # Check output for confirmation
-            if result.returncode == 0 and ("now running" in result.stdout or "ON" in result.stdout):
-                server_running = True
-                started_server_this_session = True
-            else:
-                # Failed to start – show error
-                server_running = False
-                err_msg = result.stderr if result.stderr else result.stdout
-                messagebox.showerror("Server Start Failed", f"Could not start LM Studio server.\nOutput: {err_msg}")
-                status_label.config(text="Server Status: Stopped", fg="red")
-                return
-    except FileNotFoundError:
-        messagebox.showerror("LM Studio CLI not found", 
-            "Cannot start server because 'lms' CLI was not found. Ensure LM Studio is installed.")
-        return
-
-    if server_running:
+    server_running = True
+    if not already_running:
+        started_server_this_session = True
+        status_label.config(text=f"Server Status: Running (ready in {cold_start_time:.1f}s)", fg="green")
+    else:
         status_label.config(text="Server Status: Running", fg="green")
-        # Now that server is on, enable model loading
-        load_button.config(state="normal")
-        stop_button.config(state="normal")
-        # Populate model list
-        refresh_model_list()
+    start_button.config(state="normal")
+    # Now that server is on, enable model loading
+    load_button.config(state="normal")
+    stop_button.config(state="normal")
+    # Populate model list
+    refresh_model_list()
+
+def on_server_start_failed(error):
+    global server_running
+    server_running = False
+    start_button.config(state="normal")
+    status_label.config(text="Server Status: Stopped", fg="red")
+    if isinstance(error, FileNotFoundError):
+        messagebox.showerror("LM Studio CLI not found",
+            "Cannot start server because 'lms' CLI was not found. Ensure LM Studio is installed.")
     else:
-        status_label.config(text="Server Status: Stopped", fg="red")
+        # Failed to start – show error
+        messagebox.showerror("Server Start Failed", f"Could not start LM Studio server.\nOutput: {error}")
 
 # Function to stop the LM Studio server
 def stop_server():
-    global server_running, started_server_this_session, current_model
+    if not server_lifecycle.stop_async(on_stopped=lambda: ui.call(on_server_stopped),
+                                       on_error=lambda e: ui.call(lambda: on_server_stop_failed(e))):
+        return
+    status_label.config(text="Server Status: Stopping...", fg="orange")
+    stop_button.config(state="disabled")
+
+def on_server_stopped():
+    global server_running, current_model
+    server_running = False
+    current_model = None
+    status_label.config(text="Server Status: Stopped", fg="red")
+    load_button.config(state="disabled")
+    run_button.config(state="disabled")
+    stop_button.config(state="disabled")
+
+def on_server_stop_failed(error):
+    stop_button.config(state="normal")
+    status_label.config(text="Server Status: Running", fg="green")
+    if isinstance(error, FileNotFoundError):
+        messagebox.showerror("LM Studio CLI not found", "Cannot stop server because 'lms' CLI was not found.")
+    else:
+        messagebox.showerror("Server Stop Failed", f"Could not stop LM Studio server.\n{error}")
+
+# Hot swap: the new model is loaded next to the current one, warmed up, and only then
+# replaces it, so queries keep being answered during the switch. It needs free RAM for
+# both models (GPU memory isn't visible to psutil, so offloaded models may still fail to load).
+HOT_SWAP_HEADROOM = 1.2  # free RAM required, as a multiple of the new model's size
+WARMUP_PROMPT = "Hello"  # one-token completion sent before a new model takes queries
+
+def hot_swap_check(model_name):
+    """(ok, reason): whether the latest memory sample leaves room to load model_name alongside the current model."""
+    sample = metrics.latest()
+    if sample is None:
+        return False, "no memory reading yet"
+    # Prefer the size the CLI reports; otherwise assume it is about as big as what the server holds now
+    size = control.model_sizes().get(model_name) or sample["server_rss"]
+    if not size:
+        return False, "model size unknown"
+    needed = size * HOT_SWAP_HEADROOM
+    if sample["mem_available"] < needed:
+        return False, f"needs {needed / (1024**3):.1f} GB free, {sample['mem_available'] / (1024**3):.1f} GB available"
+    return True, ""
+
+def warm_up_model(model_name):
+    """Send a one-token completion so the first real query doesn't pay warm-up costs; returns seconds."""
+    start_time = time.perf_counter()
     try:
-        result = subprocess.run(["lms", "server", "stop"], capture_output=True, text=True)
-        # Assume if returncode 0, it's stopped
-        server_running = False
+        lmstudio_core.complete(lmstudio_core.build_completion_payload(WARMUP_PROMPT, model=model_name, max_tokens=1))
+    except Exception:
+        pass  # a failed warm-up isn't fatal; the model is loaded either way
+    return time.perf_counter() - start_time
+
+# Swap models through the control layer (runs on worker threads). Returns (load_time, warmup_time, mode)
+# where mode describes how the swap happened; raises RuntimeError with the server's or CLI's message if
+# the load fails, or naming both transports if neither the REST API nor the lms CLI is available.
+def lms_load(model_name, hot_swap=False, warm_up=True):
+    global current_model
+    old_model = current_model
+    hot, mode = False, "cold swap"
+    if hot_swap and old_model and old_model != model_name:
+        hot, reason = hot_swap_check(model_name)
+        mode = "hot swap" if hot else f"cold swap: {reason}"
+    if old_model and not hot:
+        # Unload the currently loaded model first (to free memory)
+        try:
+            control.unload(old_model)
+        except (FileNotFoundError, RuntimeError):
+            pass  # If it can't be unloaded, the load below reports the real problem
         current_model = None
-        status_label.config(text="Server Status: Stopped", fg="red")
-        load_button.config(state="disabled")
-        run_button.config(state="disabled")
-        stop_button.config(state="disabled")
-    except FileNotFoundError:
-        messagebox.showerror("LM Studio CLI not found", "Cannot stop server because 'lms' CLI was not found.")
+    # Load the new model with its autotuned settings, if it has any (otherwise LM Studio's defaults:
+    # max GPU offload); on a hot swap a failure leaves the old model serving
+    options = load_profiles.options(model_name)
+    try:
+        load_time = control.load(model_name, **options)
+    except UnsupportedOption:
+        options = {}  # loaded through the CLI, which can't apply the whole profile
+        load_time = control.load(model_name)
+    if options:
+        mode += f", tuned: {format_options(options)}"
+    warmup_time = warm_up_model(model_name) if warm_up else None
+    # A single assignment: queries started from here on go to the new model
+    current_model = model_name
+    if hot:
+        try:
+            control.unload(old_model)
+        except (FileNotFoundError, RuntimeError):
+            pass
+    return load_time, warmup_time, mode
 
 # Background thread target for loading a model
-def load_model_thread(model_name):
-    global current_model
-    # Unload any currently loaded model first (to free memory)
+def load_model_thread(model_name, hot_swap=False):
     try:
-        if current_model:
-            subprocess.run(["lms", "unload", current_model], capture_output=True, text=True)
-    except FileNotFoundError:
-        pass  # If CLI not found, error already handled earlier
-    # Load the new model with GPU acceleration
-    try:
-        # The -y flag auto-confirms and uses max GPU by default (per LM Studio CLI docs)
-        result = subprocess.run(["lms", "load", model_name, "-y"], capture_output=True, text=True)
+        load_time, warmup_time, mode = lms_load(model_name, hot_swap)
     except FileNotFoundError:
-        root.after(0, lambda: messagebox.showerror("LM Studio CLI not found", 
+        ui.call(lambda: messagebox.showerror("LM Studio CLI not found", 
                      "Cannot load model because 'lms' CLI was not found."))
+        ui.call(lambda: load_button.config(state="normal"))
         return
-
-    if result.returncode != 0:
+    except RuntimeError as e:
         # Loading failed, show error (possibly model not found or other issue)
-        err = result.stderr if result.stderr else result.stdout
-        root.after(0, lambda: messagebox.showerror("Model Load Failed", f"Could not load model '{model_name}'.\nDetails: {err}"))
-        root.after(0, lambda: status_label.config(text="Server Status: Running (Model load failed)", fg="orange"))
+        err = str(e)
+        ui.call(lambda: messagebox.showerror("Model Load Failed", f"Could not load model '{model_name}'.\nDetails: {err}"))
+        ui.call(lambda: load_failed(model_name))
         return
 
-    # If success, set current_model and update UI
-    current_model = model_name
-    root.after(0, lambda: status_label.config(text=f"Server Status: Running - Model: {model_name}", fg="green"))
-    root.after(0, lambda: run_button.config(state="normal"))  # enable query button now that model is loaded
+    # If success, record the load time and update UI
+    model_stats.record_load(model_name, load_time)
+    details = f"loaded in {load_time:.1f}s, warm-up {warmup_time:.2f}s, {mode}"
+    ui.call(lambda: status_label.config(text=f"Server Status: Running - Model: {model_name} ({details})", fg="green"))
+    ui.call(lambda: run_button.config(state="normal"))  # enable query button now that model is loaded
+    ui.call(lambda: load_button.config(state="normal"))
+
+def load_failed(model_name):
+    load_button.config(state="normal")
+    if current_model:
+        # A failed hot swap leaves the previous model loaded and answering queries
+        run_button.config(state="normal")
+        status_label.config(text=f"Server Status: Running - Model: {current_model} (loading '{model_name}' failed)", fg="orange")
+    else:
+        status_label.config(text="Server Status: Running (Model load failed)", fg="orange")
 
 # Function to initiate model loading in a thread
 def load_model():
     model_name = model_var.get().strip()
     if not model_name:
         return  # no model selected
+    hot_swap = hot_swap_var.get()
     # Disable UI elements related to model loading and querying while loading
+    # (with hot swap the current model keeps answering queries until the new one is ready)
     load_button.config(state="disabled")
-    run_button.config(state="disabled")
+    if not hot_swap:
+        run_button.config(state="disabled")
     status_label.config(text=f"Server Status: Running - Loading '{model_name}'...", fg="orange")
     # Start background thread to load model
-    threading.Thread(target=load_model_thread, args=(model_name,), daemon=True).start()
+    threading.Thread(target=load_model_job, args=(model_name, hot_swap), daemon=True).start()
 
-# Background thread target for running an inference query
-def run_query_thread(prompt):
-    global current_model
-    # Prepare request payload for completion
-    payload = {
-        "model": current_model or "",  # model field; LM Studio uses the loaded model anyway
-        "prompt": prompt,
-        "max_tokens": 100,
-        "temperature": 0.7,
-        # You can add other OpenAI-compatible parameters here if needed (top_p, etc.)
-    }
-    headers = {"Content-Type": "application/json"}
-    # Use a dummy API key as LM Studio does not require a real key (OpenAI compatibility)
-    headers["Authorization"] = "Bearer lm-studio"
+def load_model_job(model_name, hot_swap=False):
+    # Mark the load in the metrics timeline so its CPU/RSS footprint can be lined up afterwards
+    metrics.mark("model_load_start", model=model_name)
     try:
-        # Measure start time
-        import time
-        start_time = time.time()
-        resp = requests.post(f"{API_BASE_URL}/completions", json=payload, headers=headers)
-        elapsed = time.time() - start_time
-    except Exception as e:
-        # If request fails (e.g., server not responding), show an error in the GUI
-        root.after(0, lambda: messagebox.showerror("Query Failed", f"Failed to get response from model:\n{e}"))
-        root.after(0, lambda: run_button.config(state="normal"))
+        load_model_thread(model_name, hot_swap)
+    finally:
+        metrics.mark("model_load_end", model=model_name)
+
+# ===================== Query queue =====================
+# Queued queries wait here; a dispatcher thread hands them to the worker pool in FIFO
+# order while fewer than concurrency_limit are running
+query_queue = queue.Queue()
+query_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="query")
+query_slots = threading.Condition()
+running_queries = 0
+concurrency_limit = DEFAULT_CONCURRENCY
+query_ids = itertools.count(1)
+# Per-query state (prompt, status, latency, response text); only touched on the main thread
+query_records = {}
+displayed_query = None  # id of the query whose response is shown in output_text
+
+def dispatch_queries():
+    global running_queries
+    while True:
+        item = query_queue.get()
+        if item[-1].cancelled:
+            continue  # cancelled while queued; its status is already set
+        with query_slots:
+            while running_queries >= concurrency_limit:
+                query_slots.wait()
+            running_queries += 1
+        query_executor.submit(run_query_job, *item)
+
+def run_query_job(request_id, prompt, stream, use_cache, use_semantic, cancel):
+    global running_queries
+    metrics.mark("query_start", id=request_id)
+    try:
+        with tracing.span("query", id=request_id, stream=stream):
+            run_query_thread(request_id, prompt, stream, use_cache, use_semantic, cancel)
+    finally:
+        metrics.mark("query_end", id=request_id)
+        with query_slots:
+            running_queries -= 1
+            query_slots.notify_all()
+
+def set_concurrency_limit():
+    global concurrency_limit
+    with query_slots:
+        concurrency_limit = max(1, min(MAX_CONCURRENCY, int(concurrency_var.get())))
+        query_slots.notify_all()
+
+# Helpers that touch the queue view and output widgets; always call these on the main thread (via ui.call)
+def set_query_status(request_id, status, latency=None):
+    record = query_records[request_id]
+    record["status"] = status
+    if latency is not None:
+        record["latency"] = latency
+    latency_text = f"{record['latency']:.2f}s" if record["latency"] is not None else ""
+    queue_view.set(str(request_id), "status", status)
+    queue_view.set(str(request_id), "latency", latency_text)
+
+def show_query(request_id):
+    global displayed_query
+    displayed_query = request_id
+    output_text.configure(state="normal")
+    output_text.delete("1.0", tk.END)
+    output_text.insert(tk.END, query_records[request_id]["text"])
+    output_text.configure(state="disabled")
+    output_text.see(tk.END)
+
+def append_output(request_id, text):
+    query_records[request_id]["text"] += text
+    if request_id != displayed_query:
+        return  # stored for when the user selects this query in the queue view
+    append_text(output_text, text, OUTPUT_SCROLLBACK_LINES)
+
+def on_queue_select(event):
+    selection = queue_view.selection()
+    if selection:
+        show_query(int(selection[0]))
+
+def update_cache_label():
+    stats = response_cache.stats()
+    similar = semantic_cache.stats()["hits"]
+    similar = f" ({similar} similar)" if similar else ""
+    cache_label.config(text=f"Cache: {stats['hits']} hits{similar} / {stats['misses']} misses")
+
+def update_tip(tip):
+    tip_label.config(text=tip)
+
+# Compare the measured history of the loaded model against the other known models
+# (runs on worker threads: it reads the stats database)
+def recommendation_tip():
+    target = target_latency
+    best, meets_target = model_stats.recommend(target, model_inventory.snapshot() or None)
+    if best is None:
+        return ""  # nothing measured often enough yet
+    current = model_stats.summary(current_model) if current_model else None
+    if current is not None and current["queries"] < MIN_SAMPLES:
+        current = None
+    rate = f", {best['tokens_per_sec']:.0f} tok/s" if best["tokens_per_sec"] else ""
+    if not meets_target:
+        return (f"Tip: no measured model meets the {target:g}s target; fastest is "
+                f"{best['model']} (p95 {best['p95_latency']:.1f}s{rate}).")
+    if best["model"] == current_model:
+        return ""
+    if current is not None and current["p95_latency"] <= target:
+        # The loaded model already meets the target; only point out a clearly faster one
+        if not best["tokens_per_sec"] or best["tokens_per_sec"] < 1.2 * (current["tokens_per_sec"] or 0):
+            return ""
+    now = f"; {current_model} p95 is {current['p95_latency']:.1f}s" if current is not None else ""
+    return f"Tip: {best['model']} meets the {target:g}s target (p95 {best['p95_latency']:.1f}s{rate}){now}."
+
+def set_target_latency(*args):
+    """Picks up the target latency typed in the GUI (kept in a plain global for the worker threads)."""
+    global target_latency
+    try:
+        target_latency = max(0.1, float(target_var.get()))
+    except ValueError:
+        pass  # keep the previous value while the user is typing
+
+# Run the benchmark prompt set against every model in the list, loading each in turn
+def benchmark_models():
+    models = list(model_combo['values'])
+    if not server_running or not models:
+        messagebox.showinfo("Benchmark Models", "Start the server and refresh the model list first.")
         return
+    benchmark_button.config(state="disabled")
+    autotune_button.config(state="disabled")
+    load_button.config(state="disabled")
+    run_button.config(state="disabled")
 
-    if resp.status_code != 200:
-        # API returned an error
-        err_msg = resp.text
-        root.after(0, lambda: messagebox.showerror("Query Error", f"Model returned an error:\n{err_msg}"))
-        root.after(0, lambda: run_button.config(state="normal"))
+    def progress(model, step, error):
+        text = f"Benchmarking {model}: {step}" + (" failed" if error is not None else "")
+        ui.call(lambda: status_label.config(text=f"Server Status: Running - {text}", fg="orange"))
+
+    def work():
+        # No warm-up here: the benchmark times the load itself and then the first prompts
+        results = run_model_benchmark(models, lambda model: lms_load(model, warm_up=False)[0], model_stats,
+                                      on_progress=progress)
+        tip = recommendation_tip()
+        ui.call(lambda: benchmark_finished(results, tip))
+
+    threading.Thread(target=work, daemon=True).start()
+
+def restore_model_controls():
+    """Re-enable the model buttons after a benchmark or autotune run."""
+    benchmark_button.config(state="normal")
+    autotune_button.config(state="normal")
+    load_button.config(state="normal")
+    if current_model:
+        run_button.config(state="normal")
+        status_label.config(text=f"Server Status: Running - Model: {current_model}", fg="green")
+    else:
+        status_label.config(text="Server Status: Running", fg="green")
+
+def benchmark_finished(results, tip):
+    restore_model_controls()
+    update_tip(tip)
+    lines = []
+    for model, s in results.items():
+        rate = f"{s['tokens_per_sec']:.1f} tok/s" if s["tokens_per_sec"] else "n/a tok/s"
+        latency = f"p50 {s['p50_latency']:.2f}s  p95 {s['p95_latency']:.2f}s" if s["queries"] else "no queries"
+        lines.append(f"{model}: {latency}  {rate}  load {s['avg_load_time']:.1f}s")
+    messagebox.showinfo("Benchmark Results", "\n".join(lines) or "No model could be benchmarked.")
+
+# Find the fastest load settings for the selected model; it is loaded with them afterwards
+def autotune_model():
+    model_name = model_var.get().strip()
+    if not server_running or not model_name:
+        messagebox.showinfo("Autotune Load", "Start the server and select a model first.")
+        return
+    # The sweep itself is built on the worker: thread_counts() imports and queries psutil
+    if not messagebox.askyesno("Autotune Load", f"Load '{model_name}' up to {max_trials()} times with different "
+                               "settings and time a short prompt each time?\nThe current model is unloaded meanwhile."):
+        return
+    benchmark_button.config(state="disabled")
+    autotune_button.config(state="disabled")
+    load_button.config(state="disabled")
+    run_button.config(state="disabled")
+
+    def progress(trial, number, total):
+        text = f"Autotuning {model_name}: {number}/{total}" + (" failed" if trial["error"] is not None else "")
+        ui.call(lambda: status_label.config(text=f"Server Status: Running - {text}", fg="orange"))
+
+    def work():
+        global current_model
+        sweep = default_sweep()
+        # Trials measure the model's RSS on its own, so nothing else may stay loaded
+        if current_model:
+            try:
+                control.unload(current_model)
+            except (FileNotFoundError, RuntimeError):
+                pass
+            current_model = None
+        metrics.mark("autotune_start", model=model_name)
+        try:
+            best, trials = autotune(control, model_name, sweep, on_trial=progress)
+        finally:
+            metrics.mark("autotune_end", model=model_name)
+        if best is not None:
+            load_profiles.save(model_name, best, trials)
+        error = None
+        try:
+            lms_load(model_name)
+        except (FileNotFoundError, RuntimeError) as e:
+            error = str(e)
+        ui.call(lambda: autotune_finished(model_name, best, trials, error))
+
+    threading.Thread(target=work, daemon=True).start()
+
+def autotune_finished(model_name, best, trials, load_error):
+    restore_model_controls()
+    lines = [format_trial(trial) for trial in trials]
+    if best is None:
+        messagebox.showerror("Autotune Load", f"No setting of '{model_name}' could be measured:\n" + "\n".join(lines))
         return
+    summary = f"Best for {model_name}: {format_trial(best)}\nSaved; Load Model uses it from now on."
+    if load_error is not None:
+        summary += f"\n\nLoading it afterwards failed: {load_error}"
+    messagebox.showinfo("Autotune Results", summary + "\n\nAll settings:\n" + "\n".join(lines))
+
+# Mark a query as failed and report the error (called from worker threads)
+def fail_query(request_id, title, message, latency=None):
+    def report():
+        set_query_status(request_id, "failed", latency)
+        messagebox.showerror(title, message)
+    ui.call(report)
+
+# Worker-pool target for running an inference query
+def run_query_thread(request_id, prompt, stream=False, use_cache=True, use_semantic=False, cancel=None):
+    cancel = cancel or lmstudio_core.CancelToken()
+    if cancel.cancelled:
+        return  # cancelled between dispatch and start
+    cancel.set_timeout(QUERY_DEADLINE)
+    ui.call(lambda: set_query_status(request_id, "running"))
+    # Prepare request payload for completion (see lmstudio_core for the OpenAI-compatible fields)
+    payload = lmstudio_core.build_completion_payload(prompt, model=current_model)
+    # Measure start time
+    start_time = time.time()
+    cache_params = lmstudio_core.sampling_params(payload)
+    if use_cache:
+        cached = response_cache.get(payload["model"], prompt, cache_params)
+        lookup_time = time.time() - start_time
+        if cached is not None:
+            def show_cached():
+                append_output(request_id, cached.strip())
+                set_query_status(request_id, "cached", lookup_time)
+                perf_label.config(text=f"#{request_id}  served from cache in {lookup_time * 1000:.2f} ms")
+                update_cache_label()
+            ui.call(show_cached)
+            return
+        if use_semantic:
+            match = semantic_cache.lookup(payload["model"], prompt, cache_params)
+            if match is not None:
+                def show_similar():
+                    append_output(request_id, match.response.strip())
+                    set_query_status(request_id, "similar", match.lookup_time)
+                    perf_label.config(text=f"#{request_id}  reused a similar prompt (similarity {match.similarity:.2f}) "
+                                           f"in {match.lookup_time * 1000:.1f} ms")
+                    update_cache_label()
+                ui.call(show_similar)
+                return
+            if semantic_cache.last_error is not None and not semantic_cache.stats()["entries"]:
+                ui.call(update_tip, f"Tip: Match similar needs an embedding model ({semantic_cache.last_error[:80]}).")
+        ui.call(update_cache_label)
+
+    # In streaming mode each token is queued for the GUI; the dispatcher merges them per frame
+    def on_text(text):
+        ui.append(append_output, text, key=request_id)
 
-    # Parse the response assuming OpenAI-like format
-    result_text = ""
+    # The request is always streamed so Cancel and the deadline can abort it; "Stream tokens"
+    # only decides whether tokens are shown as they arrive
     try:
-        data = resp.json()
-        # The completion text might be in different fields depending on model (choices[0].text for completion models, or choices[0].message.content for chat models)
-        if "choices" in data:
-            choices = data["choices"]
-            if choices:
-                choice = choices[0]
-                if "text" in choice:
-                    result_text = choice["text"]
-                elif "message" in choice and "content" in choice["message"]:
-                    result_text = choice["message"]["content"]
-    except ValueError:
-        # Not JSON or unexpected format
-        result_text = resp.text
+        result = lmstudio_core.stream_completion(payload, on_text if stream else None, cancel=cancel)
+    except lmstudio_core.RequestCancelled as e:
+        latency = time.time() - start_time
+        status = "timed out" if e.reason == "deadline" else "cancelled"
+        def show_cancelled():
+            set_query_status(request_id, status, latency)
+            perf_label.config(text=f"#{request_id}  {status} after {latency:.1f}s")
+        ui.call(show_cancelled)
+        return
+    except lmstudio_core.CompletionError as e:
+        # API returned an error
+        fail_query(request_id, "Query Error", f"Model returned an error:\n{e.text}", time.time() - start_time)
+        return
+    except Exception as e:
+        # If request fails (e.g., server not responding), show an error in the GUI
+        fail_query(request_id, "Query Failed", f"Failed to get response from model:\n{e}", time.time() - start_time)
+        return
+
+    if use_cache and result.text:
+        response_cache.put(payload["model"], prompt, cache_params, result.text)
+        if use_semantic:
+            semantic_cache.put(payload["model"], prompt, cache_params, result.text)
+    if payload["model"]:
+        model_stats.record_result(payload["model"], result)
+    tip = recommendation_tip()
+
+    if result.ttft is not None:
+        rate = result.tokens_per_sec
+        rate = f"{rate:.1f} tok/s" if rate else "n/a tok/s"
+        stats = f"#{request_id}  TTFT: {result.ttft:.2f}s   {rate}   ({result.tokens} tokens in {result.elapsed:.2f}s)"
+    else:
+        stats = f"#{request_id}  No tokens received ({result.elapsed:.2f}s)"
 
     # Define a function to update the output UI, to be called in main thread
-    def update_output(text, latency):
-        # Insert the result into output_text widget
-        output_text.configure(state="normal")
-        output_text.delete("1.0", tk.END)
-        output_text.insert(tk.END, text.strip())
-        output_text.configure(state="disabled")
-        # Re-enable the Run button for new queries
-        run_button.config(state="normal")
-        # Provide a performance tip if needed based on latency or usage
-        if latency > 5.0:
-            tip_label.config(text="Tip: The response took quite long. Consider a smaller model for faster replies.")
-        else:
-            tip_label.config(text="")  # clear tip if not needed
+    def update_output():
+        if not stream:
+            append_output(request_id, result.text.strip())
+        set_query_status(request_id, "done", result.elapsed)
+        update_tip(tip)
+        perf_label.config(text=stats)
 
     # Schedule the UI update on the main thread
-    root.after(0, lambda: update_output(result_text, elapsed))
+    ui.call(update_output)
 
-# Function to initiate a query
+# Function to queue a query
 def run_query():
     prompt = prompt_text.get("1.0", tk.END).strip()
     if not prompt:
         return  # no prompt entered
-    # Disable the Run button to prevent multiple simultaneous queries
-    run_button.config(state="disabled")
-    # Optionally, show a status or spinner (not implemented here for brevity)
-    # Start the inference in a background thread
-    threading.Thread(target=run_query_thread, args=(prompt,), daemon=True).start()
+    request_id = next(query_ids)
+    cancel = lmstudio_core.CancelToken()
+    query_records[request_id] = {"prompt": prompt, "status": "queued", "latency": None, "text": "",
+                                 "cancel": cancel}
+    summary = " ".join(prompt.split())
+    queue_view.insert("", tk.END, iid=str(request_id), values=(request_id, summary[:60], "queued", ""))
+    queue_view.see(str(request_id))
+    # Follow the newest query in the output box; earlier ones stay available in the queue view
+    show_query(request_id)
+    use_cache = not bypass_cache_var.get()
+    query_queue.put((request_id, prompt, stream_var.get(), use_cache, use_cache and semantic_var.get(), cancel))
+
+# Cancel the query selected in the queue view (or the one shown in the output box)
+def cancel_query():
+    selection = queue_view.selection()
+    request_id = int(selection[0]) if selection else displayed_query
+    record = query_records.get(request_id)
+    if record is None or record["status"] not in ("queued", "running"):
+        return
+    record["cancel"].cancel()  # a running query reports "cancelled" once its stream is closed
+    if record["status"] == "queued":
+        set_query_status(request_id, "cancelled")
+
+# ===================== Batch mode =====================
+# One prompt file at a time; reruns of the same file resume from its results file
+batch_run = None
+
+def toggle_batch():
+    global batch_run
+    if batch_run is not None and batch_run.is_running():
+        batch_run.stop()
+        batch_button.config(state="disabled")  # re-enabled once in-flight prompts have finished
+        perf_label.config(text="Batch: stopping after in-flight prompts...")
+        return
+    if not current_model:
+        messagebox.showinfo("Batch", "Load a model first.")
+        return
+    input_path = filedialog.askopenfilename(title="Prompt file",
+                                            filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")])
+    if not input_path:
+        return
+    output_path = batch_runner.default_output_path(input_path)
+    cache = None if bypass_cache_var.get() else response_cache
+    batch_run = batch_runner.BatchRun(
+        input_path, output_path, concurrency=concurrency_limit, model=current_model, cache=cache,
+        on_progress=lambda stats: ui.call(show_batch_progress, stats),
+        on_done=lambda stats: ui.call(batch_finished, stats, output_path))
+    batch_button.config(text="Stop Batch")
+    perf_label.config(text="Batch: starting...")
+    batch_run.start()
+
+def show_batch_progress(stats):
+    perf_label.config(text="Batch: " + batch_runner.format_stats(stats))
+
+def batch_finished(stats, output_path):
+    batch_button.config(text="Batch...", state="normal")
+    update_cache_label()
+    if stats["error"] is not None:
+        perf_label.config(text="Batch failed")
+        messagebox.showerror("Batch Failed", str(stats["error"]))
+        return
+    state = "stopped" if stats["stopped"] else "finished"
+    perf_label.config(text=f"Batch {state}: " + batch_runner.format_stats(stats))
+    messagebox.showinfo("Batch", f"Batch {state}: {batch_runner.format_stats(stats)}\nResults: {output_path}")
 
-# Function to periodically update CPU and memory usage in the GUI
+# Function to periodically show the latest metrics sample in the GUI (no psutil calls on the Tk thread)
 def update_usage():
-    # Get system CPU and memory usage
-    cpu_percent = psutil.cpu_percent(interval=0)  # non-blocking call (since we call it periodically)
-    mem = psutil.virtual_memory()
-    mem_percent = mem.percent
-    # Format memory usage (used/total in GB)
-    used_gb = mem.used / (1024**3)
-    total_gb = mem.total / (1024**3)
-    usage_label.config(text=f"CPU: {cpu_percent:.0f}%   Memory: {used_gb:.1f}/{total_gb:.1f} GB ({mem_percent:.0f}%)")
+    sample = metrics.latest()
+    if sample is not None:
+        # Format memory usage (used/total in GB)
+        used_gb = sample["mem_used"] / (1024**3)
+        total_gb = sample["mem_total"] / (1024**3)
+        text = f"CPU: {sample['cpu_percent']:.0f}%   Memory: {used_gb:.1f}/{total_gb:.1f} GB ({sample['mem_percent']:.0f}%)"
+        if sample["server_processes"]:
+            text += f"\nLM Studio: CPU {sample['server_cpu_percent']:.0f}%   RSS {sample['server_rss'] / (1024**3):.1f} GB   {sample['server_threads']} threads"
+        usage_label.config(text=text)
+    if lmstudio_client.is_routed():
+        endpoint_label.config(text="Endpoints: " + lmstudio_client.get_client().summary())
     # Schedule the next update
     root.after(1000, update_usage)
 
+# Write the sample history and event log as CSV, and the latest values in Prometheus text format
+def export_metrics():
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    samples_path = os.path.join(METRICS_DIR, f"samples-{stamp}.csv")
+    events_path = os.path.join(METRICS_DIR, f"events-{stamp}.csv")
+    prom_path = os.path.join(METRICS_DIR, "lmstudio.prom")
+    trace_path = os.path.join(METRICS_DIR, f"trace-{stamp}.json")
+    paths = [samples_path, events_path, prom_path]
+    span_count = 0
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        metrics.export_csv(samples_path, events_path)
+        metrics.export_prometheus(prom_path)
+        # Chrome trace-event JSON: open in chrome://tracing or ui.perfetto.dev
+        span_count = tracing.export_chrome(trace_path)
+        if span_count:
+            paths.append(trace_path)
+        else:
+            os.remove(trace_path)
+    except OSError as e:
+        messagebox.showerror("Export Failed", f"Could not write metrics:\n{e}")
+        return
+    message = f"Wrote {len(metrics.history())} samples to:\n" + "\n".join(paths)
+    if control.stats():
+        message += "\n\nServer control calls (mean):\n" + control.summary()
+    semantic = semantic_cache.stats()
+    if semantic["hits"] or semantic["misses"]:
+        message += "\n\nSemantic cache: " + semantic_cache.summary()
+    if span_count:
+        slowest = tracing.slowest(5)
+        message += f"\n\n{span_count} spans; most time in:\n" + "\n".join(
+            f"{r['name']}: {r['total']:.2f}s over {r['count']} (max {r['max'] * 1000:.0f} ms)" for r in slowest)
+    messagebox.showinfo("Metrics Exported", message)
+
 # Tie the GUI buttons to their functions
 start_button.config(command=start_server)
 stop_button.config(command=stop_server)
 load_button.config(command=load_model)
 run_button.config(command=run_query)
-
-# Immediately refresh model list (in case server is already running when script starts)
-# If server is running, enable load and stop controls; if not, models list will populate after start.
-available_models = refresh_model_list()
-if available_models:
-    # It appears server might already be running (since we could list models), update status
-    server_running = True
-    status_label.config(text="Server Status: Running", fg="green")
-    stop_button.config(state="normal")
-    load_button.config(state="normal")
-else:
-    # No models listed (maybe server not running yet)
-    server_running = False
-
-# Start the resource usage updater loop
+export_button.config(command=export_metrics)
+benchmark_button.config(command=benchmark_models)
+autotune_button.config(command=autotune_model)
+batch_button.config(command=toggle_batch)
+cancel_button.config(command=cancel_query)
+target_var.trace_add("write", set_target_latency)
+concurrency_spin.config(command=set_concurrency_limit)
+queue_view.bind("<<TreeviewSelect>>", on_queue_select)
+threading.Thread(target=dispatch_queries, daemon=True).start()
+
+# Show the last known model list right away; it is refreshed in the background once the window is up
+show_model_list(model_inventory.snapshot())
+
+# Probe /v1/models in the background in case the server is already running when script starts.
+# If it is, enable load and stop controls; if not, they are enabled after Start Server.
+def detect_running_server():
+    if server_lifecycle.is_ready():
+        ui.call(lambda: on_server_ready(0.0, True))
+
+# Work that needs the lms CLI, requests or psutil starts shortly after the window is shown,
+# so neither it nor those imports delay the first paint
+def start_background_work():
+    refresh_model_list()
+    threading.Thread(target=detect_running_server, daemon=True).start()
+    metrics.start()
+
+# Start the UI update loop, the resource usage updater loop and the deferred startup work
+ui.start()
 root.after(1000, update_usage)
+root.after(DEFERRED_START_MS, start_background_work)
 
 # Handle window close event to stop server if we started it
 def on_close():
     if started_server_this_session:
         try:
-            subprocess.run(["lms", "server", "stop"], capture_output=True)
+            control.stop_server()
         except Exception:
             pass
+    metrics.stop()
+    if batch_run is not None:
+        batch_run.stop()
+    response_cache.close()
+    semantic_cache.close()
+    model_stats.close()
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)